@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark over the synthetic corpus (benchmarks/corpus.py).
+
+    python3 benchmarks/bench_analyze.py --save-baseline
+    python3 benchmarks/bench_analyze.py --compare
+    python3 benchmarks/bench_analyze.py --sizes 1K 1M 1G --formats pe32 --repeat 5
+
+Every sample goes through analyze_binary with --timings instrumentation;
+the full call and each stage (info, security, entropy, packer and every
+packer module) are timed, best of --repeat runs. Results can be stored as
+a baseline and later runs compared against it: a stage that got slower
+than --tolerance (and by more than --noise-floor) is reported as a
+regression and the script exits with status 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import corpus
+from binary_analyzer import analyze_binary
+from core import byte_stats
+from core.packer_detector import PackerDetector
+
+DEFAULT_CORPUS = os.path.join(tempfile.gettempdir(), "binary_analyzer_corpus")
+DEFAULT_BASELINE = os.path.join(os.path.expanduser("~"), ".cache", "binary_analyzer",
+                                "bench_baseline.json")
+
+# Stages shown in the summary table, in pipeline order
+SUMMARY_STAGES = ('total', 'info', 'security', 'entropy', 'packer')
+
+
+def bench_sample(path, repeat, entropy_profile):
+    """{stage: best wall seconds} for one sample, 'total' being analyze_binary"""
+    best = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        report = analyze_binary(path, entropy_profile=entropy_profile, output="json",
+                                timings=True)
+        timings = {'total': time.perf_counter() - start}
+        for stage, values in (report.metrics or {}).items():
+            timings[stage] = values['wall']
+        for stage, seconds in timings.items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    return best
+
+
+def run(samples, repeat, entropy_profile):
+    results = {}
+    for path, fmt, variant, size in samples:
+        name = os.path.basename(path)
+        results[name] = {
+            'format': fmt,
+            'variant': variant,
+            'size': os.path.getsize(path),
+            'stages': bench_sample(path, repeat, entropy_profile),
+        }
+    return results
+
+
+def display(results):
+    print(f"{'sample':<28} {'MB/s':>9}" + ''.join(f" {stage + ' ms':>12}" for stage in SUMMARY_STAGES))
+    for name, result in results.items():
+        stages = result['stages']
+        throughput = result['size'] / (1024 * 1024) / max(stages['total'], 1e-9)
+        row = ''.join(f" {stages.get(stage, 0) * 1000:>12.3f}" for stage in SUMMARY_STAGES)
+        print(f"{name:<28} {throughput:>9.1f}{row}")
+
+    # Per packer module, summed over the corpus: the slow plugin stands out here
+    modules = {}
+    for result in results.values():
+        for stage, seconds in result['stages'].items():
+            if stage.startswith('packer/'):
+                modules[stage] = modules.get(stage, 0) + seconds
+    if modules:
+        print(f"\n{'packer stage (all samples)':<28} {'ms':>9}")
+        for stage, seconds in sorted(modules.items(), key=lambda item: -item[1]):
+            print(f"{stage:<28} {seconds * 1000:>9.3f}")
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'numpy': getattr(byte_stats.np, '__version__', None),
+        'plugins': PackerDetector.plugin_version(),
+    }
+
+
+def save_baseline(path, results, options):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'options': options, 'results': results},
+                  f, indent=2, sort_keys=True)
+    print(f"\n[*] Baseline written to {path}")
+
+
+def compare(path, results, tolerance, noise_floor):
+    """Print stages slower than the baseline; returns the number of regressions"""
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline['environment'] != environment():
+        print(f"\n[!] Baseline was recorded with {baseline['environment']}")
+
+    regressions = 0
+    print(f"\n{'sample':<28} {'stage':<22} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        for stage, seconds in result['stages'].items():
+            before = old['stages'].get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + tolerance) and seconds - before > noise_floor:
+                regressions += 1
+                print(f"{name:<28} {stage:<22} {before * 1000:>10.3f} {seconds * 1000:>10.3f} "
+                      f"{(seconds / max(before, 1e-9) - 1) * 100:>+7.0f}%")
+    if regressions:
+        print(f"\n[!] {regressions} stage(s) regressed by more than {tolerance:.0%}")
+    else:
+        print(f"[✓] No regressions against {path}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="analyze_binary benchmark on the synthetic corpus")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS,
+                        help="Corpus directory, generated on first use (default: %(default)s)")
+    parser.add_argument("--sizes", nargs="+", default=list(corpus.DEFAULT_SIZES))
+    parser.add_argument("--formats", nargs="+", choices=corpus.FORMATS, default=list(corpus.FORMATS))
+    parser.add_argument("--variants", nargs="+", choices=corpus.VARIANTS,
+                        default=list(corpus.VARIANTS))
+    parser.add_argument("--seed", type=int, default=corpus.DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per sample, best is kept")
+    parser.add_argument("--entropy-profile", action="store_true",
+                        help="Include the sliding-window entropy profile")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed slowdown as a fraction (default 0.15)")
+    parser.add_argument("--noise-floor", type=float, default=1.0, metavar="MS",
+                        help="Ignore slowdowns smaller than this many ms (default 1)")
+    args = parser.parse_args()
+
+    samples = corpus.generate(args.corpus, args.formats, args.variants, args.sizes, args.seed)
+    PackerDetector.preload()
+    results = run(samples, args.repeat, args.entropy_profile)
+    display(results)
+
+    regressions = 0
+    if args.compare:
+        regressions = compare(args.compare, results, args.tolerance, args.noise_floor / 1000)
+    if args.save_baseline:
+        options = {'seed': args.seed, 'repeat': args.repeat,
+                   'entropy_profile': args.entropy_profile}
+        save_baseline(args.save_baseline, results, options)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
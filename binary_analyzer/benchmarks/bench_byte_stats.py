@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Byte statistics benchmark: legacy per-byte loops vs the bulk engine.
+
+    python3 benchmarks/bench_byte_stats.py
+    python3 benchmarks/bench_byte_stats.py --sizes 1M 100M --legacy-max 4M
+
+The legacy Counter/chr() implementation runs at roughly 1 us/byte, so it is
+timed on at most --legacy-max bytes and extrapolated linearly.
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import byte_stats
+from core.binary_buffer import BinaryBuffer
+
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit in ('G', 'M', 'K'):
+        if size >= UNITS[unit]:
+            return f"{size / UNITS[unit]:g}{unit}B"
+    return f"{size}B"
+
+
+def legacy_entropy(data):
+    byte_counts = Counter(data)
+    entropy = 0.0
+    for count in byte_counts.values():
+        probability = count / len(data)
+        entropy -= probability * math.log2(probability)
+    return entropy
+
+
+def legacy_count_strings(data):
+    count = 0
+    current_string = []
+    for byte in data:
+        if 32 <= byte <= 126:
+            current_string.append(chr(byte))
+        else:
+            if len(current_string) >= 4:
+                count += 1
+            current_string = []
+    if len(current_string) >= 4:
+        count += 1
+    return count
+
+
+def write_sample(path, size):
+    """Mix of random bytes and text so both code paths do real work"""
+    block = os.urandom(48 * 1024) + b"GetProcAddress\x00kernel32.dll\x00" * 512
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            piece = block[:size - written]
+            f.write(piece)
+            written += len(piece)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench(size, legacy_max):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sample.bin")
+        write_sample(path, size)
+        with BinaryBuffer(path) as binary:
+            sample = binary.view[:min(size, legacy_max)]
+            legacy = timed(legacy_entropy, sample) + timed(legacy_count_strings, sample)
+            legacy *= size / len(sample)
+            sample.release()
+
+            results = {'legacy': legacy}
+            chunks = lambda: binary.chunks(byte_stats.CHUNK_SIZE)
+            results['python'] = timed(lambda: byte_stats.compute(chunks(), use_numpy=False))
+            if byte_stats.np is not None:
+                results['numpy'] = timed(lambda: byte_stats.compute(chunks(), use_numpy=True))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Byte statistics benchmark")
+    parser.add_argument("--sizes", nargs="+", default=["1M", "100M", "1G"])
+    parser.add_argument("--legacy-max", default="8M",
+                        help="Largest input the legacy loop is actually run on")
+    args = parser.parse_args()
+
+    legacy_max = parse_size(args.legacy_max)
+    print(f"{'size':>8} {'engine':>8} {'seconds':>10} {'MB/s':>10} {'speedup':>9}")
+    for size in map(parse_size, args.sizes):
+        results = bench(size, legacy_max)
+        for engine, seconds in results.items():
+            note = "*" if engine == 'legacy' and size > legacy_max else " "
+            print(f"{format_size(size):>8} {engine:>8} {seconds:>9.3f}{note} "
+                  f"{size / UNITS['M'] / seconds:>10.1f} "
+                  f"{results['legacy'] / seconds:>8.1f}x")
+    print("\n* extrapolated from --legacy-max bytes")
+
+
+if __name__ == "__main__":
+    main()
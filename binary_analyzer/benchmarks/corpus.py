@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic ELF/PE corpus for the benchmarks.
+
+    python3 benchmarks/corpus.py /tmp/corpus --sizes 1K 1M 100M
+
+Every (format, variant, size) combination is rebuilt byte-for-byte from
+the seed: ELF32, ELF64, PE32 and PE32+ images with a valid header, section
+table and (for PE) import table, padded with a mix of code-like bytes,
+strings and random data up to the requested size. Variants carry the
+markers of the bundled packer modules or a high-entropy section.
+"""
+
+import argparse
+import functools
+import json
+import os
+import random
+import struct
+import sys
+
+FORMATS = ('elf32', 'elf64', 'pe32', 'pe32+')
+VARIANTS = ('plain', 'entropy', 'upx', 'aspack', 'pecompact', 'themida')
+# The PE-only packers are not generated for ELF
+ELF_VARIANTS = ('plain', 'entropy', 'upx')
+
+DEFAULT_SIZES = ('1K', '64K', '1M', '16M')
+DEFAULT_SEED = 1337
+
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+FILE_ALIGNMENT = 0x200
+SECTION_ALIGNMENT = 0x1000
+
+IMAGE_SCN_CODE = 0x60000020
+IMAGE_SCN_DATA = 0xC0000040
+IMAGE_SCN_RDATA = 0x40000040
+
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+PLAIN_IMPORTS = {
+    'kernel32.dll': ['CreateFileW', 'ReadFile', 'WriteFile', 'CloseHandle', 'GetLastError',
+                     'HeapAlloc', 'HeapFree', 'GetProcessHeap', 'ExitProcess'],
+    'user32.dll': ['MessageBoxW', 'GetMessageW', 'DispatchMessageW'],
+    'advapi32.dll': ['RegOpenKeyExW', 'RegQueryValueExW', 'RegCloseKey'],
+    'msvcrt.dll': ['malloc', 'free', 'memcpy', 'printf'],
+}
+
+# Packed images keep only the loader imports the stub needs
+STUB_IMPORTS = {
+    'kernel32.dll': ['LoadLibraryA', 'GetProcAddress', 'VirtualProtect', 'VirtualAlloc',
+                     'ExitProcess'],
+}
+
+THEMIDA_IMPORTS = {
+    'kernel32.dll': ['LoadLibraryA', 'GetProcAddress', 'IsDebuggerPresent',
+                     'CheckRemoteDebuggerPresent'],
+    'ntdll.dll': ['NtQueryInformationProcess'],
+}
+
+UPX_BANNER = (b'$Info: This file is packed with the UPX executable packer http://upx.sf.net $\n'
+              b'\x00$Id: UPX 3.96 Copyright (C) 1996-2020 the UPX Team. All Rights Reserved. $\n')
+
+PECOMPACT_STUB = b'\xeb\x06\xff\xff\xff\xff\x00\x00' + b'PEC2\x00' + b'\x90' * 16
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit in ('G', 'M', 'K'):
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f"{size // UNITS[unit]}{unit}"
+    return str(size)
+
+
+def _align(value, alignment):
+    return (value + alignment - 1) // alignment * alignment
+
+
+@functools.lru_cache(maxsize=4)
+def _blocks(seed):
+    """1 MB random, text and code-like blocks; built once per seed"""
+    rng = random.Random(seed)
+    block = 1024 * 1024
+    words = [b'GetProcAddress', b'kernel32.dll', b'config', b'error: %s\n',
+             b'/usr/lib/x86_64-linux-gnu', b'Software\\Microsoft\\Windows', b'%d.%d.%d']
+    opcodes = [b'\x55', b'\x48\x89\xe5', b'\x48\x83\xec\x20', b'\xe8\x00\x00\x00\x00',
+               b'\x31\xc0', b'\xc3', b'\x90', b'\x48\x8b\x45\xf8', b'\x0f\x1f\x40\x00']
+    return (rng.randbytes(block),
+            b'\x00'.join(rng.choice(words) for _ in range(block // 8)),
+            b''.join(rng.choice(opcodes) for _ in range(block // 3)))
+
+
+class _Filler:
+    """Seeded byte source: code-like, text and random (high entropy) runs"""
+
+    def __init__(self, seed, name=''):
+        # Per-sample stream: a sample does not depend on what was generated before it
+        self.rng = random.Random(f"{seed}:{name}")
+        self._random, self._text, self._code = _blocks(seed)
+
+    def _cycle(self, block, size):
+        # Rotate every repeat so no two megabytes of a large file are identical
+        out = bytearray()
+        shift = self.rng.randrange(len(block))
+        while len(out) < size:
+            out += block[shift:] + block[:shift]
+            shift = (shift * 31 + 4099) % len(block)
+        return bytes(out[:size])
+
+    def random(self, size):
+        return self._cycle(self._random, size)
+
+    def text(self, size):
+        return self._cycle(self._text, size)
+
+    def code(self, size):
+        return self._cycle(self._code, size)
+
+
+# -- PE ----------------------------------------------------------------------
+
+def _pe_imports(imports, rva, pe32_plus):
+    """.idata contents (descriptors, ILT, IAT, hint/name table) placed at rva"""
+    thunk = struct.Struct('<Q' if pe32_plus else '<I')
+    dlls = list(imports.items())
+    descriptors_size = 20 * (len(dlls) + 1)
+    tables_size = sum((len(funcs) + 1) * thunk.size for _, funcs in dlls)
+
+    # descriptors | ILTs | IATs | names
+    ilt_offset = descriptors_size
+    iat_offset = ilt_offset + tables_size
+    names_offset = iat_offset + tables_size
+
+    names = bytearray()
+    descriptors = bytearray()
+    ilt = bytearray()
+    for dll, funcs in dlls:
+        thunks = []
+        for func in funcs:
+            thunks.append(rva + names_offset + len(names))
+            names += struct.pack('<H', 0) + func.encode() + b'\x00'
+            if len(names) % 2:
+                names += b'\x00'
+        dll_name_rva = rva + names_offset + len(names)
+        names += dll.encode() + b'\x00'
+        descriptors += struct.pack('<IIIII', rva + ilt_offset + len(ilt), 0, 0, dll_name_rva,
+                                   rva + iat_offset + len(ilt))
+        for value in thunks + [0]:
+            ilt += thunk.pack(value)
+    descriptors += b'\x00' * 20
+    return bytes(descriptors + ilt + ilt + names), descriptors_size
+
+
+def build_pe(sections, pe32_plus=False, entry_section=0, entry_offset=0, imports=None,
+             overlay=b''):
+    """PE image from [(name, data, characteristics[, virtual_size])]
+
+    imports ({dll: [function]}) adds an .idata section and IMPORT directory.
+    """
+    e_lfanew = 0x80
+    optional_size = 240 if pe32_plus else 224
+    sections = list(sections)
+    if imports:
+        sections.append((b'.idata', None, IMAGE_SCN_DATA))
+
+    headers_size = _align(e_lfanew + 24 + optional_size + 40 * len(sections), FILE_ALIGNMENT)
+    table = bytearray()
+    body = bytearray()
+    rva = SECTION_ALIGNMENT
+    directories = {}
+    entry_rva = 0
+    for index, (name, data, characteristics, *virtual) in enumerate(sections):
+        if data is None:
+            data, descriptors_size = _pe_imports(imports, rva, pe32_plus)
+            directories[1] = (rva, descriptors_size)
+        raw_size = _align(len(data), FILE_ALIGNMENT)
+        virtual_size = virtual[0] if virtual else max(len(data), 1)
+        if index == entry_section:
+            entry_rva = rva + entry_offset
+        table += struct.pack('<8sIIIIIIHHI', name, virtual_size, rva, raw_size,
+                             headers_size + len(body) if raw_size else 0, 0, 0, 0, 0,
+                             characteristics)
+        body += data.ljust(raw_size, b'\x00')
+        rva += _align(virtual_size, SECTION_ALIGNMENT)
+
+    machine = 0x8664 if pe32_plus else 0x014c
+    coff = struct.pack('<4sHHIIIHH', b'PE\x00\x00', machine, len(sections), 0x5f000000, 0, 0,
+                       optional_size, 0x0102 if not pe32_plus else 0x0022)
+
+    optional = bytearray(optional_size)
+    struct.pack_into('<HBB', optional, 0, 0x20b if pe32_plus else 0x10b, 14, 0)
+    struct.pack_into('<I', optional, 16, entry_rva)
+    if pe32_plus:
+        struct.pack_into('<Q', optional, 24, 0x140000000)
+    else:
+        struct.pack_into('<I', optional, 28, 0x400000)
+    struct.pack_into('<II', optional, 32, SECTION_ALIGNMENT, FILE_ALIGNMENT)
+    struct.pack_into('<HH', optional, 48, 6, 0)
+    struct.pack_into('<II', optional, 56, rva, headers_size)
+    struct.pack_into('<HH', optional, 68, 3, 0x8160)   # console, DYNAMIC_BASE|NX|TS_AWARE
+    directory_offset = 112 if pe32_plus else 96
+    struct.pack_into('<I', optional, directory_offset - 4, 16)
+    for index, (directory_rva, size) in directories.items():
+        struct.pack_into('<II', optional, directory_offset + index * 8, directory_rva, size)
+
+    dos = (b'MZ' + b'\x00' * 58 + struct.pack('<I', e_lfanew)).ljust(e_lfanew, b'\x00')
+    headers = (dos + coff + bytes(optional) + bytes(table)).ljust(headers_size, b'\x00')
+    return headers + bytes(body) + overlay
+
+
+def _pe_layout(variant, filler, payload_size):
+    """Sections, entry section, imports and overlay of one PE variant"""
+    code = filler.code(4096)
+    data = filler.text(2048)
+    if variant == 'upx':
+        # UPX0 is the empty, memory-only target the stub decompresses into
+        sections = [(b'UPX0', b'', IMAGE_SCN_CODE | 0x80, max(payload_size * 2, 0x1000)),
+                    (b'UPX1', UPX_BANNER + filler.random(payload_size), IMAGE_SCN_CODE),
+                    (b'.rsrc', data, IMAGE_SCN_RDATA)]
+        return sections, 1, STUB_IMPORTS, b'UPX!\x0d\x09\x08\x08'
+    if variant == 'aspack':
+        sections = [(b'.text', filler.random(payload_size), IMAGE_SCN_CODE),
+                    (b'.data', data, IMAGE_SCN_DATA),
+                    (b'.aspack', code + b'ASPack 2.12\x00', IMAGE_SCN_CODE),
+                    (b'.adata', b'\x00' * 16, IMAGE_SCN_DATA)]
+        return sections, 2, STUB_IMPORTS, b''
+    if variant == 'pecompact':
+        sections = [(b'.text', PECOMPACT_STUB + filler.random(payload_size), IMAGE_SCN_CODE),
+                    (b'.pec2', data, IMAGE_SCN_DATA)]
+        return sections, 0, STUB_IMPORTS, b''
+    if variant == 'themida':
+        sections = [(b'.themida', filler.random(payload_size), IMAGE_SCN_CODE),
+                    (b'.boot', code + b'Themida\x00Oreans Technologies\x00SecureEngine\x00',
+                     IMAGE_SCN_CODE),
+                    (b'.rsrc', data, IMAGE_SCN_RDATA)]
+        return sections, 1, THEMIDA_IMPORTS, b''
+    if variant == 'entropy':
+        sections = [(b'.text', code, IMAGE_SCN_CODE),
+                    (b'.data', data, IMAGE_SCN_DATA),
+                    (b'.enc', filler.random(payload_size), IMAGE_SCN_DATA)]
+        return sections, 0, PLAIN_IMPORTS, b''
+    sections = [(b'.text', filler.code(payload_size // 2), IMAGE_SCN_CODE),
+                (b'.rdata', filler.text(payload_size - payload_size // 2), IMAGE_SCN_RDATA),
+                (b'.data', data, IMAGE_SCN_DATA)]
+    return sections, 0, PLAIN_IMPORTS, b''
+
+
+def pe_sample(variant, size, seed=DEFAULT_SEED, pe32_plus=False):
+    name = f"pe:{variant}:{size}:{pe32_plus}"
+    # Headers, import table and small sections take a few KB; the payload fills the rest
+    overhead = len(build_pe(*_pe_args(variant, _Filler(seed, name), 0, pe32_plus)))
+    return build_pe(*_pe_args(variant, _Filler(seed, name), max(0, size - overhead), pe32_plus))
+
+
+def _pe_args(variant, filler, payload_size, pe32_plus):
+    sections, entry_section, imports, overlay = _pe_layout(variant, filler, payload_size)
+    return sections, pe32_plus, entry_section, 0, imports, overlay
+
+
+# -- ELF ---------------------------------------------------------------------
+
+def build_elf(sections, is_64=True, entry_section=0, segments=(), big_endian=False):
+    """ELF executable from [(name, data, flags[, type, link, entsize])] with PT_LOAD, PT_GNU_STACK, .shstrtab
+
+    Sections are SHT_PROGBITS unless a type is given; link is an index into
+    sections. segments ([(p_type, p_flags, section index)]) adds program
+    headers covering those sections (PT_DYNAMIC, PT_GNU_RELRO, ...).
+    """
+    endian = '>' if big_endian else '<'
+    if is_64:
+        ehdr = struct.Struct(endian + '16sHHIQQQIHHHHHH')
+        phdr = struct.Struct(endian + 'IIQQQQQQ')
+        shdr = struct.Struct(endian + 'IIQQQQIIQQ')
+    else:
+        ehdr = struct.Struct(endian + '16sHHIIIIIHHHHHH')
+        phdr = struct.Struct(endian + 'IIIIIIII')
+        shdr = struct.Struct(endian + 'IIIIIIIIII')
+
+    base = 0x400000 if is_64 else 0x08048000
+    phnum = 2 + len(segments)
+    offset = ehdr.size + phnum * phdr.size
+
+    shstrtab = bytearray(b'\x00')
+    placed = []
+    for name, data, flags, *extra in sections:
+        sh_type, link, entsize = tuple(extra) + (1, None, 0)[len(extra):]
+        offset = _align(offset, 16)
+        # Section 0 is SHT_NULL: file index = list index + 1
+        placed.append((len(shstrtab), data, flags, offset, sh_type,
+                       0 if link is None else link + 1, entsize))
+        shstrtab += name + b'\x00'
+        offset += len(data)
+    shstrtab_name = len(shstrtab)
+    shstrtab += b'.shstrtab\x00'
+    shstrtab_offset = offset
+    shoff = _align(shstrtab_offset + len(shstrtab), 8)
+
+    image = bytearray(shoff + shdr.size * (len(placed) + 2))
+    ident = b'\x7fELF' + bytes([2 if is_64 else 1, 2 if big_endian else 1, 1])
+    entry = base + placed[entry_section][3] if placed else base
+    ehdr.pack_into(image, 0, ident.ljust(16, b'\x00'), 2, 0x3e if is_64 else 0x03, 1, entry,
+                   ehdr.size, shoff, 0, ehdr.size, phdr.size, phnum, shdr.size,
+                   len(placed) + 2, len(placed) + 1)
+
+    load_size = shstrtab_offset
+    program = [(1, 0x5, 0, base, load_size, 0x1000), (0x6474e551, 0x6, 0, 0, 0, 16)]
+    for p_type, p_flags, index in segments:
+        _, data, _, data_offset, *_ = placed[index]
+        program.append((p_type, p_flags, data_offset, base + data_offset, len(data), 8))
+    position = ehdr.size
+    for p_type, p_flags, p_offset, vaddr, size, align in program:
+        if is_64:
+            phdr.pack_into(image, position, p_type, p_flags, p_offset, vaddr, vaddr, size, size,
+                           align)
+        else:
+            phdr.pack_into(image, position, p_type, p_offset, vaddr, vaddr, size, size, p_flags,
+                           align)
+        position += phdr.size
+
+    for name_offset, data, flags, data_offset, *_ in placed:
+        image[data_offset:data_offset + len(data)] = data
+    image[shstrtab_offset:shstrtab_offset + len(shstrtab)] = shstrtab
+
+    position = shoff + shdr.size   # section 0 stays SHT_NULL
+    for name_offset, data, flags, data_offset, sh_type, link, entsize in placed:
+        shdr.pack_into(image, position, name_offset, sh_type, flags, base + data_offset,
+                       data_offset, len(data), link, 0, 16, entsize)
+        position += shdr.size
+    shdr.pack_into(image, position, shstrtab_name, 3, 0, 0, shstrtab_offset, len(shstrtab),
+                   0, 0, 1, 0)
+    return bytes(image)
+
+
+def _elf_sections(variant, filler, payload_size):
+    code = filler.code(4096)
+    data = filler.text(2048)
+    if variant == 'upx':
+        # UPX'd ELF: tiny stub, UPX! headers around the compressed blob
+        return [(b'.text', code + UPX_BANNER, SHF_ALLOC | SHF_EXECINSTR),
+                (b'.data', b'UPX!' + filler.random(payload_size) + b'UPX!',
+                 SHF_ALLOC | SHF_WRITE)]
+    if variant == 'entropy':
+        return [(b'.text', code, SHF_ALLOC | SHF_EXECINSTR),
+                (b'.rodata', data, SHF_ALLOC),
+                (b'.enc', filler.random(payload_size), SHF_ALLOC | SHF_WRITE)]
+    return [(b'.text', filler.code(payload_size // 2), SHF_ALLOC | SHF_EXECINSTR),
+            (b'.rodata', filler.text(payload_size - payload_size // 2), SHF_ALLOC),
+            (b'.data', data, SHF_ALLOC | SHF_WRITE)]
+
+
+def elf_sample(variant, size, seed=DEFAULT_SEED, is_64=True):
+    name = f"elf:{variant}:{size}:{is_64}"
+    overhead = len(build_elf(_elf_sections(variant, _Filler(seed, name), 0), is_64))
+    return build_elf(_elf_sections(variant, _Filler(seed, name), max(0, size - overhead)), is_64)
+
+
+# -- corpus ------------------------------------------------------------------
+
+def sample(fmt, variant, size, seed=DEFAULT_SEED):
+    """Bytes of one synthetic sample (at least the headers, so 1K may run over)"""
+    if fmt in ('elf32', 'elf64'):
+        return elf_sample(variant, size, seed, is_64=fmt == 'elf64')
+    return pe_sample(variant, size, seed, pe32_plus=fmt == 'pe32+')
+
+
+def sample_name(fmt, variant, size):
+    extension = '.exe' if fmt.startswith('pe') else '.elf'
+    return f"{fmt.replace('+', 'plus')}-{variant}-{format_size(size)}{extension}"
+
+
+def combinations(formats=FORMATS, variants=VARIANTS, sizes=DEFAULT_SIZES):
+    for fmt in formats:
+        for variant in variants:
+            if fmt.startswith('elf') and variant not in ELF_VARIANTS:
+                continue
+            for size in sizes:
+                yield fmt, variant, parse_size(size) if isinstance(size, str) else size
+
+
+def generate(directory, formats=FORMATS, variants=VARIANTS, sizes=DEFAULT_SIZES,
+             seed=DEFAULT_SEED):
+    """Write the corpus (reusing files from an earlier run with the same seed)
+
+    Returns [(path, fmt, variant, size)]. A manifest.json next to the samples
+    records the seed so a changed seed regenerates everything.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get('seed') != seed:
+        manifest = {'seed': seed, 'files': {}}
+
+    samples = []
+    for fmt, variant, size in combinations(formats, variants, sizes):
+        name = sample_name(fmt, variant, size)
+        path = os.path.join(directory, name)
+        if name not in manifest['files'] or not os.path.exists(path):
+            data = sample(fmt, variant, size, seed)
+            with open(path, 'wb') as f:
+                f.write(data)
+            manifest['files'][name] = len(data)
+        samples.append((path, fmt, variant, size))
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark corpus")
+    parser.add_argument("directory")
+    parser.add_argument("--sizes", nargs="+", default=list(DEFAULT_SIZES),
+                        help="Sample sizes, 1K to 1G (default: %(default)s)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    for path, fmt, variant, size in generate(args.directory, args.formats, args.variants,
+                                             args.sizes, args.seed):
+        print(f"{os.path.getsize(path):>12,}  {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,63 +2,479 @@
 
 import sys
 import os
-from pathlib import Path
 
-# Core modules
-from core.binary_info import BinaryInfo
-from core.security_checks import SecurityChecker
-from core.entropy import EntropyAnalyzer
-from core.packer_detector import PackerDetector
+# Stage modules (and NumPy under them) are imported on first use, inside the
+# functions below: `--help`, argument errors and importing this module for
+# analyze_binary/analyze_batch stay cheap.
 
-def analyze_binary(filepath):
-    """Ana analiz fonksiyonu"""
+def _cached_stage(cache, sha256, stage, version, build, restore):
+    """Restore a stage from the result cache, or run it and store it"""
+    if cache is None:
+        return build()
+    data = cache.get(sha256, stage, version)
+    if data is not None:
+        return restore(data)
+    result = build()
+    cache.put(sha256, stage, version, result.to_dict())
+    return result
+
+def _heading(title, text):
+    if text:
+        print(f"{title}")
+        print(f"{'='*60}")
+
+def analyze_binary(filepath, entropy_profile=False, window_size=None, stride=None,
+                   cache=None, cache_size=None, output="text", timings=False,
+                   hash_thread=False, stream=None, strings=False, string_index=None,
+                   similarity_index=None, claim=None):
+    """Ana analiz fonksiyonu
+
+    cache: path of the SQLite result cache; stages already analyzed for a
+    file with the same SHA256 (and stage version) are not run again.
+    output: "text" prints the report as it is built; any other value only
+    returns it. The AnalysisReport is returned either way.
+    timings: collect per-stage Metrics into report.metrics (and print them).
+    hash_thread: run the digest pass on a background thread next to the stages.
+    stream: hash, count bytes and match signatures in one bounded-memory
+    pass (core.streaming); None streams files over STREAM_THRESHOLD.
+    strings: extract ASCII/UTF-16LE strings into report.strings.
+    string_index: path of the SQLite string index to add the strings to.
+    similarity_index: path of the SQLite similarity index; the nearest known
+    samples go into report.similar, then the file is added to the index.
+    claim: called with the SHA256 before any stage runs (from the same
+    first-pass digests the stages use); when it returns False the file is
+    not analyzed and the report only carries its path.
+    window_size / cache_size default to core.entropy.WINDOW_SIZE and
+    core.result_cache.DEFAULT_MAX_BYTES.
+    """
+    from core.binary_info import BinaryInfo, sha256_of
+    from core.security_checks import SecurityChecker
+    from core.entropy import EntropyAnalyzer, WINDOW_SIZE
+    from core.packer_detector import PackerDetector
+    from core.binary_buffer import BinaryBuffer
+    from core import hashing
+    from core import streaming
+    from core.metrics import Metrics, stage
+    from core.results import AnalysisReport
+    from core.result_cache import ResultCache, ANALYSIS_VERSION, DEFAULT_MAX_BYTES
+    
+    window_size = window_size or WINDOW_SIZE
+    cache_size = cache_size or DEFAULT_MAX_BYTES
+    text = output == "text"
+    report = AnalysisReport(str(filepath))
+    
     if not os.path.exists(filepath):
-        print(f"[!] Error: File Not Found: {filepath}")
-        return
+        report.error = f"File Not Found: {filepath}"
+        if text:
+            print(f"[!] Error: {report.error}")
+        return report
+    
+    if text:
+        print(f"\n[*] Analyzing: {filepath}\n")
+
+    metrics = Metrics() if timings else None
+    if stream is None:
+        stream = os.path.getsize(filepath) >= streaming.STREAM_THRESHOLD
+    with stage(metrics, 'open'):
+        binary = BinaryBuffer(filepath, metrics, streaming=stream)
     
-    print(f"\n[*] Analyzing: {filepath}\n")
+    # The file is opened and mapped once; every stage shares the same buffer
+    with binary:
+        if stream:
+            with stage(metrics, 'stream'):
+                streaming.run(binary, PackerDetector.preload()[1])
+        elif hash_thread:
+            hashing.start(binary)
+        if claim is not None and not claim(sha256_of(binary)):
+            return report
+        store = ResultCache.open(cache, cache_size) if cache else None
+        sha256 = sha256_of(binary) if store else None
+        profile_key = f"{window_size}/{stride}" if entropy_profile else "-"
+        
+        _heading("Basic Information", text)
+        
+        with stage(metrics, 'info'):
+            # The ssdeep field depends on which ssdeep module is installed
+            binary_info = _cached_stage(store, sha256, 'info',
+                                        f"{ANALYSIS_VERSION}:{hashing.SSDEEP_BACKEND}",
+                                        lambda: BinaryInfo(binary),
+                                        lambda data: BinaryInfo.from_dict(binary, data))
+        report.info = binary_info.result()
+        if text:
+            binary_info.display()
+        
+        # 2. Sec checks
+        if text:
+            print("")
+        _heading("Security Checks", text)
+        
+        with stage(metrics, 'security'):
+            security = _cached_stage(store, sha256, 'security', ANALYSIS_VERSION,
+                                     lambda: SecurityChecker(binary, binary_info.binary_type),
+                                     lambda data: SecurityChecker.from_dict(binary, data))
+        report.security = security.result()
+        if text:
+            security.display()
+            print("")
 
-    print(f"Basic Information")
-    print(f"{'='*60}")
+        # 3. Entropi     
+        _heading("Entropy Analysis", text)
+        
+        with stage(metrics, 'entropy'):
+            entropy = _cached_stage(store, sha256, 'entropy', f"{ANALYSIS_VERSION}:{profile_key}",
+                                    lambda: EntropyAnalyzer(binary, binary_info.binary_type,
+                                                            entropy_profile, window_size, stride),
+                                    lambda data: EntropyAnalyzer.from_dict(binary, data))
+        report.entropy = entropy.result()
+        if text:
+            entropy.display()
+        
+        # 4. Packer 
+        if text:
+            print("")
+        _heading("Packer Detection", text)
+        
+        # Keyed on the plugin sources: a signature update only invalidates this stage
+        with stage(metrics, 'packer'):
+            packer = _cached_stage(store, sha256, 'packer',
+                                   f"{PackerDetector.plugin_version()}:{profile_key}",
+                                   lambda: PackerDetector(binary, binary_info.binary_type,
+                                                          entropy.entropy_value, entropy.profile),
+                                   lambda data: PackerDetector.from_dict(
+                                       binary, binary_info.binary_type, data))
+        report.packer = packer.result()
+        if text:
+            packer.display()
+        
+        # 5. Strings
+        if strings or string_index:
+            from core import strings as string_extractor
+            with stage(metrics, 'strings'):
+                entries = string_extractor.for_binary(binary, binary_info.binary_type)
+            if string_index:
+                from core.string_index import StringIndex
+                with stage(metrics, 'string_index'):
+                    StringIndex.open(string_index).add(sha256_of(binary), filepath,
+                                                       len(binary), entries)
+            if strings:
+                report.strings = entries
+                if text:
+                    print("")
+                    _heading("Strings", text)
+                    string_extractor.display(entries)
+        
+        # 6. Similar samples
+        if similarity_index:
+            from core import similarity
+            with stage(metrics, 'similarity'):
+                fingerprint = similarity.for_binary(binary, binary_info.binary_type)
+            if fingerprint is not None:
+                index = similarity.SimilarityIndex.open(similarity_index)
+                with stage(metrics, 'similarity_index'):
+                    sha256 = sha256_of(binary)
+                    report.similar = index.nearest(fingerprint, exclude=sha256)
+                    index.add(sha256, filepath, len(binary), fingerprint)
+                if text:
+                    print("")
+                    _heading("Similar Samples", text)
+                    similarity.display(report.similar)
     
-    binary_info = BinaryInfo(filepath)
-    binary_info.display()
+    if metrics:
+        report.metrics = metrics.to_dict()
+        if text:
+            print("")
+            _heading("Timings", text)
+            metrics.display()
     
-    # 2. Sec checks
-    print("")
-    print(f"Security Checks")
-    print(f"{'='*60}")
+    if text:
+        print(f"\n[✓] Analyze Complated!\n")
+    return report
+
+def find_binaries(directory):
+    """Regular files under directory (recursive, symlinks not followed)"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                yield path
+
+_profiler = None
+_profile_path = None
+
+def init_worker(profile_path=None):
+    """Pool initializer shared by batch mode, the service and the watch daemon"""
+    global _profiler, _profile_path
+    from core.packer_detector import PackerDetector
+    # Import the packer plugins once per worker, not once per file
+    PackerDetector.preload()
+    if profile_path:
+        # Each worker process keeps its own profile, dumped to PATH.<pid>
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profile_path = f"{profile_path}.{os.getpid()}"
+
+def analyze_worker(filepath, options):
+    """Run analyze_binary in a worker; hand back its text and report dict"""
+    import contextlib
+    import io
+    from core.results import AnalysisReport
     
-    security = SecurityChecker(filepath, binary_info.binary_type)
-    security.display()
-    print("")
+    output = io.StringIO()
+    error = None
+    record = None
+    if _profiler:
+        _profiler.enable()
+    try:
+        size = os.path.getsize(filepath)
+        with contextlib.redirect_stdout(output):
+            record = analyze_binary(filepath, **options).to_dict()
+    except Exception as e:
+        size = 0
+        error = str(e)
+        record = AnalysisReport(filepath, error=error).to_dict()
+    finally:
+        if _profiler:
+            _profiler.disable()
+            # Pool workers are not told when they exit: rewrite after every file
+            _profiler.dump_stats(_profile_path)
+    return filepath, size, output.getvalue(), record, error
 
-    # 3. Entropi     
-    print(f"Entropy Analysis")
-    print(f"{'='*60}")
+def write_record(record, output, first):
+    """One report as an NDJSON line or as an element of a streamed JSON array"""
+    import json
+    line = json.dumps(record, ensure_ascii=False)
+    if output == "ndjson":
+        sys.stdout.write(line + "\n")
+    else:
+        sys.stdout.write(("[\n" if first else ",\n") + line)
+    sys.stdout.flush()
+
+def analyze_batch(paths, jobs=None, profile=None, **options):
+    """Analyze many files over a process pool and print throughput
+
+    With output="json"/"ndjson" reports are streamed to stdout as they
+    finish and the summary goes to stderr. profile: with more than one job
+    every worker writes its cProfile dump to PROFILE.<pid>.
+    """
+    import contextlib
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+    from core.metrics import Metrics
+    
+    paths = list(paths)
+    output = options.get("output", "text")
+    log = sys.stdout if output == "text" else sys.stderr
+    jobs = jobs or os.cpu_count() or 1
+    total_bytes = 0
+    failed = 0
+    totals = Metrics() if options.get("timings") else None
+    start = time.perf_counter()
+    
+    if jobs == 1:
+        init_worker()
+        results = (analyze_worker(path, options) for path in paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                       initargs=(profile,))
+        # Larger chunks amortize IPC when there are many small samples
+        chunksize = max(1, min(32, len(paths) // (jobs * 4)))
+        results = executor.map(analyze_worker, paths, [options] * len(paths),
+                               chunksize=chunksize)
     
-    entropy = EntropyAnalyzer(filepath)
-    entropy.display()
+    try:
+        for index, (filepath, size, text, record, error) in enumerate(results):
+            total_bytes += size
+            if output == "text":
+                sys.stdout.write(text)
+            else:
+                write_record(record, output, index == 0)
+            if error:
+                failed += 1
+                print(f"[!] Error: {filepath}: {error}", file=log)
+            if totals and record.get("metrics"):
+                totals.merge(record["metrics"])
+    finally:
+        if executor:
+            executor.shutdown()
     
-    # 4. Packer 
-    print("")
-    print(f"Packer Detection")
-    print(f"{'='*60}")
+    if output == "json":
+        sys.stdout.write("\n]\n" if paths else "[]\n")
     
-    packer = PackerDetector(filepath, binary_info.binary_type, entropy.entropy_value)
-    packer.display()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    megabytes = total_bytes / (1024 * 1024)
+    print(f"{'='*60}", file=log)
+    print(f"[✓] Batch Complete: {len(paths)} files ({failed} failed), {megabytes:.2f} MB "
+          f"in {elapsed:.2f}s with {jobs} jobs", file=log)
+    print(f"Throughput: {len(paths) / elapsed:.2f} files/sec, {megabytes / elapsed:.2f} MB/sec",
+          file=log)
     
-    print(f"\n[✓] Analyze Complated!\n")
+    if totals:
+        # Summed over workers: wall time here is worker time, not elapsed time
+        print("\nTimings (all files)", file=log)
+        print(f"{'='*60}", file=log)
+        with contextlib.redirect_stdout(log):
+            totals.display()
 
-def main():    
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <binary_file>")
-        print(f"ex:   {sys.argv[0]} a.exe")
-        print(f"ex:   {sys.argv[0]} a.out")
+def search_strings(term, index_path, exact=False, output="text"):
+    """Print the indexed occurrences of term"""
+    import json
+    from core.string_index import StringIndex
+    
+    if not os.path.exists(index_path):
+        print(f"[!] Error: String Index Not Found: {index_path}")
         sys.exit(1)
+    matches = StringIndex.open(index_path).search(term, exact)
+    if output == "json":
+        print(json.dumps(matches, indent=2, ensure_ascii=False))
+    elif output == "ndjson":
+        for match in matches:
+            print(json.dumps(match, ensure_ascii=False))
+    else:
+        _heading(f"Strings matching {term!r}", True)
+        for match in matches:
+            print(f"{match['path']}  0x{match['offset']:08x}  {match['encoding']:<8}  "
+                  f"{match['section'] or '-':<8}  {match['value']}")
+        print(f"\n[*] {len(matches)} occurrence(s)")
+
+def main():    
+    import argparse
+    from core.result_cache import DEFAULT_PATH, DEFAULT_MAX_BYTES
+    from core.string_index import DEFAULT_PATH as STRING_INDEX_PATH
+    from core.similarity import DEFAULT_PATH as SIMILARITY_INDEX_PATH
+    
+    parser = argparse.ArgumentParser(
+        description="Static triage of ELF/PE binaries",
+        epilog=f"ex: {sys.argv[0]} a.exe | {sys.argv[0]} --recursive samples/ --jobs 8")
+    parser.add_argument("binary_file", nargs="?", help="Binary to analyze")
+    parser.add_argument("--recursive", "-r", metavar="DIR",
+                        help="Analyze every file under DIR")
+    parser.add_argument("--serve", nargs="?", const="", metavar="ADDRESS",
+                        help="Run as an HTTP analysis service on HOST:PORT or unix:PATH "
+                             "(default 127.0.0.1:8765)")
+    parser.add_argument("--watch", "-w", action="append", metavar="DIR",
+                        help="Analyze files as they are dropped under DIR (repeatable; "
+                             "runs until SIGINT/SIGTERM)")
+    parser.add_argument("--settle", type=float, default=2.0, metavar="SECONDS",
+                        help="With --watch, wait until a file is unchanged this long (default 2)")
+    parser.add_argument("--poll", type=float, metavar="SECONDS",
+                        help="With --watch, list the directories every SECONDS instead of "
+                             "using inotify")
+    parser.add_argument("--jobs", "-j", type=int,
+                        help="Worker processes for --recursive / --serve / --watch "
+                             "(default: CPU count)")
+    parser.add_argument("--concurrency", type=int,
+                        help="Analyses in progress at once with --serve (default: --jobs)")
+    parser.add_argument("--queue-size", type=int, default=64, metavar="N",
+                        help="Requests --serve queues before answering 503 (default 64)")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_PATH, metavar="PATH",
+                        help=f"Reuse results of already seen files (default {DEFAULT_PATH})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        metavar="MB", help="Result cache size limit, LRU evicted (default 512)")
+    parser.add_argument("--entropy-profile", action="store_true",
+                        help="Sliding-window and per-section entropy profile")
+    parser.add_argument("--window", type=int,
+                        help="Profile window size in bytes (default 16 KiB)")
+    parser.add_argument("--stride", type=int,
+                        help="Profile stride in bytes, must divide --window (default window/2)")
+    parser.add_argument("--strings", action="store_true",
+                        help="List ASCII/UTF-16LE strings with offset and section")
+    parser.add_argument("--string-index", nargs="?", const=STRING_INDEX_PATH, metavar="PATH",
+                        help=f"Add extracted strings to a searchable index "
+                             f"(default {STRING_INDEX_PATH})")
+    parser.add_argument("--search", metavar="TERM",
+                        help="Find samples containing TERM in the string index")
+    parser.add_argument("--exact", action="store_true",
+                        help="With --search, match whole strings only")
+    parser.add_argument("--similarity-index", nargs="?", const=SIMILARITY_INDEX_PATH,
+                        metavar="PATH",
+                        help=f"Report the nearest known samples and add the file to a "
+                             f"MinHash/LSH index (default {SIMILARITY_INDEX_PATH})")
+    parser.add_argument("--format", choices=("text", "json", "ndjson"), default="text",
+                        help="Report format; json/ndjson emit one record per file")
+    parser.add_argument("--stream", action="store_true", default=None,
+                        help="One bounded-memory pass for hashes/strings/signatures "
+                             "(automatic for files of 1 GiB and more)")
+    parser.add_argument("--hash-thread", action="store_true",
+                        help="Compute MD5/SHA1/SHA256/ssdeep/CTPH on a background thread")
+    parser.add_argument("--timings", action="store_true",
+                        help="Per-stage / per-packer-module time, I/O and syscall counters")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Write a cProfile dump (PATH.<pid> per worker with --jobs > 1)")
+    args = parser.parse_args()
+    
+    if args.window is not None or args.stride is not None:
+        from core.entropy import profile_window
+        try:
+            profile_window(args.window, args.stride)
+        except ValueError as e:
+            parser.error(f"--window / --stride: {e}")
+    if sum(map(bool, (args.binary_file, args.recursive, args.serve is not None,
+                      args.search, args.watch))) != 1:
+        parser.error("give either a binary_file, --recursive DIR, --serve, --search or --watch DIR")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if (args.concurrency is not None and args.concurrency < 1) or args.queue_size < 1:
+        parser.error("--concurrency and --queue-size must be at least 1")
+    if args.settle < 0 or (args.poll is not None and args.poll <= 0):
+        parser.error("--settle must be at least 0 and --poll positive")
+    for directory in args.watch or ():
+        if not os.path.isdir(directory):
+            parser.error(f"--watch: Directory Not Found: {directory}")
+    
+    options = dict(entropy_profile=args.entropy_profile,
+                   window_size=args.window, stride=args.stride,
+                   cache=args.cache, cache_size=args.cache_size * 1024 * 1024,
+                   output=args.format, timings=args.timings, hash_thread=args.hash_thread,
+                   stream=args.stream, strings=args.strings, string_index=args.string_index,
+                   similarity_index=args.similarity_index)
+    
+    if args.search:
+        search_strings(args.search, args.string_index or STRING_INDEX_PATH, args.exact,
+                       args.format)
+        return
+    
+    if args.serve is not None:
+        import service
+        del options["output"]
+        service.run(args.serve, jobs=args.jobs, concurrency=args.concurrency,
+                    queue_size=args.queue_size, profile=args.profile, **options)
+        return
+    
+    if args.watch:
+        import watch
+        watch.watch(args.watch, jobs=args.jobs, settle=args.settle, poll=args.poll,
+                    profile=args.profile, **options)
+        return
+    
+    # In-process runs are profiled here; pool workers profile themselves
+    in_process = not args.recursive or args.jobs == 1
+    profiler = None
+    if args.profile and in_process:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    
+    if args.recursive:
+        if not os.path.isdir(args.recursive):
+            print(f"[!] Error: Directory Not Found: {args.recursive}")
+            sys.exit(1)
+        analyze_batch(find_binaries(args.recursive), args.jobs,
+                      None if in_process else args.profile, **options)
+    else:
+        report = analyze_binary(args.binary_file, **options)
+        if args.format == "json":
+            print(report.to_json(indent=2))
+        elif args.format == "ndjson":
+            print(report.to_json())
+        if report.error:
+            sys.exit(1)
     
-    binary_path = sys.argv[1]
-    analyze_binary(binary_path)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"[*] Profile written to {args.profile}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
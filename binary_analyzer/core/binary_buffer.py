@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import os
+import mmap
+from concurrent.futures import Future
+
+class BinaryBuffer:
+    """Read-only, memory-mapped handle shared by every analysis stage.
+
+    The file is opened and mapped once; stages read it through zero-copy
+    memoryview slices instead of re-opening and re-reading the path.
+    With streaming=True the pages of every chunk handed out by chunks() are
+    dropped from the process once the consumer moves on, so sequential
+    passes over files larger than RAM keep a bounded resident set.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, filepath, metrics=None, streaming=False):
+        self.filepath = filepath
+        # Optional core.metrics.Metrics; shared computations are timed by key
+        self.metrics = metrics
+        self.streaming = streaming
+        self._file = open(filepath, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # mmap can not map empty files
+            self._map = b''
+        self.view = memoryview(self._map)
+        self._memo = {}
+
+    def memo(self, key, factory):
+        """Compute a per-file value once and share it between stages"""
+        if key not in self._memo:
+            if self.metrics is None:
+                self._memo[key] = factory()
+            else:
+                with self.metrics.stage(key):
+                    self._memo[key] = factory()
+        return self._memo[key]
+
+    def get(self, key, default=None):
+        """Memoized value of key, without computing it"""
+        return self._memo.get(key, default)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        return self._map[key]
+
+    def __contains__(self, needle):
+        return self._map.find(needle) != -1
+
+    def __fspath__(self):
+        # Plugins written against the old path-based contract can still open() us
+        return os.fspath(self.filepath)
+
+    def find(self, needle, start=0, end=None):
+        if end is None:
+            end = self.size
+        return self._map.find(needle, start, end)
+
+    def count(self, needle):
+        """Non-overlapping occurrences of needle (mmap has no count())"""
+        count = 0
+        pos = self._map.find(needle)
+        while pos != -1:
+            count += 1
+            pos = self._map.find(needle, pos + len(needle))
+        return count
+
+    def chunks(self, chunk_size=None, start=0, end=None):
+        """Zero-copy memoryview chunks of [start, end), the whole file by default"""
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        end = self.size if end is None else min(end, self.size)
+        for offset in range(start, end, chunk_size):
+            stop = min(offset + chunk_size, end)
+            yield self.view[offset:stop]
+            if self.streaming:
+                self.release(offset, stop)
+
+    def release(self, start, end):
+        """Drop the mapped pages of [start, end) from the resident set
+
+        The data stays in the page cache; touching it again faults it back.
+        """
+        start -= start % mmap.PAGESIZE
+        if end > start and isinstance(self._map, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED'):
+            self._map.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def close(self):
+        if self._file is None:
+            return
+        # Background work (hashing.start) may still be reading the map
+        for value in self._memo.values():
+            if isinstance(value, Future):
+                value.exception()
+        self._memo.clear()
+        self.view.release()
+        if isinstance(self._map, mmap.mmap):
+            try:
+                self._map.close()
+            except BufferError:
+                # A stage still holds a slice; the map is freed with it
+                pass
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
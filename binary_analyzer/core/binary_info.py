@@ -1,67 +1,76 @@
 #!/usr/bin/env python3
 
-import os
-import hashlib
-import struct
 from pathlib import Path
 
+from core import byte_stats
+from core import elf_parser
+from core import hashing
+from core import pe_parser
+from core.results import BasicInfoResult
+
+def sha256_of(binary):
+    """SHA256 of a BinaryBuffer (also the result cache key); all digests come from the same pass"""
+    return hashing.for_binary(binary).sha256
+
 class BinaryInfo:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.filesize = os.path.getsize(filepath)
-        self.sha256 = self._calculate_sha256()
+    # Attributes saved in / restored from the result cache
+    CACHE_FIELDS = ('filesize', 'md5', 'sha1', 'sha256', 'ssdeep', 'ctph', 'imphash',
+                    'binary_type', 'architecture', 'stripped', 'section_count', 'strings_count')
+    
+    def __init__(self, binary):
+        self.binary = binary
+        self.filepath = binary.filepath
+        self.filesize = len(binary)
         self.binary_type = self._detect_binary_type()
         self.architecture = self._detect_architecture()
         self.stripped = self._is_stripped()
         self.section_count = self._count_sections()
         self.strings_count = self._count_strings()
+        # Last: a background hashing.start() gets the longest head start
+        self._calculate_hashes()
         
-    def _calculate_sha256(self):
-        """SHA256 hash hesapla"""
-        sha256_hash = hashlib.sha256()
-        with open(self.filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+    def _calculate_hashes(self):
+        """MD5 / SHA1 / SHA256 / ssdeep / CTPH ve imphash hesapla (tek geçiş)"""
+        digests = hashing.for_binary(self.binary)
+        self.md5 = digests.md5
+        self.sha1 = digests.sha1
+        self.sha256 = digests.sha256
+        self.ssdeep = digests.ssdeep
+        self.ctph = digests.ctph
+        self.imphash = digests.imphash
     
     def _detect_binary_type(self):
         """Binary tipini tespit et (ELF veya PE)"""
-        with open(self.filepath, "rb") as f:
-            magic = f.read(4)
-            if magic[:4] == b'\x7fELF':
-                return "ELF"
-            elif magic[:2] == b'MZ':
-                return "PE"
-            else:
-                return "UNKNOWN"
+        magic = self.binary[:4]
+        if magic[:4] == b'\x7fELF':
+            return "ELF"
+        elif magic[:2] == b'MZ':
+            return "PE"
+        else:
+            return "UNKNOWN"
     
     def _detect_architecture(self):
         """Mimari tespit et"""
         try:
-            with open(self.filepath, "rb") as f:
-                if self.binary_type == "ELF":
-                    f.seek(0x12)
-                    e_machine = struct.unpack('<H', f.read(2))[0]
-                    arch_map = {
-                        0x03: "x86",
-                        0x3E: "x86-64",
-                        0x28: "ARM",
-                        0xB7: "AArch64"
-                    }
-                    return arch_map.get(e_machine, f"Unknown (0x{e_machine:x})")
-                
-                elif self.binary_type == "PE":
-                    f.seek(0x3C)
-                    pe_offset = struct.unpack('<I', f.read(4))[0]
-                    f.seek(pe_offset + 4)
-                    machine = struct.unpack('<H', f.read(2))[0]
-                    arch_map = {
-                        0x014c: "x86",
-                        0x8664: "x86-64",
-                        0x01c0: "ARM",
-                        0xAA64: "AArch64"
-                    }
-                    return arch_map.get(machine, f"Unknown (0x{machine:x})")
+            if self.binary_type == "ELF":
+                e_machine = elf_parser.for_binary(self.binary).e_machine
+                arch_map = {
+                    0x03: "x86",
+                    0x3E: "x86-64",
+                    0x28: "ARM",
+                    0xB7: "AArch64"
+                }
+                return arch_map.get(e_machine, f"Unknown (0x{e_machine:x})")
+            
+            elif self.binary_type == "PE":
+                machine = pe_parser.for_binary(self.binary).machine
+                arch_map = {
+                    0x014c: "x86",
+                    0x8664: "x86-64",
+                    0x01c0: "ARM",
+                    0xAA64: "AArch64"
+                }
+                return arch_map.get(machine, f"Unknown (0x{machine:x})")
         except:
             return "Unknown"
         
@@ -71,10 +80,8 @@ class BinaryInfo:
         """Binary stripped mi kontrol et"""
         if self.binary_type == "ELF":
             try:
-                import subprocess
-                result = subprocess.run(['file', self.filepath], 
-                                      capture_output=True, text=True)
-                return 'stripped' in result.stdout.lower()
+                # No .symtab section left
+                return elf_parser.for_binary(self.binary).stripped
             except:
                 return None
         return None
@@ -83,17 +90,9 @@ class BinaryInfo:
         """Section sayısını say"""
         try:
             if self.binary_type == "ELF":
-                with open(self.filepath, "rb") as f:
-                    f.seek(0x30)
-                    e_shnum = struct.unpack('<H', f.read(2))[0]
-                    return e_shnum
+                return len(elf_parser.for_binary(self.binary).sections)
             elif self.binary_type == "PE":
-                with open(self.filepath, "rb") as f:
-                    f.seek(0x3C)
-                    pe_offset = struct.unpack('<I', f.read(4))[0]
-                    f.seek(pe_offset + 6)
-                    num_sections = struct.unpack('<H', f.read(2))[0]
-                    return num_sections
+                return pe_parser.for_binary(self.binary).coff.number_of_sections
         except:
             return None
         return None
@@ -101,29 +100,41 @@ class BinaryInfo:
     def _count_strings(self):
         """Okunabilir string sayısını say (min 4 karakter)"""
         try:
-            count = 0
-            with open(self.filepath, "rb") as f:
-                data = f.read()
-                current_string = []
-                for byte in data:
-                    if 32 <= byte <= 126:
-                        current_string.append(chr(byte))
-                    else:
-                        if len(current_string) >= 4:
-                            count += 1
-                        current_string = []
-                if len(current_string) >= 4:
-                    count += 1
-            return count
+            return byte_stats.for_binary(self.binary).string_count
         except:
             return None
     
+    def result(self):
+        return BasicInfoResult(str(self.filepath), self.filesize, self.md5, self.sha1,
+                               self.sha256, self.ssdeep, self.ctph, self.imphash, self.binary_type,
+                               self.architecture, self.stripped, self.section_count,
+                               self.strings_count)
+    
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.CACHE_FIELDS}
+    
+    @classmethod
+    def from_dict(cls, binary, data):
+        """Rebuild from a cached to_dict() without running the checks"""
+        info = cls.__new__(cls)
+        info.binary = binary
+        info.filepath = binary.filepath
+        info.__dict__.update(data)
+        return info
+    
     def display(self):
         """Bilgileri ekrana yazdır"""
         print(f"File: {self.filepath}")
         print(f"Type: {self.binary_type}")
         print(f"Size: {self.filesize:,} bytes ({self.filesize / 1024:.2f} KB)")
+        print(f"MD5: {self.md5}")
+        print(f"SHA1: {self.sha1}")
         print(f"SHA256: {self.sha256}")
+        if self.ssdeep:
+            print(f"SSDEEP: {self.ssdeep}")
+        print(f"CTPH: {self.ctph}")
+        if self.imphash:
+            print(f"Imphash: {self.imphash}")
         print(f"Arch: {self.architecture}")
         
         if self.stripped is not None:
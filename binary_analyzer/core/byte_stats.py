@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Bulk byte statistics shared by the entropy and string counting stages.
+
+A single pass over the buffer builds the 256-bin byte histogram and counts
+printable ASCII runs. NumPy is used when available; otherwise the work is
+pushed into C through collections.Counter and the re module.
+"""
+
+import math
+import re
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CHUNK_SIZE = 4 * 1024 * 1024
+NUMPY_BLOCK = 256 * 1024
+MIN_STRING_LENGTH = 4
+
+_PRINTABLE = bytes(range(32, 127))
+_LEADING_RUN = re.compile(rb'[\x20-\x7e]*')
+
+
+class ByteStats:
+    """Incremental byte histogram + printable run counter.
+
+    Chunks may be fed in any size; runs that span chunk boundaries are
+    carried over so the result equals a single pass over the whole input.
+    """
+
+    def __init__(self, min_string=MIN_STRING_LENGTH, use_numpy=None):
+        if use_numpy is None:
+            use_numpy = np is not None
+        self.use_numpy = use_numpy
+        self.min_string = min_string
+        self.length = 0
+        self.string_count = 0
+        self._run = 0  # printable run still open at the end of the last chunk
+        self._finalized = False
+
+        if self.use_numpy:
+            self._histogram = np.zeros(256, dtype=np.int64)
+            self._tail = np.zeros(min_string, dtype=np.bool_)
+        else:
+            self._histogram = Counter()
+            self._run_re = re.compile(rb'[\x20-\x7e]{%d,}' % min_string)
+
+    def update(self, chunk):
+        if not len(chunk):
+            return
+        self.length += len(chunk)
+        if self.use_numpy:
+            self._update_numpy(chunk)
+        else:
+            self._update_python(chunk)
+
+    def _update_numpy(self, chunk):
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        # Small blocks keep the temporaries in cache
+        for start in range(0, len(data), NUMPY_BLOCK):
+            block = data[start:start + NUMPY_BLOCK]
+            self._histogram += np.bincount(block, minlength=256)
+
+            # A run of >= min_string printable bytes ends at i when the
+            # min_string bytes before i are printable and byte i is not
+            mask = (block - np.uint8(32)) < np.uint8(95)
+            ext = np.concatenate((self._tail, mask))
+            size = len(mask)
+            ends = ext[:size].copy()
+            for shift in range(1, self.min_string):
+                ends &= ext[shift:shift + size]
+            ends &= ~ext[self.min_string:]
+            self.string_count += int(np.count_nonzero(ends))
+            self._tail = ext[-self.min_string:]
+
+    def _update_python(self, chunk):
+        self._histogram.update(chunk)
+
+        size = len(chunk)
+        lead = _LEADING_RUN.match(chunk).end()
+        if lead == size:
+            self._run += size
+            return
+        self._run += lead
+        self._close_run()
+
+        last = None
+        for last in self._run_re.finditer(chunk, lead):
+            self.string_count += 1
+
+        if last is not None and last.end() == size:
+            # Still open, may continue in the next chunk
+            self.string_count -= 1
+            self._run = last.end() - last.start()
+        else:
+            tail = 0
+            while tail < size and chunk[size - tail - 1] in _PRINTABLE:
+                tail += 1
+            self._run = tail
+
+    def _close_run(self):
+        if self._run >= self.min_string:
+            self.string_count += 1
+        self._run = 0
+
+    def finalize(self):
+        if not self._finalized:
+            if self.use_numpy and self._tail.all():
+                self.string_count += 1
+            self._close_run()
+            self._finalized = True
+        return self
+
+    @property
+    def histogram(self):
+        """256 element list of byte counts"""
+        if self.use_numpy:
+            return [int(c) for c in self._histogram]
+        return [self._histogram.get(i, 0) for i in range(256)]
+
+    def entropy(self):
+        """Shannon entropy (bits per byte) of everything fed so far"""
+        return shannon_entropy(self.histogram, self.length)
+
+
+def shannon_entropy(histogram, length):
+    if length == 0:
+        return 0.0
+    entropy = 0.0
+    for count in histogram:
+        if count:
+            probability = count / length
+            entropy -= probability * math.log2(probability)
+    return entropy
+
+
+def compute(chunks, min_string=MIN_STRING_LENGTH, use_numpy=None):
+    """Run ByteStats over an iterable of chunks"""
+    stats = ByteStats(min_string=min_string, use_numpy=use_numpy)
+    for chunk in chunks:
+        stats.update(chunk)
+    return stats.finalize()
+
+
+def for_binary(binary):
+    """ByteStats of a BinaryBuffer, computed once and shared between stages"""
+    return binary.memo('byte_stats', lambda: compute(binary.chunks(CHUNK_SIZE)))
+
+
+def histogram(data):
+    """256-bin byte histogram of a single buffer (no string counting)"""
+    if np is not None:
+        counts = np.zeros(256, dtype=np.int64)
+        array = np.frombuffer(data, dtype=np.uint8)
+        for start in range(0, len(array), NUMPY_BLOCK):
+            counts += np.bincount(array[start:start + NUMPY_BLOCK], minlength=256)
+        return [int(c) for c in counts]
+    counts = Counter(data)
+    return [counts.get(i, 0) for i in range(256)]
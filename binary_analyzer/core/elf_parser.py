@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+In-process ELF parser.
+
+Reads the ELF header, program headers, section headers, dynamic section,
+symbol tables and PT_INTERP straight out of one buffer with
+struct.unpack_from, for 32/64-bit and little/big-endian files. Replaces
+the readelf / file subprocesses the checks used to spawn.
+"""
+
+import struct
+
+# p_type
+PT_LOAD = 1
+PT_DYNAMIC = 2
+PT_INTERP = 3
+PT_GNU_STACK = 0x6474e551
+PT_GNU_RELRO = 0x6474e552
+
+# p_flags
+PF_X = 0x1
+
+# sh_type
+SHT_NULL = 0
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_DYNAMIC = 6
+SHT_NOBITS = 8
+SHT_DYNSYM = 11
+
+# d_tag
+DT_NULL = 0
+DT_BIND_NOW = 24
+DT_FLAGS = 30
+DT_FLAGS_1 = 0x6ffffffb
+
+DF_BIND_NOW = 0x8
+DF_1_NOW = 0x1
+
+SHN_XINDEX = 0xffff
+
+
+class ElfFormatError(ValueError):
+    pass
+
+
+class _Layout:
+    """Precompiled struct formats for one ELF class / byte order"""
+
+    def __init__(self, is_64, endian):
+        if is_64:
+            self.header = struct.Struct(endian + 'HHIQQQIHHHHHH')
+            self.program = struct.Struct(endian + 'IIQQQQQQ')
+            self.section = struct.Struct(endian + 'IIQQQQIIQQ')
+            self.dynamic = struct.Struct(endian + 'qQ')
+            self.symbol = struct.Struct(endian + 'IBBHQQ')
+        else:
+            self.header = struct.Struct(endian + 'HHIIIIIHHHHHH')
+            self.program = struct.Struct(endian + 'IIIIIIII')
+            self.section = struct.Struct(endian + 'IIIIIIIIII')
+            self.dynamic = struct.Struct(endian + 'iI')
+            self.symbol = struct.Struct(endian + 'IIIBBH')
+
+
+_LAYOUTS = {
+    (is_64, endian): _Layout(is_64, endian)
+    for is_64 in (False, True) for endian in ('<', '>')
+}
+
+
+class ProgramHeader:
+    __slots__ = ('type', 'flags', 'offset', 'vaddr', 'filesz', 'memsz')
+
+    def __init__(self, type, flags, offset, vaddr, filesz, memsz):
+        self.type = type
+        self.flags = flags
+        self.offset = offset
+        self.vaddr = vaddr
+        self.filesz = filesz
+        self.memsz = memsz
+
+
+class SectionHeader:
+    __slots__ = ('name', 'type', 'flags', 'addr', 'offset', 'size', 'link', 'entsize')
+
+    def __init__(self, name, type, flags, addr, offset, size, link, entsize):
+        self.name = name
+        self.type = type
+        self.flags = flags
+        self.addr = addr
+        self.offset = offset
+        self.size = size
+        self.link = link
+        self.entsize = entsize
+
+
+class ElfFile:
+    """Parsed view of an ELF image held in a bytes-like buffer"""
+
+    def __init__(self, data):
+        if bytes(data[:4]) != b'\x7fELF':
+            raise ElfFormatError("not an ELF file")
+
+        self.data = data
+        self.is_64 = data[4] == 2
+        self.endian = '>' if data[5] == 2 else '<'
+        self._layout = _LAYOUTS[(self.is_64, self.endian)]
+
+        (self.e_type, self.e_machine, _, self.e_entry, self.e_phoff, self.e_shoff,
+         self.e_flags, _, self.e_phentsize, self.e_phnum, self.e_shentsize,
+         self.e_shnum, self.e_shstrndx) = self._layout.header.unpack_from(data, 16)
+
+        self.program_headers = self._parse_program_headers()
+        self.sections = self._parse_sections()
+        self._dynamic = None
+        self._symbol_names = None
+
+    # -- headers -----------------------------------------------------------
+
+    def _parse_program_headers(self):
+        headers = []
+        program = self._layout.program
+        if self.e_phentsize < program.size:
+            return headers
+        for i in range(self.e_phnum):
+            offset = self.e_phoff + i * self.e_phentsize
+            if offset + program.size > len(self.data):
+                break
+            fields = program.unpack_from(self.data, offset)
+            if self.is_64:
+                p_type, p_flags, p_offset, p_vaddr, _, p_filesz, p_memsz, _ = fields
+            else:
+                p_type, p_offset, p_vaddr, _, p_filesz, p_memsz, p_flags, _ = fields
+            headers.append(ProgramHeader(p_type, p_flags, p_offset, p_vaddr, p_filesz, p_memsz))
+        return headers
+
+    def _parse_sections(self):
+        section = self._layout.section
+        if not self.e_shoff or self.e_shentsize < section.size:
+            return []
+
+        def read(index):
+            offset = self.e_shoff + index * self.e_shentsize
+            if offset + section.size > len(self.data):
+                return None
+            return section.unpack_from(self.data, offset)
+
+        first = read(0)
+        if first is None:
+            return []
+        count = self.e_shnum
+        if count == 0:
+            # More than 0xff00 sections: the real count lives in section 0 sh_size
+            count = first[5]
+        # No more headers than the file can hold (hostile sh_size / e_shnum)
+        count = min(count, (len(self.data) - self.e_shoff) // self.e_shentsize)
+
+        raw = [first]
+        for index in range(1, count):
+            fields = read(index)
+            if fields is None:
+                break
+            raw.append(fields)
+
+        strndx = self.e_shstrndx
+        if strndx == SHN_XINDEX and raw:
+            strndx = raw[0][6]
+        strtab = raw[strndx][4] if strndx < len(raw) else None
+
+        sections = []
+        for sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, _, _, sh_entsize in raw:
+            name = self._string(strtab, sh_name) if strtab is not None else ""
+            sections.append(SectionHeader(name, sh_type, sh_flags, sh_addr, sh_offset,
+                                          sh_size, sh_link, sh_entsize))
+        return sections
+
+    def _string(self, table_offset, index):
+        start = table_offset + index
+        end = start
+        data = self.data
+        limit = len(data)
+        # Names are short; search in growing steps instead of to end of file
+        while end < limit:
+            chunk = bytes(data[end:min(end + 64, limit)])
+            nul = chunk.find(b'\x00')
+            if nul != -1:
+                return (bytes(data[start:end]) + chunk[:nul]).decode('latin-1')
+            end += len(chunk)
+        return bytes(data[start:limit]).decode('latin-1')
+
+    def segments(self, p_type):
+        return [ph for ph in self.program_headers if ph.type == p_type]
+
+    def section(self, name):
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    # -- derived information -----------------------------------------------
+
+    @property
+    def interpreter(self):
+        """Path in PT_INTERP (e.g. /lib64/ld-linux-x86-64.so.2) or None"""
+        for ph in self.segments(PT_INTERP):
+            raw = bytes(self.data[ph.offset:ph.offset + ph.filesz])
+            return raw.split(b'\x00', 1)[0].decode('latin-1')
+        return None
+
+    @property
+    def dynamic(self):
+        """[(d_tag, d_val)] from PT_DYNAMIC (or .dynamic) up to DT_NULL"""
+        if self._dynamic is None:
+            self._dynamic = []
+            region = None
+            for ph in self.segments(PT_DYNAMIC):
+                region = (ph.offset, ph.filesz)
+            if region is None:
+                for section in self.sections:
+                    if section.type == SHT_DYNAMIC:
+                        region = (section.offset, section.size)
+            if region is not None:
+                entry = self._layout.dynamic
+                offset, size = region
+                end = min(offset + size, len(self.data))
+                while offset + entry.size <= end:
+                    tag, value = entry.unpack_from(self.data, offset)
+                    if tag == DT_NULL:
+                        break
+                    self._dynamic.append((tag, value))
+                    offset += entry.size
+        return self._dynamic
+
+    @property
+    def bind_now(self):
+        for tag, value in self.dynamic:
+            if tag == DT_BIND_NOW:
+                return True
+            if tag == DT_FLAGS and value & DF_BIND_NOW:
+                return True
+            if tag == DT_FLAGS_1 and value & DF_1_NOW:
+                return True
+        return False
+
+    @property
+    def relro(self):
+        """"Full", "Partial" or "No" """
+        if not self.segments(PT_GNU_RELRO):
+            return "No"
+        return "Full" if self.bind_now else "Partial"
+
+    @property
+    def nx(self):
+        for ph in self.segments(PT_GNU_STACK):
+            return not (ph.flags & PF_X)
+        return False
+
+    @property
+    def pie(self):
+        # ET_DYN (3) = PIE or shared library
+        return self.e_type == 3
+
+    @property
+    def stripped(self):
+        """No .symtab left (what `file` reports as stripped)"""
+        return not any(section.type == SHT_SYMTAB for section in self.sections)
+
+    @property
+    def symbol_names(self):
+        """Names from .symtab and .dynsym"""
+        if self._symbol_names is None:
+            names = set()
+            symbol = self._layout.symbol
+            for section in self.sections:
+                if section.type not in (SHT_SYMTAB, SHT_DYNSYM):
+                    continue
+                if section.link >= len(self.sections):
+                    continue
+                strtab = self.sections[section.link].offset
+                entsize = section.entsize or symbol.size
+                end = min(section.offset + section.size, len(self.data))
+                for offset in range(section.offset, end - symbol.size + 1, entsize):
+                    st_name = symbol.unpack_from(self.data, offset)[0]
+                    if st_name:
+                        names.add(self._string(strtab, st_name))
+            self._symbol_names = names
+        return self._symbol_names
+
+    def has_symbol(self, name):
+        return name in self.symbol_names
+
+
+def for_binary(binary):
+    """ElfFile of a BinaryBuffer, parsed once and shared between stages"""
+    return binary.memo('elf', lambda: ElfFile(binary.view))
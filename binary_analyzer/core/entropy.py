@@ -1,33 +1,34 @@
 #!/usr/bin/env python3
 
-import math
-from collections import Counter
+from collections import Counter, deque
+
+from core import byte_stats
+from core.results import EntropyResult, EntropyProfileResult, EntropySection
+from core.sections import Section, parse_sections
+
+np = byte_stats.np
+
+WINDOW_SIZE = 16 * 1024
+HIGH_ENTROPY = 7.0
+PROFILE_BATCH_BYTES = 1024 * 1024
 
 class EntropyAnalyzer:
-    def __init__(self, filepath):
-        self.filepath = filepath
+    def __init__(self, binary, binary_type=None, profile=False,
+                 window_size=WINDOW_SIZE, stride=None):
+        self.binary = binary
+        self.filepath = binary.filepath
         self.entropy_value = self._calculate_entropy()
         self.assessment = self._assess_entropy()
+        
+        # Optional sliding-window / per-section profile
+        self.profile = None
+        if profile:
+            self.profile = EntropyProfile(binary, binary_type, window_size, stride)
     
     def _calculate_entropy(self):
         try:
-            with open(self.filepath, "rb") as f:
-                data = f.read()
-            if len(data) == 0:
-                return 0.0
-            # Byte freqs
-            byte_counts = Counter(data)
-            
-            # Shannon entropy 
-            entropy = 0.0
-            length = len(data)
-            
-            for count in byte_counts.values():
-                probability = count / length
-                if probability > 0:
-                    entropy -= probability * math.log2(probability)
-            
-            return entropy
+            # Histogram is built once in bulk and shared with BinaryInfo
+            return byte_stats.for_binary(self.binary).entropy()
         except Exception as e:
             return None
     
@@ -46,6 +47,28 @@ class EntropyAnalyzer:
         else:
             return "Very Low (Mostly Repeated Data)"
     
+    def result(self):
+        return EntropyResult(self.entropy_value, self.assessment,
+                             self.profile.result() if self.profile else None)
+    
+    def to_dict(self):
+        return {
+            'entropy_value': self.entropy_value,
+            'assessment': self.assessment,
+            'profile': self.profile.to_dict() if self.profile else None,
+        }
+    
+    @classmethod
+    def from_dict(cls, binary, data):
+        """Rebuild from a cached to_dict() without rescanning the file"""
+        analyzer = cls.__new__(cls)
+        analyzer.binary = binary
+        analyzer.filepath = binary.filepath
+        analyzer.entropy_value = data['entropy_value']
+        analyzer.assessment = data['assessment']
+        analyzer.profile = EntropyProfile.from_dict(data['profile']) if data['profile'] else None
+        return analyzer
+    
     def display(self):
         if self.entropy_value is None:
             print(f"Entropy: Could not calculate")
@@ -58,3 +81,204 @@ class EntropyAnalyzer:
         filled = int((self.entropy_value / 8.0) * bar_length)
         bar = "█" * filled + "░" * (bar_length - filled)
         print(f"\nEntropy Graph: [{bar}]")
+        
+        if self.profile:
+            self.profile.display()
+
+
+def profile_window(window_size=None, stride=None):
+    """(window size, stride) with defaults filled in; ValueError when unusable"""
+    window_size = WINDOW_SIZE if window_size is None else window_size
+    if window_size <= 0:
+        raise ValueError("window size must be positive")
+    if stride is not None and stride <= 0:
+        raise ValueError("stride must be positive")
+    stride = stride or window_size // 2
+    if stride <= 0 or window_size % stride:
+        raise ValueError("window size must be a positive multiple of the stride")
+    return window_size, stride
+
+
+def peak_entropy(entropy, profile=None):
+    """Whole-file entropy, raised to the profile peak when a profile exists.
+
+    Packed stubs often sit in one section of an otherwise normal binary,
+    so detectors should look at the hottest region rather than the mean.
+    """
+    value = entropy or 0.0
+    if profile is not None:
+        value = max(value, profile.peak() or 0.0)
+    return value
+
+
+class EntropyProfile:
+    """Sliding-window and per-section entropy of a binary.
+
+    The file is split into stride sized strips; each window histogram is the
+    running sum of its strips, so every byte is counted once no matter how
+    much the windows overlap. The len % stride bytes after the last strip
+    get a final window aligned to the end of the file, so a stub or overlay
+    at the very end is never left out.
+    """
+
+    def __init__(self, binary, binary_type, window_size=WINDOW_SIZE, stride=None):
+        window_size, stride = profile_window(window_size, stride)
+
+        self.window_size = window_size
+        self.stride = stride
+        self.windows = []   # (offset, entropy)
+        self.sections = []  # (Section, entropy)
+
+        if len(binary) < window_size:
+            # Whole file fits into a single window
+            if len(binary):
+                self.windows.append((0, byte_stats.for_binary(binary).entropy()))
+        elif np is not None:
+            self._scan_windows_numpy(binary)
+        else:
+            self._scan_windows_python(binary)
+        if len(binary) >= window_size:
+            self._add_tail_window(binary)
+
+        for section in parse_sections(binary, binary_type):
+            if section.size:
+                counts = [0] * 256
+                for chunk in binary.chunks(byte_stats.CHUNK_SIZE, section.offset,
+                                           section.offset + section.size):
+                    counts = [a + b for a, b in zip(counts, byte_stats.histogram(chunk))]
+                value = byte_stats.shannon_entropy(counts, section.size)
+                self.sections.append((section, value))
+
+    def _scan_windows_numpy(self, binary):
+        stride, per_window = self.stride, self.window_size // self.stride
+        strips = len(binary) // stride
+        # Bounded batch keeps the (strips x 256) histogram arrays small
+        batch = max(1, min(PROFILE_BATCH_BYTES // stride, 4096))
+
+        carry = np.zeros((0, 256), dtype=np.int64)  # last per_window-1 strips
+        first_strip = 0
+
+        for chunk in binary.chunks(batch * stride, 0, strips * stride):
+            count = len(chunk) // stride
+            block = np.frombuffer(chunk, dtype=np.uint8).reshape(count, stride)
+            index = block + (np.arange(count, dtype=np.int64) * 256)[:, None]
+            hist = np.bincount(index.ravel(), minlength=count * 256).reshape(count, 256)
+
+            strip_hists = np.concatenate((carry, hist))
+            running = np.zeros((len(strip_hists) + 1, 256), dtype=np.int64)
+            np.cumsum(strip_hists, axis=0, out=running[1:])
+            window_hists = running[per_window:] - running[:-per_window]
+
+            if len(window_hists):
+                p = window_hists / self.window_size
+                logs = np.log2(p, out=np.zeros_like(p), where=p > 0)
+                values = -(p * logs).sum(axis=1)
+                offsets = (first_strip + np.arange(len(values))) * stride
+                self.windows.extend(zip(offsets.tolist(), values.tolist()))
+
+            carry = strip_hists[max(0, len(strip_hists) - (per_window - 1)):]
+            first_strip += len(strip_hists) - len(carry)
+
+    def _scan_windows_python(self, binary):
+        stride, per_window = self.stride, self.window_size // self.stride
+        strips = deque()
+        running = [0] * 256
+        index = 0
+
+        batch = max(1, PROFILE_BATCH_BYTES // stride) * stride
+        for chunk in binary.chunks(batch, 0, len(binary) // stride * stride):
+            for start in range(0, len(chunk), stride):
+                counts = Counter(chunk[start:start + stride])
+                for byte, count in counts.items():
+                    running[byte] += count
+                strips.append(counts)
+
+                if len(strips) > per_window:
+                    for byte, count in strips.popleft().items():
+                        running[byte] -= count
+                if len(strips) == per_window:
+                    offset = (index + 1 - per_window) * stride
+                    self.windows.append((offset, byte_stats.shannon_entropy(running, self.window_size)))
+                index += 1
+
+    def _add_tail_window(self, binary):
+        start = len(binary) - self.window_size
+        if self.windows and self.windows[-1][0] >= start:
+            return
+        counts = byte_stats.histogram(binary.view[start:])
+        self.windows.append((start, byte_stats.shannon_entropy(counts, self.window_size)))
+
+    def result(self):
+        return EntropyProfileResult(
+            self.window_size, self.stride,
+            [[offset, value] for offset, value in self.windows],
+            [EntropySection(section.name, section.offset, section.size, value)
+             for section, value in self.sections],
+            [list(region) for region in self.high_entropy_regions()],
+            self.peak())
+
+    def to_dict(self):
+        return {
+            'window_size': self.window_size,
+            'stride': self.stride,
+            'windows': self.windows,
+            'sections': [[section.name, section.offset, section.size, section.virtual_size,
+                          section.flags, value] for section, value in self.sections],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls.__new__(cls)
+        profile.window_size = data['window_size']
+        profile.stride = data['stride']
+        profile.windows = [tuple(window) for window in data['windows']]
+        profile.sections = [(Section(*fields[:5]), fields[5]) for fields in data['sections']]
+        return profile
+
+    def peak(self):
+        """Highest section entropy, or highest window entropy without sections"""
+        if self.sections:
+            return max(value for _, value in self.sections)
+        if self.windows:
+            return max(value for _, value in self.windows)
+        return None
+
+    def high_entropy_regions(self, threshold=HIGH_ENTROPY):
+        """Merged (start, end, max entropy) ranges of windows above threshold"""
+        regions = []
+        for offset, value in self.windows:
+            end = offset + self.window_size
+            if value < threshold:
+                continue
+            if regions and offset <= regions[-1][1]:
+                start, _, peak = regions[-1]
+                regions[-1] = (start, end, max(peak, value))
+            else:
+                regions.append((offset, end, value))
+        return regions
+
+    def sparkline(self, width=60):
+        if not self.windows:
+            return ""
+        levels = " ▁▂▃▄▅▆▇█"
+        values = [value for _, value in self.windows]
+        step = max(1, -(-len(values) // width))
+        buckets = [max(values[i:i + step]) for i in range(0, len(values), step)]
+        return "".join(levels[min(8, int(value / 8.0 * 8 + 0.5))] for value in buckets)
+
+    def display(self):
+        print(f"\nEntropy Profile (window {self.window_size:,} / stride {self.stride:,})")
+        print(f"[{self.sparkline()}]")
+
+        if self.sections:
+            print("\nSection Entropy:")
+            for section, value in self.sections:
+                marker = "  <-- high" if value >= HIGH_ENTROPY else ""
+                print(f"  {section.name or '?':<20} 0x{section.offset:08x} "
+                      f"{section.size:>12,} bytes  {value:.4f}{marker}")
+
+        regions = self.high_entropy_regions()
+        if regions:
+            print(f"\nHigh Entropy Regions (>= {HIGH_ENTROPY}):")
+            for start, end, peak in regions:
+                print(f"  0x{start:08x} - 0x{end:08x}  ({(end - start) / 1024:.1f} KB)  max {peak:.4f}")
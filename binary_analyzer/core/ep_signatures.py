@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+PEiD-style entry-point signature database.
+
+Reads the userdb.txt format PEiD and its successors use:
+
+    [UPX 0.89.6 - 1.02 / 1.05 - 2.90 -> Markus & Laszlo]
+    signature = 60 BE ?? ?? ?? ?? 8D BE ?? ?? ?? ?? 57 83 CD FF
+    ep_only = true
+
+Every entry is compiled into one prefix trie: exact bytes are dict edges,
+`??` and nibble wildcards (`4?`, `?F`) masked edges. Matching walks the
+bytes at the entry point once, following all live branches at the same
+time, so thousands of signatures cost one pass over a window of at most
+the longest signature.
+
+Entries with ep_only = false describe patterns that may sit anywhere in
+the file; they would need a full scan and are skipped (counted in
+`skipped`).
+"""
+
+import os
+
+_FULL = 0xFF
+
+
+class EPSignature:
+    __slots__ = ('name', 'length', 'fixed')
+
+    def __init__(self, name, length, fixed):
+        self.name = name
+        self.length = length     # bytes covered, wildcards included
+        self.fixed = fixed       # bytes without any wildcard
+
+    def __repr__(self):
+        return f"EPSignature({self.name!r}, fixed={self.fixed}/{self.length})"
+
+
+class _Node:
+    # Most nodes are leaves of one signature: the containers are created on first use
+    __slots__ = ('children', 'masked', 'signatures')
+
+    def __init__(self):
+        self.children = None     # byte -> _Node
+        self.masked = None       # [(mask, value, _Node)]
+        self.signatures = None   # [EPSignature] ending here
+
+
+def _token_table():
+    digits = {f"{n:X}": (0xF, n) for n in range(16)}
+    digits.update({f"{n:x}": (0xF, n) for n in range(10, 16)})
+    digits["?"] = (0, 0)
+    return {high + low: ((high_mask << 4) | low_mask, (high_value << 4) | low_value)
+            for high, (high_mask, high_value) in digits.items()
+            for low, (low_mask, low_value) in digits.items()}
+
+# "8D" / "8d" / "??" / "4?" / "?F" -> (mask, value)
+_TOKENS = _token_table()
+
+
+def parse_token(token):
+    """(mask, value) of "8D", "??", "4?" or "?F"; ValueError otherwise"""
+    try:
+        return _TOKENS[token]
+    except KeyError:
+        raise ValueError(f"bad signature byte: {token!r}")
+
+
+def parse(text):
+    """(name, [(mask, value)], ep_only) of every entry; malformed ones as None tokens"""
+    name = tokens = None
+    ep_only = True
+    entries = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith((";", "#")):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            if name is not None:
+                entries.append((name, tokens, ep_only))
+            name, tokens, ep_only = line[1:-1].strip(), None, True
+            continue
+        key, sep, value = line.partition("=")
+        if not sep or name is None:
+            continue
+        key = key.strip().lower()
+        if key == "signature":
+            try:
+                tokens = [parse_token(token) for token in value.split()] or None
+            except ValueError:
+                tokens = None
+        elif key == "ep_only":
+            ep_only = value.strip().lower() == "true"
+    if name is not None:
+        entries.append((name, tokens, ep_only))
+    return entries
+
+
+class EPSignatureDatabase:
+    """Entry-point signatures compiled into a trie"""
+
+    def __init__(self):
+        self._root = _Node()
+        self.count = 0
+        self.skipped = 0          # malformed or not ep_only
+        self.max_length = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, name, tokens):
+        node = self._root
+        for mask, value in tokens:
+            if mask == _FULL:
+                if node.children is None:
+                    node.children = {}
+                child = node.children.get(value)
+                if child is None:
+                    child = node.children[value] = _Node()
+            else:
+                if node.masked is None:
+                    node.masked = []
+                for edge_mask, edge_value, edge_child in node.masked:
+                    if edge_mask == mask and edge_value == value:
+                        child = edge_child
+                        break
+                else:
+                    child = _Node()
+                    node.masked.append((mask, value, child))
+            node = child
+        fixed = sum(1 for mask, _ in tokens if mask == _FULL)
+        if node.signatures is None:
+            node.signatures = []
+        node.signatures.append(EPSignature(name, len(tokens), fixed))
+        self.count += 1
+        self.max_length = max(self.max_length, len(tokens))
+
+    def load_text(self, text):
+        for name, tokens, ep_only in parse(text):
+            # A pattern of wildcards only would match every file
+            if tokens is None or not ep_only or all(mask != _FULL for mask, _ in tokens):
+                self.skipped += 1
+                continue
+            self.add(name, tokens)
+
+    def load(self, path):
+        # Databases in the wild are ANSI; latin-1 never fails and keeps the names readable
+        with open(path, encoding="latin-1") as f:
+            self.load_text(f.read())
+
+    def match(self, window):
+        """EPSignatures matching at the start of window, most specific first"""
+        found = []
+        active = [self._root]
+        for byte in window:
+            following = []
+            for node in active:
+                if node.children is not None:
+                    child = node.children.get(byte)
+                    if child is not None:
+                        following.append(child)
+                if node.masked is not None:
+                    for mask, value, child in node.masked:
+                        if byte & mask == value:
+                            following.append(child)
+            if not following:
+                break
+            for node in following:
+                if node.signatures:
+                    found.extend(node.signatures)
+            active = following
+        found.sort(key=lambda signature: (signature.fixed, signature.length), reverse=True)
+        return found
+
+
+def load(paths):
+    """EPSignatureDatabase of the existing files among paths"""
+    database = EPSignatureDatabase()
+    for path in paths:
+        if os.path.isfile(path):
+            database.load(path)
+    return database
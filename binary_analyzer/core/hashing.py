@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Single-pass multi-digest hashing.
+
+One walk over the mapped file in HASH_CHUNK pieces feeds MD5, SHA-1,
+SHA-256 and a context-triggered piecewise hash (CTPH) at once. The PE
+import hash is computed from the parsed import table. hashlib and NumPy
+release the GIL on large buffers, so start() can run the pass on a
+background thread while the other stages work on the same map.
+
+The CTPH uses ssdeep's blocksize selection, but triggers on a
+multiplicative hash of 8-byte windows and hashes pieces with CRC32 so the
+work vectorizes. Its values are only comparable with each other, never
+with ssdeep data, so they carry a CTPH_PREFIX ("ctph1:blocksize:sig1:sig2")
+and a field of their own. A real ssdeep hash is added when the `ssdeep`
+binding (fed in the same pass) or the pure-Python `ppdeep` (one call over
+files up to PPDEEP_MAX_BYTES) is installed; otherwise it is None.
+"""
+
+import hashlib
+import struct
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from core import byte_stats
+from core import pe_parser
+
+np = byte_stats.np
+
+try:
+    import ssdeep as _ssdeep
+except ImportError:
+    _ssdeep = None
+try:
+    import ppdeep as _ppdeep
+except ImportError:
+    _ppdeep = None
+
+# Library behind the ssdeep field, part of the info stage cache key
+SSDEEP_BACKEND = "ssdeep" if _ssdeep is not None else "ppdeep" if _ppdeep is not None else None
+
+HASH_CHUNK = 4 * 1024 * 1024
+
+# Fuzzy hash parameters (blocksize / length as in ssdeep; 8-byte window)
+ROLLING_WINDOW = 8
+MIN_BLOCKSIZE = 3
+SPAMSUM_LENGTH = 64
+CTPH_PREFIX = "ctph1"
+# ppdeep is pure Python and hashes one bytes object: larger files get no ssdeep
+PPDEEP_MAX_BYTES = 64 * 1024 * 1024
+
+_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK32 = 0xFFFFFFFF
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_B64 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+# imphash: these extensions are dropped from library names (as pefile does)
+_IMPHASH_EXTENSIONS = ('ocx', 'sys', 'dll')
+
+
+class Digests:
+    __slots__ = ('md5', 'sha1', 'sha256', 'ssdeep', 'ctph', 'imphash')
+
+    def __init__(self, md5, sha1, sha256, ctph, imphash=None, ssdeep=None):
+        self.md5 = md5
+        self.sha1 = sha1
+        self.sha256 = sha256
+        self.ssdeep = ssdeep     # None without the ssdeep / ppdeep module
+        self.ctph = ctph
+        self.imphash = imphash
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class _FuzzyLevel:
+    """Piece boundaries of one blocksize, as indexes into the segment list"""
+
+    __slots__ = ('blocksize', 'threshold', 'boundaries')
+
+    def __init__(self, blocksize):
+        self.blocksize = blocksize
+        # A window triggers with probability 1/blocksize: product > threshold.
+        # Testing the top of the range keeps runs of zero bytes from triggering.
+        self.threshold = _MASK64 - (1 << 64) // blocksize
+        self.boundaries = []
+
+    @property
+    def full(self):
+        return len(self.boundaries) >= SPAMSUM_LENGTH - 1
+
+
+class FuzzyHasher:
+    """Context triggered piecewise hash (CTPH), fed chunk by chunk
+
+    A piece ends where the multiplicative hash of the last ROLLING_WINDOW
+    bytes lands in the top 2^64 / blocksize of its range. The bytes between two triggers of
+    the smallest blocksize still collecting pieces form a segment that is
+    CRC32'd once; a piece's character is a fold of its segments' CRCs, so
+    every byte counts and one pass serves all blocksizes. Three blocksizes
+    (b/2, b, 2b) are tracked so the ssdeep "retry with half the blocksize"
+    step does not need a second read.
+    """
+
+    def __init__(self, length, use_numpy=None):
+        self.use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+        blocksize = MIN_BLOCKSIZE
+        while blocksize * SPAMSUM_LENGTH < length:
+            blocksize *= 2
+        self.blocksize = blocksize
+        self.levels = [_FuzzyLevel(size) for size in (blocksize // 2, blocksize, blocksize * 2)
+                       if size >= MIN_BLOCKSIZE]
+        self._tail = bytes(ROLLING_WINDOW - 1)
+        self._segments = []   # CRC32 of every closed segment
+        self._crc = 0         # CRC32 of the open segment
+        self._pending = 0     # bytes in the open segment
+
+    def _active(self):
+        return [level for level in self.levels if not level.full]
+
+    def _close_segment(self, product, active):
+        self._segments.append(self._crc)
+        self._crc = 0
+        self._pending = 0
+        for level in active:
+            if product > level.threshold:
+                level.boundaries.append(len(self._segments))
+
+    def update(self, chunk):
+        if not len(chunk):
+            return
+        chunk = bytes(chunk)
+        if self.use_numpy:
+            self._update_numpy(chunk)
+        else:
+            self._update_python(chunk)
+        self._tail = (self._tail + chunk)[-(ROLLING_WINDOW - 1):]
+
+    def _update_numpy(self, chunk):
+        data = self._tail + chunk
+        start = 0
+        active = self._active()
+        if active:
+            # Every window as one unaligned little-endian uint64, no copy
+            words = np.ndarray(shape=(len(chunk),), dtype='<u8', buffer=data, strides=(1,))
+            products = words * np.uint64(_MULTIPLIER)
+            candidates = np.flatnonzero(products > np.uint64(active[0].threshold))
+            while len(candidates) and active:
+                position = int(candidates[0])
+                product = int(products[position])
+                self._crc = zlib.crc32(chunk[start:position + 1], self._crc)
+                start = position + 1
+                self._close_segment(product, active)
+                if active[0].full:
+                    active = self._active()
+                    if not active:
+                        break
+                    # Coarser segments from here on
+                    rest = candidates[1:]
+                    candidates = rest[products[rest] > np.uint64(active[0].threshold)]
+                else:
+                    candidates = candidates[1:]
+        self._crc = zlib.crc32(chunk[start:], self._crc)
+        self._pending += len(chunk) - start
+
+    def _update_python(self, chunk):
+        data = self._tail + chunk
+        start = 0
+        active = self._active()
+        for position in range(len(chunk) if active else 0):
+            word = int.from_bytes(data[position:position + ROLLING_WINDOW], 'little')
+            product = (word * _MULTIPLIER) & _MASK64
+            if product <= active[0].threshold:
+                continue
+            self._crc = zlib.crc32(chunk[start:position + 1], self._crc)
+            start = position + 1
+            self._close_segment(product, active)
+            if active[0].full:
+                active = self._active()
+                if not active:
+                    break
+        self._crc = zlib.crc32(chunk[start:], self._crc)
+        self._pending += len(chunk) - start
+
+    def _signature(self, level, length):
+        """length - 1 triggered pieces; the last piece absorbs everything after"""
+        segments = self._segments
+        boundaries = level.boundaries[:length - 1]
+        chars = []
+        previous = 0
+        for boundary in boundaries:
+            chars.append(_fold(segments[previous:boundary]))
+            previous = boundary
+        if previous < len(segments) or self._pending:
+            rest = segments[previous:] + ([self._crc] if self._pending else [])
+            chars.append(_fold(rest))
+        return ''.join(chars)
+
+    def digest(self):
+        levels = {level.blocksize: level for level in self.levels}
+        blocksize = self.blocksize
+        first = self._signature(levels[blocksize], SPAMSUM_LENGTH)
+        # Too few pieces: ssdeep halves the blocksize and hashes again
+        if len(first) < SPAMSUM_LENGTH // 2 and blocksize // 2 in levels:
+            blocksize //= 2
+            first = self._signature(levels[blocksize], SPAMSUM_LENGTH)
+        second = self._signature(levels[blocksize * 2], SPAMSUM_LENGTH // 2)
+        return f"{CTPH_PREFIX}:{blocksize}:{first}:{second}"
+
+
+def _fold(crcs):
+    """Base64 character of a piece from its segment CRCs (FNV-1a over them)"""
+    value = 0x811C9DC5
+    for crc in crcs:
+        value = ((value ^ crc) * 0x01000193) & _MASK32
+    return _B64[(value ^ (value >> 16)) & 63]
+
+
+def imphash(imports):
+    """MD5 of "dll.function" pairs in import order (pefile convention)"""
+    names = []
+    for dll, functions in imports:
+        library = dll.lower()
+        base, _, extension = library.rpartition('.')
+        if base and extension in _IMPHASH_EXTENSIONS:
+            library = base
+        for function in functions:
+            name = f"ord{function}" if isinstance(function, int) else function
+            names.append(f"{library}.{name.lower()}")
+    if not names:
+        return None
+    return hashlib.md5(','.join(names).encode()).hexdigest()
+
+
+def _imphash_of(binary):
+    if bytes(binary[:2]) != b'MZ':
+        return None
+    # MZ-prefixed text, truncated headers, e_lfanew past EOF: no imphash
+    pe = pe_parser.try_for_binary(binary)
+    if pe is None:
+        return None
+    try:
+        return imphash(pe.imports)
+    except (struct.error, ValueError, IndexError):
+        return None
+
+
+def _ppdeep_of(binary):
+    if _ppdeep is None or len(binary) > PPDEEP_MAX_BYTES:
+        return None
+    try:
+        return _ppdeep.hash(bytes(binary.view))
+    except Exception:
+        return None
+
+
+class Hasher:
+    """MD5 / SHA-1 / SHA-256 / CTPH (and ssdeep) fed chunk by chunk, in file order"""
+
+    def __init__(self, length, use_numpy=None):
+        self.md5 = hashlib.md5()
+        self.sha1 = hashlib.sha1()
+        self.sha256 = hashlib.sha256()
+        self.ctph = FuzzyHasher(length, use_numpy)
+        self.ssdeep = _ssdeep.Hash() if _ssdeep is not None else None
+
+    def update(self, chunk):
+        # At most HASH_CHUNK at a time bounds the CTPH temporaries
+        for start in range(0, len(chunk), HASH_CHUNK):
+            piece = chunk[start:start + HASH_CHUNK]
+            self.md5.update(piece)
+            self.sha1.update(piece)
+            self.sha256.update(piece)
+            self.ctph.update(piece)
+            if self.ssdeep is not None:
+                self.ssdeep.update(bytes(piece))
+
+    def digests(self, binary):
+        ssdeep = self.ssdeep.digest() if self.ssdeep is not None else _ppdeep_of(binary)
+        return Digests(self.md5.hexdigest(), self.sha1.hexdigest(), self.sha256.hexdigest(),
+                       self.ctph.digest(), _imphash_of(binary), ssdeep)
+
+
+def compute(binary, chunk_size=HASH_CHUNK, use_numpy=None):
+    """All digests of a BinaryBuffer from one pass over the data"""
+    hasher = Hasher(len(binary), use_numpy)
+    for chunk in binary.chunks(chunk_size):
+        hasher.update(chunk)
+    return hasher.digests(binary)
+
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+_executor = None
+
+
+def start(binary):
+    """Begin hashing on a background thread; for_binary() collects the result"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hashing")
+    return binary.memo('digests', lambda: _executor.submit(compute, binary))
+
+
+def store(binary, digests):
+    """Hand digests computed elsewhere (core.streaming) to for_binary()"""
+    return binary.memo('digests', lambda: _resolved(digests))
+
+
+def for_binary(binary):
+    """Digests of a BinaryBuffer, computed once (waits for start() if it ran)"""
+    return binary.memo('digests', lambda: _resolved(compute(binary))).result()
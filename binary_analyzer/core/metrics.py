@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Per-stage instrumentation.
+
+Metrics.stage(name) records wall and CPU time, bytes read, read/write
+syscalls, page faults (the mapped file is read through faults, not read())
+and spawned subprocesses for a block. Stages nest: a shared computation
+started inside "info" is reported as "info/sha256".
+"""
+
+import contextlib
+import resource
+import sys
+import time
+
+# Audit events raised whenever Python starts another program
+_SPAWN_EVENTS = frozenset(('subprocess.Popen', 'os.system', 'os.posix_spawn', 'os.exec',
+                           'os.spawn', 'os.fork'))
+_spawned = 0
+_hooked = False
+_samples = 0
+_sample_cost = (0, 0)   # bytes read / syscalls of one /proc/self/io read
+
+
+def _audit(event, args):
+    global _spawned
+    if event in _SPAWN_EVENTS:
+        _spawned += 1
+
+
+def _install_hook():
+    # Audit hooks can not be removed, so only one is ever added per process
+    global _hooked, _sample_cost
+    if not _hooked:
+        sys.addaudithook(_audit)
+        _hooked = True
+        first, second = _proc_io(), _proc_io()
+        _sample_cost = (second[0] - first[0], second[1] - first[1])
+
+
+def _proc_io():
+    """(bytes read, read+write syscalls) from /proc/self/io, zeros elsewhere"""
+    try:
+        with open('/proc/self/io', 'rb') as f:
+            fields = dict(line.split(b':') for line in f.read().splitlines())
+        return int(fields[b'rchar']), int(fields[b'syscr']) + int(fields[b'syscw'])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _sample():
+    global _samples
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    read, syscalls = _proc_io()
+    # Our own /proc reads show up in later samples; they are subtracted again
+    _samples += 1
+    read -= _samples * _sample_cost[0]
+    syscalls -= _samples * _sample_cost[1]
+    return (time.perf_counter(), time.process_time(), read, syscalls,
+            usage.ru_minflt + usage.ru_majflt, _spawned)
+
+
+class StageMetrics:
+    __slots__ = ('name', 'calls', 'wall', 'cpu', 'bytes_read', 'syscalls', 'faults', 'spawned')
+
+    FIELDS = ('calls', 'wall', 'cpu', 'bytes_read', 'syscalls', 'faults', 'spawned')
+
+    def __init__(self, name):
+        self.name = name
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, before, after):
+        self.calls += 1
+        self.wall += after[0] - before[0]
+        self.cpu += after[1] - before[1]
+        # /proc/self/io grows by a digit now and then: clamp the jitter
+        self.bytes_read += max(0, after[2] - before[2])
+        self.syscalls += max(0, after[3] - before[3])
+        self.faults += after[4] - before[4]
+        self.spawned += after[5] - before[5]
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class Metrics:
+    def __init__(self):
+        _install_hook()
+        self.stages = {}   # name -> StageMetrics, in first-seen order
+        self._stack = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self._stack.append(name)
+        key = '/'.join(self._stack)
+        # Registered on entry so parents are listed before their children
+        if key not in self.stages:
+            self.stages[key] = StageMetrics(key)
+        before = _sample()
+        try:
+            yield
+        finally:
+            after = _sample()
+            self._stack.pop()
+            self.stages[key].add(before, after)
+
+    def merge(self, data):
+        """Add a to_dict() from another file / worker process"""
+        for name, values in data.items():
+            if name not in self.stages:
+                self.stages[name] = StageMetrics(name)
+            stage = self.stages[name]
+            for field in StageMetrics.FIELDS:
+                setattr(stage, field, getattr(stage, field) + values[field])
+
+    def to_dict(self):
+        return {name: stage.to_dict() for name, stage in self.stages.items()}
+
+    def display(self):
+        print(f"{'Stage':<32} {'calls':>6} {'wall ms':>9} {'cpu ms':>9} {'read':>10} "
+              f"{'syscalls':>8} {'faults':>7} {'spawned':>7}")
+        for name, stage in self.stages.items():
+            depth = name.count('/')
+            label = '  ' * depth + name.rsplit('/', 1)[-1]
+            print(f"{label:<32} {stage.calls:>6} {stage.wall * 1000:>9.2f} {stage.cpu * 1000:>9.2f} "
+                  f"{stage.bytes_read:>10,} {stage.syscalls:>8} {stage.faults:>7} "
+                  f"{stage.spawned:>7}")
+
+
+def stage(metrics, name):
+    """metrics.stage(name), or a no-op when instrumentation is off"""
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.stage(name)
@@ -1,42 +1,59 @@
 #!/usr/bin/env python3
 
-import importlib.util
-from pathlib import Path
+import inspect
+
+from core import plugins
+from core import sections
+from core import signatures
+from core.metrics import stage
+from core.plugins import DEFAULT_MAX_CONFIDENCE
+from core.results import PackerResult
 
 class PackerDetector:
-    def __init__(self, filepath, binary_type, entropy):
-        self.filepath = filepath
+    def __init__(self, binary, binary_type, entropy, profile=None):
+        self.binary = binary
+        self.filepath = binary.filepath
         self.binary_type = binary_type
         self.entropy = entropy
+        self.profile = profile
         self.detected_packer = None
         self.confidence = 0
         
         self._load_packer_modules()
         self._detect()
     
+    @classmethod
+    def preload(cls):
+        """Import the packer plugins (once per process, again only for changed files)"""
+        return plugins.registry().load()
+    
+    @classmethod
+    def plugin_version(cls):
+        """Digest of the plugin sources and data; changes whenever a signature module
+        or a database it loads does"""
+        return plugins.registry().version()
+    
     def _load_packer_modules(self):
-        
-        self.packer_modules = []
-        packer_dir = Path(__file__).parent.parent / "packer"
-        
-        if not packer_dir.exists():
-            return
-        
-        for packer_file in packer_dir.glob("*.py"):
-            if packer_file.name.startswith("__"):
-                continue
-            
-            try:
-                module_name = packer_file.stem
-                spec = importlib.util.spec_from_file_location(module_name, packer_file)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                # all module should have detect
-                if hasattr(module, 'detect'):
-                    self.packer_modules.append(module)
-            except Exception as e:
-                pass
+        self.packer_modules, self.signatures = self.preload()
+    
+    def _supports(self, module):
+        """False when the module declared FORMATS and this binary type is not one of them"""
+        formats = getattr(module, 'FORMATS', None)
+        return formats is None or self.binary_type in formats
+    
+    def _extra_arguments(self, module, matches):
+        """Optional detect() keyword arguments the module declares"""
+        available = {'profile': self.profile}
+        if module.__name__ in matches:
+            available['matches'] = matches[module.__name__]
+        try:
+            parameters = inspect.signature(module.detect).parameters
+        except (TypeError, ValueError):
+            return {}
+        if 'sections' in parameters:
+            # Parsed on first request, then shared through the buffer memo
+            available['sections'] = sections.for_binary(self.binary, self.binary_type)
+        return {name: value for name, value in available.items() if name in parameters}
     
     def _detect(self):
         
@@ -46,9 +63,35 @@ class PackerDetector:
         best_match = None
         best_confidence = 0
         
-        for module in self.packer_modules:
+        metrics = getattr(self.binary, 'metrics', None)
+        
+        # Modules for other formats are dropped before any I/O, signatures included
+        modules = [module for module in self.packer_modules if self._supports(module)]
+        
+        matches = {}
+        try:
+            with stage(metrics, 'signatures'):
+                matches = signatures.for_binary(self.binary, self.signatures,
+                                                [module.__name__ for module in modules])
+        except Exception as e:
+            pass
+        
+        # ceilings[i]: best confidence any of modules[i:] can still return
+        ceilings = []
+        ceiling = 0
+        for module in reversed(modules):
+            ceiling = max(ceiling, getattr(module, 'MAX_CONFIDENCE', DEFAULT_MAX_CONFIDENCE))
+            ceilings.append(ceiling)
+        ceilings.reverse()
+        
+        for module, ceiling in zip(modules, ceilings):
+            if best_confidence >= ceiling:
+                # Nothing left can beat the current result
+                break
             try:
-                result = module.detect(self.filepath, self.binary_type, self.entropy)
+                with stage(metrics, module.__name__):
+                    result = module.detect(self.binary, self.binary_type, self.entropy,
+                                           **self._extra_arguments(module, matches))
                 if result and 'confidence' in result:
                     if result['confidence'] > best_confidence:
                         best_confidence = result['confidence']
@@ -60,6 +103,36 @@ class PackerDetector:
             self.detected_packer = best_match.get('name', 'Unknown')
             self.confidence = best_confidence
     
+    def to_dict(self):
+        return {'entropy': self.entropy, 'detected_packer': self.detected_packer,
+                'confidence': self.confidence}
+    
+    @classmethod
+    def from_dict(cls, binary, binary_type, data):
+        """Rebuild from a cached to_dict() without running the modules"""
+        detector = cls.__new__(cls)
+        detector.binary = binary
+        detector.filepath = binary.filepath
+        detector.binary_type = binary_type
+        detector.profile = None
+        detector._load_packer_modules()
+        detector.__dict__.update(data)
+        return detector
+    
+    @property
+    def status(self):
+        if not self.packer_modules:
+            return "Module missing"
+        if self.detected_packer:
+            return "Packaged"
+        # Entropi bazlı genel değerlendirme
+        if self.entropy and self.entropy >= 7.5:
+            return "Probably packaged"
+        return "Unpackaged"
+    
+    def result(self):
+        return PackerResult(self.status, self.detected_packer, self.confidence)
+    
     def display(self):
         if not self.packer_modules:
             print(f"[!] The packer/ folder was either not found or is empty.")
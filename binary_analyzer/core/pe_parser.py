@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Parse-once PE header model.
+
+DOS header, COFF header, optional header (PE32 / PE32+), data directories
+and the section table are decoded from the shared buffer with precompiled
+struct.Struct formats. BinaryInfo, SecurityChecker and the packer modules
+all read the same PEFile instead of seeking around the file themselves.
+
+The import and export directories are only parsed on first access, with
+their RVAs resolved through the section table. import_set holds the
+(dll, function) pairs for O(1) API checks in the packer heuristics.
+"""
+
+import struct
+
+MACHINE_I386 = 0x014c
+MACHINE_AMD64 = 0x8664
+
+OPTIONAL_PE32 = 0x10b
+OPTIONAL_PE32_PLUS = 0x20b
+
+# Data directory indexes
+DIRECTORY_EXPORT = 0
+DIRECTORY_IMPORT = 1
+DIRECTORY_RESOURCE = 2
+DIRECTORY_LOAD_CONFIG = 10
+DIRECTORY_IAT = 12
+
+# DllCharacteristics
+DLL_DYNAMIC_BASE = 0x0040
+DLL_NX_COMPAT = 0x0100
+DLL_NO_SEH = 0x0400
+DLL_GUARD_CF = 0x4000
+
+_DOS = struct.Struct('<2s58xI')
+_COFF = struct.Struct('<4sHHIIIHH')
+_OPTIONAL_32 = struct.Struct('<HBBIIIIIIIIIHHHHHHIIIIHHIIIIII')
+_OPTIONAL_64 = struct.Struct('<HBBIIIIIQIIHHHHHHIIIIHHQQQQII')
+_DIRECTORY = struct.Struct('<II')
+_SECTION = struct.Struct('<8sIIIIIIHHI')
+_IMPORT_DESCRIPTOR = struct.Struct('<IIIII')
+_EXPORT_DIRECTORY = struct.Struct('<IIHHIIIIIII')
+_THUNK_32 = struct.Struct('<I')
+_THUNK_64 = struct.Struct('<Q')
+
+MAX_SECTIONS = 96  # Windows loader limit
+# Bounds for hostile import tables
+MAX_IMPORT_LIBRARIES = 4096
+MAX_IMPORTS_PER_LIBRARY = 65536
+MAX_EXPORTS = 65536
+MAX_NAME_LENGTH = 512
+
+
+class PEFormatError(ValueError):
+    pass
+
+
+class DosHeader:
+    __slots__ = ('e_magic', 'e_lfanew')
+
+    def __init__(self, e_magic, e_lfanew):
+        self.e_magic = e_magic
+        self.e_lfanew = e_lfanew
+
+
+class CoffHeader:
+    __slots__ = ('machine', 'number_of_sections', 'time_date_stamp',
+                 'size_of_optional_header', 'characteristics')
+
+    def __init__(self, machine, number_of_sections, time_date_stamp,
+                 size_of_optional_header, characteristics):
+        self.machine = machine
+        self.number_of_sections = number_of_sections
+        self.time_date_stamp = time_date_stamp
+        self.size_of_optional_header = size_of_optional_header
+        self.characteristics = characteristics
+
+
+class OptionalHeader:
+    __slots__ = ('magic', 'address_of_entry_point', 'image_base', 'section_alignment',
+                 'file_alignment', 'size_of_image', 'size_of_headers', 'checksum',
+                 'subsystem', 'dll_characteristics', 'number_of_rva_and_sizes')
+
+    def __init__(self, magic, address_of_entry_point, image_base, section_alignment,
+                 file_alignment, size_of_image, size_of_headers, checksum, subsystem,
+                 dll_characteristics, number_of_rva_and_sizes):
+        self.magic = magic
+        self.address_of_entry_point = address_of_entry_point
+        self.image_base = image_base
+        self.section_alignment = section_alignment
+        self.file_alignment = file_alignment
+        self.size_of_image = size_of_image
+        self.size_of_headers = size_of_headers
+        self.checksum = checksum
+        self.subsystem = subsystem
+        self.dll_characteristics = dll_characteristics
+        self.number_of_rva_and_sizes = number_of_rva_and_sizes
+
+    @property
+    def is_pe32_plus(self):
+        return self.magic == OPTIONAL_PE32_PLUS
+
+
+class DataDirectory:
+    __slots__ = ('rva', 'size')
+
+    def __init__(self, rva, size):
+        self.rva = rva
+        self.size = size
+
+
+class SectionHeader:
+    __slots__ = ('name', 'virtual_size', 'virtual_address', 'size_of_raw_data',
+                 'pointer_to_raw_data', 'characteristics')
+
+    def __init__(self, name, virtual_size, virtual_address, size_of_raw_data,
+                 pointer_to_raw_data, characteristics):
+        self.name = name
+        self.virtual_size = virtual_size
+        self.virtual_address = virtual_address
+        self.size_of_raw_data = size_of_raw_data
+        self.pointer_to_raw_data = pointer_to_raw_data
+        self.characteristics = characteristics
+
+    def contains_rva(self, rva):
+        size = max(self.virtual_size, self.size_of_raw_data)
+        return self.virtual_address <= rva < self.virtual_address + size
+
+
+class PEFile:
+    """Headers of a PE image held in a bytes-like buffer"""
+
+    __slots__ = ('data', 'dos', 'coff', 'optional', 'directories', 'sections', '_imports',
+                 '_import_set', '_imported_names', '_exports')
+
+    def __init__(self, data):
+        self.data = data
+        if len(data) < _DOS.size:
+            raise PEFormatError("file too small for a DOS header")
+
+        self.dos = DosHeader(*_DOS.unpack_from(data, 0))
+        if self.dos.e_magic != b'MZ':
+            raise PEFormatError("missing MZ signature")
+
+        pe_offset = self.dos.e_lfanew
+        signature, *coff = _COFF.unpack_from(data, pe_offset)
+        if signature != b'PE\x00\x00':
+            raise PEFormatError("missing PE signature")
+        machine, number_of_sections, stamp, _, _, optional_size, characteristics = coff
+        self.coff = CoffHeader(machine, number_of_sections, stamp, optional_size, characteristics)
+
+        optional_offset = pe_offset + _COFF.size
+        self.optional, self.directories = self._parse_optional(optional_offset)
+        self.sections = self._parse_sections(optional_offset + optional_size)
+        self._imports = None
+        self._import_set = None
+        self._imported_names = None
+        self._exports = None
+
+    def _parse_optional(self, offset):
+        magic = struct.unpack_from('<H', self.data, offset)[0]
+        layout = _OPTIONAL_64 if magic == OPTIONAL_PE32_PLUS else _OPTIONAL_32
+        fields = layout.unpack_from(self.data, offset)
+
+        if layout is _OPTIONAL_64:
+            (magic, _, _, _, _, _, entry, _, image_base, section_alignment,
+             file_alignment, _, _, _, _, _, _, _, size_of_image, size_of_headers,
+             checksum, subsystem, dll_characteristics, _, _, _, _, _, rva_count) = fields
+        else:
+            (magic, _, _, _, _, _, entry, _, _, image_base, section_alignment,
+             file_alignment, _, _, _, _, _, _, _, size_of_image, size_of_headers,
+             checksum, subsystem, dll_characteristics, _, _, _, _, _, rva_count) = fields
+
+        optional = OptionalHeader(magic, entry, image_base, section_alignment, file_alignment,
+                                  size_of_image, size_of_headers, checksum, subsystem,
+                                  dll_characteristics, rva_count)
+
+        directories = []
+        directory_offset = offset + layout.size
+        for i in range(min(rva_count, 16)):
+            position = directory_offset + i * _DIRECTORY.size
+            if position + _DIRECTORY.size > len(self.data):
+                break
+            directories.append(DataDirectory(*_DIRECTORY.unpack_from(self.data, position)))
+        return optional, directories
+
+    def _parse_sections(self, offset):
+        sections = []
+        for i in range(min(self.coff.number_of_sections, MAX_SECTIONS)):
+            position = offset + i * _SECTION.size
+            if position + _SECTION.size > len(self.data):
+                break
+            (raw_name, virtual_size, virtual_address, raw_size, raw_pointer,
+             _, _, _, _, characteristics) = _SECTION.unpack_from(self.data, position)
+            name = raw_name.rstrip(b'\x00').decode('latin-1')
+            sections.append(SectionHeader(name, virtual_size, virtual_address, raw_size,
+                                          raw_pointer, characteristics))
+        return sections
+
+    @property
+    def machine(self):
+        return self.coff.machine
+
+    @property
+    def dll_characteristics(self):
+        return self.optional.dll_characteristics
+
+    def directory(self, index):
+        """DataDirectory at index, or None when absent/empty"""
+        if index < len(self.directories) and self.directories[index].rva:
+            return self.directories[index]
+        return None
+
+    def section_for_rva(self, rva):
+        for section in self.sections:
+            if section.contains_rva(rva):
+                return section
+        return None
+
+    def rva_to_offset(self, rva):
+        """File offset of an RVA through the section table (None if unmapped)"""
+        if rva < self.optional.size_of_headers:
+            return rva
+        section = self.section_for_rva(rva)
+        if section is None:
+            return None
+        offset = section.pointer_to_raw_data + (rva - section.virtual_address)
+        if rva - section.virtual_address >= section.size_of_raw_data or offset >= len(self.data):
+            return None
+        return offset
+
+    def _c_string(self, rva):
+        offset = self.rva_to_offset(rva)
+        if offset is None:
+            return None
+        raw = bytes(self.data[offset:offset + MAX_NAME_LENGTH])
+        return raw.split(b'\x00', 1)[0].decode('latin-1')
+
+    @property
+    def imports(self):
+        """[(dll, [function name or ordinal int])] from the import directory"""
+        if self._imports is None:
+            try:
+                self._imports = self._parse_imports()
+            except (struct.error, IndexError):
+                self._imports = []
+        return self._imports
+
+    def _parse_imports(self):
+        directory = self.directory(DIRECTORY_IMPORT)
+        if directory is None:
+            return []
+        offset = self.rva_to_offset(directory.rva)
+        if offset is None:
+            return []
+
+        thunk = _THUNK_64 if self.optional.is_pe32_plus else _THUNK_32
+        ordinal_flag = 1 << (thunk.size * 8 - 1)
+        imports = []
+        for index in range(MAX_IMPORT_LIBRARIES):
+            position = offset + index * _IMPORT_DESCRIPTOR.size
+            if position + _IMPORT_DESCRIPTOR.size > len(self.data):
+                break
+            lookup, _, _, name_rva, first_thunk = _IMPORT_DESCRIPTOR.unpack_from(self.data, position)
+            if not (lookup or name_rva or first_thunk):
+                break
+            dll = self._c_string(name_rva)
+            if dll is None:
+                continue
+
+            functions = []
+            # Bound / packed images may have no lookup table: walk the IAT instead
+            table = self.rva_to_offset(lookup or first_thunk)
+            for slot in range(MAX_IMPORTS_PER_LIBRARY if table is not None else 0):
+                entry = table + slot * thunk.size
+                if entry + thunk.size > len(self.data):
+                    break
+                value = thunk.unpack_from(self.data, entry)[0]
+                if not value:
+                    break
+                if value & ordinal_flag:
+                    functions.append(value & 0xffff)
+                else:
+                    # IMAGE_IMPORT_BY_NAME: 2-byte hint, then the name
+                    name = self._c_string((value & 0x7fffffff) + 2)
+                    if name is None:
+                        break
+                    functions.append(name)
+            imports.append((dll, functions))
+        return imports
+
+
+    @property
+    def import_set(self):
+        """frozenset of (dll, function) pairs; dll lowercased, function a name or ordinal"""
+        if self._import_set is None:
+            self._import_set = frozenset((dll.lower(), function)
+                                         for dll, functions in self.imports
+                                         for function in functions)
+        return self._import_set
+
+    def imports_function(self, function, dll=None):
+        """True if function is imported (from dll, when given; any DLL otherwise)"""
+        if dll is not None:
+            return (dll.lower(), function) in self.import_set
+        if self._imported_names is None:
+            self._imported_names = frozenset(function for _, function in self.import_set)
+        return function in self._imported_names
+
+    @property
+    def import_libraries(self):
+        """Distinct imported DLL names, lowercased"""
+        return {dll.lower() for dll, _ in self.imports}
+
+    @property
+    def exports(self):
+        """(dll name, [(name or None, ordinal)]) from the export directory"""
+        if self._exports is None:
+            try:
+                self._exports = self._parse_exports()
+            except (struct.error, IndexError):
+                self._exports = (None, [])
+        return self._exports
+
+    def _parse_exports(self):
+        directory = self.directory(DIRECTORY_EXPORT)
+        if directory is None:
+            return None, []
+        offset = self.rva_to_offset(directory.rva)
+        if offset is None:
+            return None, []
+        (_, _, _, _, name_rva, base, function_count, name_count, functions_rva,
+         names_rva, ordinals_rva) = _EXPORT_DIRECTORY.unpack_from(self.data, offset)
+
+        # The three arrays are read with one unpack each
+        names = {}
+        names_offset = self.rva_to_offset(names_rva)
+        ordinals_offset = self.rva_to_offset(ordinals_rva)
+        name_count = min(name_count, MAX_EXPORTS)
+        if names_offset is not None and ordinals_offset is not None and name_count:
+            name_rvas = struct.unpack_from(f'<{name_count}I', self.data, names_offset)
+            ordinals = struct.unpack_from(f'<{name_count}H', self.data, ordinals_offset)
+            for rva, index in zip(name_rvas, ordinals):
+                name = self._c_string(rva)
+                if name is not None:
+                    names[index] = name
+
+        exports = []
+        functions_offset = self.rva_to_offset(functions_rva)
+        function_count = min(function_count, MAX_EXPORTS)
+        if functions_offset is not None and function_count:
+            addresses = struct.unpack_from(f'<{function_count}I', self.data, functions_offset)
+            for index, address in enumerate(addresses):
+                if address:   # 0: unused ordinal slot
+                    exports.append((names.get(index), base + index))
+        return self._c_string(name_rva), exports
+
+
+def for_binary(binary):
+    """PEFile of a BinaryBuffer, parsed once and shared between stages"""
+    return binary.memo('pe', lambda: PEFile(binary.view))
+
+
+def try_for_binary(binary):
+    """for_binary(), or None when the buffer is not a parseable PE"""
+    try:
+        return for_binary(binary)
+    except (struct.error, IndexError, ValueError):
+        return None
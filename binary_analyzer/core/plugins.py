@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Process-wide packer plugin registry.
+
+Plugins are the *.py files of packer/ plus the modules installed
+distributions publish under the "binary_analyzer.packers" entry point
+group, e.g. in a third-party pyproject.toml:
+
+    [project.entry-points."binary_analyzer.packers"]
+    mpress = "mypackers.mpress"
+
+Everything is imported once per process. load() re-stats packer/ on every
+call (one scandir) and re-imports only the files whose mtime or size
+changed, so long-running processes pick up signature updates without a
+restart. Entry points are resolved once; installing a distribution needs a
+new process.
+
+Modules that read data files next to their code (signature databases) can
+define a module-level version() returning a string that changes with that
+data; it is folded into the plugin version, so cached packer results are
+invalidated by a database update too.
+"""
+
+import hashlib
+import importlib.util
+import os
+import sys
+import threading
+from pathlib import Path
+
+from core.signatures import SignatureEngine
+
+ENTRY_POINT_GROUP = "binary_analyzer.packers"
+PACKER_DIR = Path(__file__).parent.parent / "packer"
+
+# Scheduling defaults for modules that do not declare FORMATS / COST / MAX_CONFIDENCE
+DEFAULT_COST = 50
+DEFAULT_MAX_CONFIDENCE = 100
+
+
+class _PluginFile:
+    __slots__ = ('stamp', 'digest', 'module')
+
+    def __init__(self, stamp, digest, module):
+        self.stamp = stamp
+        self.digest = digest
+        self.module = module
+
+
+def _import_file(path):
+    """(sha256 of the source, module or None when it fails / has no detect)"""
+    source = path.read_bytes()
+    try:
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception:
+        module = None
+    # all module should have detect
+    if module is not None and not hasattr(module, 'detect'):
+        module = None
+    return hashlib.sha256(source).digest(), module
+
+
+def _declares_entry_points(group):
+    """Does any installed distribution on sys.path declare the group?
+
+    A plain scan of the *.dist-info / *.egg-info directories: importing
+    importlib.metadata alone costs more than a whole small-file analysis.
+    """
+    header = f"[{group}]".encode()
+    for directory in sys.path:
+        try:
+            with os.scandir(directory or ".") as entries:
+                names = [entry.path for entry in entries
+                         if entry.name.endswith((".dist-info", ".egg-info"))]
+        except OSError:
+            continue
+        for name in names:
+            try:
+                with open(os.path.join(name, "entry_points.txt"), "rb") as f:
+                    if header in f.read():
+                        return True
+            except OSError:
+                continue
+    return False
+
+
+def _import_entry_points(group):
+    """[(entry point name, distribution version, module)] of installed plugins"""
+    if not _declares_entry_points(group):
+        return []
+    try:
+        from importlib.metadata import entry_points
+        found = entry_points(group=group)
+    except Exception:
+        return []
+
+    plugins = []
+    for entry_point in sorted(found, key=lambda entry_point: entry_point.name):
+        try:
+            module = entry_point.load()
+        except Exception:
+            continue
+        if not hasattr(module, 'detect'):
+            continue
+        dist = getattr(entry_point, 'dist', None)
+        version = f"{dist.name}=={dist.version}" if dist is not None else entry_point.value
+        plugins.append((entry_point.name, version, module))
+    return plugins
+
+
+class PluginRegistry:
+    def __init__(self, directory=PACKER_DIR, group=ENTRY_POINT_GROUP):
+        self.directory = Path(directory)
+        self.group = group
+        self._files = {}            # file name -> _PluginFile
+        self._entry_points = None
+        self._state = None          # (modules, SignatureEngine, version)
+        self._lock = threading.Lock()
+
+    def _stat(self):
+        """{file name: (mtime_ns, size)} of the plugin files on disk"""
+        stamps = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".py") and not entry.name.startswith("__"):
+                        stat = entry.stat()
+                        stamps[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
+        return stamps
+
+    def refresh(self):
+        """Re-import plugin files changed on disk; True when anything changed"""
+        stamps = self._stat()
+        with self._lock:
+            changed = stamps.keys() != self._files.keys()
+            for name, stamp in stamps.items():
+                known = self._files.get(name)
+                if known is not None and known.stamp == stamp:
+                    continue
+                try:
+                    digest, module = _import_file(self.directory / name)
+                except OSError:
+                    continue
+                self._files[name] = _PluginFile(stamp, digest, module)
+                changed = True
+            for name in self._files.keys() - stamps.keys():
+                del self._files[name]
+
+            if self._entry_points is None:
+                self._entry_points = _import_entry_points(self.group)
+                changed = True
+            if changed:
+                self._state = None
+            return changed
+
+    def _build(self):
+        modules = []
+        signatures = SignatureEngine()
+        digest = hashlib.sha256()
+
+        for name in sorted(self._files):
+            plugin = self._files[name]
+            digest.update(name.encode())
+            digest.update(plugin.digest)
+            if plugin.module is not None:
+                modules.append(plugin.module)
+        for name, version, module in self._entry_points:
+            digest.update(f"{name}:{version}".encode())
+            modules.append(module)
+
+        for module in modules:
+            # Declarative signatures are matched centrally in one pass
+            if hasattr(module, 'SIGNATURES'):
+                try:
+                    signatures.register(module.__name__, module.SIGNATURES)
+                except Exception:
+                    pass
+
+        # Cheapest first; ties keep the alphabetical order
+        modules.sort(key=lambda module: getattr(module, 'COST', DEFAULT_COST))
+        return modules, signatures, digest.hexdigest()[:16]
+
+    def load(self):
+        """(modules sorted by COST, SignatureEngine), up to date with packer/"""
+        modules, signatures, _ = self._current()
+        return modules, signatures
+
+    def version(self):
+        """Digest of the plugin sources and their version() hooks"""
+        modules, _, version = self._current()
+        hooks = []
+        for module in modules:
+            hook = getattr(module, 'version', None)
+            if callable(hook):
+                try:
+                    hooks.append(f"{module.__name__}:{hook()}")
+                except Exception:
+                    hooks.append(f"{module.__name__}:?")
+        if not hooks:
+            return version
+        digest = hashlib.sha256(version.encode())
+        digest.update("\n".join(hooks).encode())
+        return digest.hexdigest()[:16]
+
+    def _current(self):
+        self.refresh()
+        with self._lock:
+            if self._state is None:
+                self._state = self._build()
+            return self._state
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def registry():
+    """The process-wide registry of packer/ and entry point plugins"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PluginRegistry()
+    return _registry
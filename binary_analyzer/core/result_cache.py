@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Content-addressed analysis cache.
+
+Stage results are stored in SQLite keyed on (sha256, stage). Every row
+carries the version it was produced with: core stages use ANALYSIS_VERSION
+plus their options, the packer stage uses a digest of the packer plugins,
+so editing a packer module only invalidates packer results. The store is
+bounded by size and evicts the least recently used rows.
+"""
+
+import json
+import os
+import time
+
+# Bump when a core stage changes what it computes
+ANALYSIS_VERSION = "4"
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "binary_analyzer", "results.sqlite")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    sha256      TEXT NOT NULL,
+    stage       TEXT NOT NULL,
+    version     TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (sha256, stage)
+);
+CREATE INDEX IF NOT EXISTS results_lru ON results (last_access);
+"""
+
+
+class ResultCache:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Imported here: the CLI reads the defaults above on every start
+        import sqlite3
+        # Batch workers share the file; WAL lets readers run next to a writer
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    _instances = {}
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        """One connection per process and path (safe to call per file)"""
+        key = (os.getpid(), os.path.abspath(path))
+        if key not in cls._instances:
+            cls._instances[key] = cls(path, max_bytes)
+        cache = cls._instances[key]
+        cache.max_bytes = max_bytes
+        return cache
+
+    def get(self, sha256, stage, version):
+        row = self._db.execute(
+            "SELECT data FROM results WHERE sha256 = ? AND stage = ? AND version = ?",
+            (sha256, stage, version)).fetchone()
+        if row is None:
+            return None
+        with self._db:
+            self._db.execute(
+                "UPDATE results SET last_access = ? WHERE sha256 = ? AND stage = ?",
+                (time.time(), sha256, stage))
+        return json.loads(row[0])
+
+    def put(self, sha256, stage, version, data):
+        payload = json.dumps(data, separators=(',', ':'))
+        with self._db:
+            old = self._db.execute(
+                "SELECT size FROM results WHERE sha256 = ? AND stage = ?",
+                (sha256, stage)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, stage, version, payload, len(payload), time.time()))
+        self._size += len(payload) - (old[0] if old else 0)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used rows until 90% of max_bytes is left"""
+        target = int(self.max_bytes * 0.9)
+        with self._db:
+            self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            rows = self._db.execute(
+                "SELECT sha256, stage, size FROM results ORDER BY last_access").fetchall()
+            for sha256, stage, size in rows:
+                if self._size <= target:
+                    break
+                self._db.execute("DELETE FROM results WHERE sha256 = ? AND stage = ?",
+                                 (sha256, stage))
+                self._size -= size
+
+    def close(self):
+        self._db.close()
+        self._instances.pop((os.getpid(), os.path.abspath(self.path)), None)
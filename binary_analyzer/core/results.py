@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Typed stage results and the aggregate per-file report.
+
+Every analysis class returns one of these from result(); analyze_binary
+collects them into an AnalysisReport that serializes straight to JSON.
+"""
+
+import json
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+
+@dataclass
+class BasicInfoResult:
+    path: str
+    size: int
+    md5: str
+    sha1: str
+    sha256: str
+    ssdeep: Optional[str]  # None without the ssdeep / ppdeep module
+    ctph: str              # own CTPH, not comparable with ssdeep hashes
+    imphash: Optional[str]
+    binary_type: str
+    architecture: str
+    stripped: Optional[bool]
+    section_count: Optional[int]
+    strings_count: Optional[int]
+
+
+@dataclass
+class SecurityResult:
+    binary_type: str
+    checks: dict = field(default_factory=dict)
+
+
+@dataclass
+class EntropySection:
+    name: str
+    offset: int
+    size: int
+    entropy: float
+
+
+@dataclass
+class EntropyProfileResult:
+    window_size: int
+    stride: int
+    windows: list          # [offset, entropy] pairs
+    sections: list         # EntropySection
+    high_entropy_regions: list  # [start, end, max entropy]
+    peak: Optional[float]
+
+
+@dataclass
+class EntropyResult:
+    entropy: Optional[float]
+    assessment: str
+    profile: Optional[EntropyProfileResult] = None
+
+
+@dataclass
+class PackerResult:
+    status: str
+    packer: Optional[str]
+    confidence: int
+
+
+@dataclass
+class StringEntry:
+    offset: int
+    encoding: str          # "ascii" or "utf-16le"
+    section: Optional[str]
+    value: str
+
+
+@dataclass
+class SimilarSample:
+    sha256: str
+    path: str
+    similarity: float      # estimated Jaccard similarity of byte 4-grams
+    histogram: float       # byte histogram intersection
+    shared_sections: int   # sections with identical content
+
+
+@dataclass
+class AnalysisReport:
+    path: str
+    info: Optional[BasicInfoResult] = None
+    security: Optional[SecurityResult] = None
+    entropy: Optional[EntropyResult] = None
+    packer: Optional[PackerResult] = None
+    strings: Optional[list] = None   # StringEntry (--strings)
+    similar: Optional[list] = None   # SimilarSample (--similarity-index)
+    error: Optional[str] = None
+    metrics: Optional[dict] = None   # stage name -> Metrics counters (--timings)
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_json(self, indent=None):
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import struct
+
+from core import elf_parser
+from core import pe_parser
+
+# PE section characteristics
+IMAGE_SCN_MEM_EXECUTE = 0x20000000
+IMAGE_SCN_MEM_WRITE = 0x80000000
+# ELF sh_flags / p_flags
+SHF_WRITE = 0x1
+SHF_EXECINSTR = 0x4
+PF_X = 0x1
+PF_W = 0x2
+
+# Virtual size this many times the raw size: a memory-only unpack target
+INFLATED_RATIO = 4
+
+class Section:
+    """File-backed section of a PE or ELF binary"""
+
+    __slots__ = ('name', 'offset', 'size', 'virtual_size', 'flags', 'address')
+
+    def __init__(self, name, offset, size, virtual_size, flags, address=0):
+        self.name = name
+        self.offset = offset
+        self.size = size
+        self.virtual_size = virtual_size
+        self.flags = flags
+        self.address = address
+
+    def __repr__(self):
+        return f"Section({self.name!r}, offset=0x{self.offset:x}, size={self.size})"
+
+
+def parse_sections(binary, binary_type):
+    """Section table of the binary, [] if it can not be parsed"""
+    try:
+        if binary_type == "PE":
+            return _pe_sections(binary)
+        elif binary_type == "ELF":
+            return _elf_sections(binary)
+    except (struct.error, IndexError, ValueError):
+        pass
+    return []
+
+
+def _clamp(binary, offset, size):
+    """Keep section ranges inside the file (truncated or hostile headers)"""
+    if offset >= len(binary):
+        return offset, 0
+    return offset, min(size, len(binary) - offset)
+
+
+def _pe_sections(binary):
+    sections = []
+    for header in pe_parser.for_binary(binary).sections:
+        offset, size = _clamp(binary, header.pointer_to_raw_data, header.size_of_raw_data)
+        sections.append(Section(header.name, offset, size, header.virtual_size,
+                                header.characteristics, header.virtual_address))
+    return sections
+
+
+def _elf_sections(binary):
+    sections = []
+    for header in elf_parser.for_binary(binary).sections:
+        if header.type == elf_parser.SHT_NULL:
+            continue
+        # SHT_NOBITS (.bss) occupies no bytes in the file
+        file_size = 0 if header.type == elf_parser.SHT_NOBITS else header.size
+        offset, size = _clamp(binary, header.offset, file_size)
+        sections.append(Section(header.name, offset, size, header.size, header.flags, header.addr))
+    return sections
+
+
+class SectionTable:
+    """Section table of one binary (plus ELF program headers) for packer heuristics
+
+    Section names, sizes and flags are looked up here in O(#sections)
+    instead of searching the whole file for the name bytes, which also
+    matched the names anywhere in code or data.
+    """
+
+    __slots__ = ('binary_type', 'sections', 'segments', 'entry_point', '_names')
+
+    def __init__(self, binary_type, sections, segments=(), entry_point=None):
+        self.binary_type = binary_type
+        self.sections = sections
+        self.segments = list(segments)
+        self.entry_point = entry_point   # PE: RVA, ELF: virtual address
+        self._names = {section.name for section in sections}
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def find(self, name):
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def matched(self, names):
+        """The given section names present in the table"""
+        return [name for name in names if name in self._names]
+
+    def executable(self, section):
+        if self.binary_type == "PE":
+            return bool(section.flags & IMAGE_SCN_MEM_EXECUTE)
+        return bool(section.flags & SHF_EXECINSTR)
+
+    def writable(self, section):
+        if self.binary_type == "PE":
+            return bool(section.flags & IMAGE_SCN_MEM_WRITE)
+        return bool(section.flags & SHF_WRITE)
+
+    def writable_executable(self):
+        return [section for section in self.sections
+                if self.writable(section) and self.executable(section)]
+
+    def inflated(self, ratio=INFLATED_RATIO):
+        """Sections (ELF: PT_LOAD segments) much larger in memory than in the file"""
+        found = [section for section in self.sections
+                 if section.virtual_size and section.virtual_size > ratio * section.size]
+        found += [segment for segment in self.segments
+                  if segment.type == elf_parser.PT_LOAD and segment.memsz > ratio * segment.filesz]
+        return found
+
+    def entry_section(self):
+        """Section holding the entry point, or None"""
+        if self.entry_point is None:
+            return None
+        for section in self.sections:
+            if not section.address:
+                continue
+            if section.address <= self.entry_point < section.address + max(section.virtual_size,
+                                                                             section.size):
+                return section
+        return None
+
+
+def _entry_point(binary, binary_type):
+    try:
+        if binary_type == "PE":
+            return pe_parser.for_binary(binary).optional.address_of_entry_point
+        elif binary_type == "ELF":
+            return elf_parser.for_binary(binary).e_entry
+    except (struct.error, IndexError, ValueError):
+        pass
+    return None
+
+
+def _segments(binary, binary_type):
+    if binary_type != "ELF":
+        return []
+    try:
+        return elf_parser.for_binary(binary).program_headers
+    except (struct.error, IndexError, ValueError):
+        return []
+
+
+def for_binary(binary, binary_type):
+    """SectionTable of a BinaryBuffer, built once and shared by the packer modules"""
+    return binary.memo('section_table', lambda: SectionTable(
+        binary_type, parse_sections(binary, binary_type), _segments(binary, binary_type),
+        _entry_point(binary, binary_type)))
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 
-import struct
-import subprocess
+from core import elf_parser
+from core import pe_parser
+from core.results import SecurityResult
 
 class SecurityChecker:
-    def __init__(self, filepath, binary_type):
-        self.filepath = filepath
+    def __init__(self, binary, binary_type):
+        self.binary = binary
+        self.filepath = binary.filepath
         self.binary_type = binary_type
         self.checks = {}
         
@@ -33,89 +35,38 @@ class SecurityChecker:
     def _check_elf_nx(self):
         """ELF NX flag kontrolü"""
         try:
-            with open(self.filepath, "rb") as f:
-                
-                f.seek(0)
-                e_ident = f.read(16)
-                ei_class = e_ident[4]  # 1=32bit, 2=64bit
-                
-                if ei_class == 2:  # 64-bit
-                    f.seek(0x20)
-                    e_phoff = struct.unpack('<Q', f.read(8))[0]
-                    f.seek(0x38)
-                    e_phnum = struct.unpack('<H', f.read(2))[0]
-                    ph_size = 56
-                else:  # 32-bit
-                    f.seek(0x1C)
-                    e_phoff = struct.unpack('<I', f.read(4))[0]
-                    f.seek(0x2C)
-                    e_phnum = struct.unpack('<H', f.read(2))[0]
-                    ph_size = 32
-                
-                
-                for i in range(e_phnum):
-                    offset = e_phoff + (i * ph_size)
-                    f.seek(offset)
-                    p_type = struct.unpack('<I', f.read(4))[0]
-                    
-                    if p_type == 0x6474e551:  # PT_GNU_STACK
-                        f.seek(offset + (4 if ei_class == 1 else 8))
-                        p_flags = struct.unpack('<I', f.read(4))[0]
-                        # PF_X (execute) = 0x1
-                        return not (p_flags & 0x1)
-                
-                return False
+            # PT_GNU_STACK without PF_X
+            return elf_parser.for_binary(self.binary).nx
         except:
             return None
     
     def _check_elf_pie(self):
         
         try:
-            with open(self.filepath, "rb") as f:
-                f.seek(0x10)
-                e_type = struct.unpack('<H', f.read(2))[0]
-                # ET_DYN (3) = PIE or shared library
-                return e_type == 3
+            # ET_DYN (3) = PIE or shared library
+            return elf_parser.for_binary(self.binary).pie
         except:
             return None
     
     def _check_elf_relro(self):
        
         try:
-            result = subprocess.run(['readelf', '-l', self.filepath],
-                                  capture_output=True, text=True)
-            output = result.stdout
-            
-            if 'GNU_RELRO' in output:
-                
-                result2 = subprocess.run(['readelf', '-d', self.filepath],
-                                       capture_output=True, text=True)
-                if 'BIND_NOW' in result2.stdout:
-                    return "Full"
-                return "Partial"
-            return "No"
+            # GNU_RELRO segment, Full when BIND_NOW / DF_BIND_NOW / DF_1_NOW is set
+            return elf_parser.for_binary(self.binary).relro
         except:
             return None
     
     def _check_elf_canary(self):
         try:
-            result = subprocess.run(['readelf', '-s', self.filepath],
-                                  capture_output=True, text=True)
-            return '__stack_chk_fail' in result.stdout
+            symbols = elf_parser.for_binary(self.binary).symbol_names
+            return any(name.startswith('__stack_chk_fail') for name in symbols)
         except:
             return None
     
     def _get_elf_interpreter(self):
         """ELF interpreter bilgisi"""
         try:
-            result = subprocess.run(['readelf', '-l', self.filepath],
-                                  capture_output=True, text=True)
-            for line in result.stdout.split('\n'):
-                if 'interpreter' in line.lower():
-                    parts = line.split('[')
-                    if len(parts) > 1:
-                        return parts[1].split(']')[0]
-            return None
+            return elf_parser.for_binary(self.binary).interpreter
         except:
             return None
     
@@ -132,71 +83,68 @@ class SecurityChecker:
         # SafeSEH
         self.checks['SafeSEH'] = self._check_pe_safeseh()
     
+    def _read_pe_dll_characteristics(self):
+        """DllCharacteristics alanını oku"""
+        return pe_parser.for_binary(self.binary).dll_characteristics
+    
     def _check_pe_aslr(self):
         try:
-            with open(self.filepath, "rb") as f:
-                f.seek(0x3C)
-                pe_offset = struct.unpack('<I', f.read(4))[0]
-                f.seek(pe_offset + 0x16)
-                characteristics = struct.unpack('<H', f.read(2))[0]
-                
-                # DllCharacteristics offset
-                f.seek(pe_offset + 0x5E)
-                dll_chars = struct.unpack('<H', f.read(2))[0]
-                
-                # IMAGE_DLLCHARACTERISTICS_DYNAMIC_BASE = 0x0040
-                return bool(dll_chars & 0x0040)
+            dll_chars = self._read_pe_dll_characteristics()
+            
+            # IMAGE_DLLCHARACTERISTICS_DYNAMIC_BASE = 0x0040
+            return bool(dll_chars & pe_parser.DLL_DYNAMIC_BASE)
         except:
             return None
     
     def _check_pe_dep(self):
         
         try:
-            with open(self.filepath, "rb") as f:
-                f.seek(0x3C)
-                pe_offset = struct.unpack('<I', f.read(4))[0]
-                f.seek(pe_offset + 0x5E)
-                dll_chars = struct.unpack('<H', f.read(2))[0]
-                
-                # IMAGE_DLLCHARACTERISTICS_NX_COMPAT = 0x0100
-                return bool(dll_chars & 0x0100)
+            dll_chars = self._read_pe_dll_characteristics()
+            
+            # IMAGE_DLLCHARACTERISTICS_NX_COMPAT = 0x0100
+            return bool(dll_chars & pe_parser.DLL_NX_COMPAT)
         except:
             return None
     
     def _check_pe_cfg(self):
         
         try:
-            with open(self.filepath, "rb") as f:
-                f.seek(0x3C)
-                pe_offset = struct.unpack('<I', f.read(4))[0]
-                f.seek(pe_offset + 0x5E)
-                dll_chars = struct.unpack('<H', f.read(2))[0]
-                
-                # IMAGE_DLLCHARACTERISTICS_GUARD_CF = 0x4000
-                return bool(dll_chars & 0x4000)
+            dll_chars = self._read_pe_dll_characteristics()
+            
+            # IMAGE_DLLCHARACTERISTICS_GUARD_CF = 0x4000
+            return bool(dll_chars & pe_parser.DLL_GUARD_CF)
         except:
             return None
     
     def _check_pe_safeseh(self):
         
         try:
+            pe = pe_parser.for_binary(self.binary)
+            
+            if pe.machine != pe_parser.MACHINE_I386:  
+                return "N/A"
             
-            with open(self.filepath, "rb") as f:
-                f.seek(0x3C)
-                pe_offset = struct.unpack('<I', f.read(4))[0]
-                f.seek(pe_offset + 4)
-                machine = struct.unpack('<H', f.read(2))[0]
-                
-                if machine != 0x014c:  
-                    return "N/A"
-                
-                f.seek(pe_offset + 0xD8)
-                load_config_rva = struct.unpack('<I', f.read(4))[0]
-                
-                return load_config_rva != 0
+            # SafeSEH tables live in the load configuration directory
+            return pe.directory(pe_parser.DIRECTORY_LOAD_CONFIG) is not None
         except:
             return None
     
+    def result(self):
+        return SecurityResult(self.binary_type, dict(self.checks))
+    
+    def to_dict(self):
+        return {'binary_type': self.binary_type, 'checks': self.checks}
+    
+    @classmethod
+    def from_dict(cls, binary, data):
+        """Rebuild from a cached to_dict() without running the checks"""
+        checker = cls.__new__(cls)
+        checker.binary = binary
+        checker.filepath = binary.filepath
+        checker.binary_type = data['binary_type']
+        checker.checks = data['checks']
+        return checker
+    
     def display(self):
         
         if self.binary_type == "ELF":
@@ -244,15 +192,15 @@ class SecurityChecker:
         """RELRO değerini formatla"""
         if value is None:
             return f" Unknown"
-        elif value == " Full":
+        elif value == "Full":
             return f" Full RELRO"
-        elif value == " Partial":
+        elif value == "Partial":
             return f" Partial RELRO"
         else:
             return f" No RELRO"
     
     def _format_safeseh(self, value):
         """SafeSEH değerini formatla"""
-        if value == " N/A":
+        if value == "N/A":
             return f" N/A (64-bit)"
         return self._format_bool(value)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Multi-pattern byte signature engine.
+
+Packer modules declare their signatures as data (SIGNATURES list) and the
+engine matches all of them in a single pass over the buffer.
+
+With NumPy the 4-byte prefix at every offset is hashed into a bitmap of
+known pattern prefixes in bulk; only the few candidate offsets are then
+verified, so the scan cost stays flat as signatures are added. Without
+NumPy (and for patterns shorter than 4 bytes) the patterns are compiled
+into one trie-shaped regular expression; matches overlapping an earlier
+match are recovered with anchored re-matches inside it.
+"""
+
+import re
+from collections import defaultdict
+
+from core.byte_stats import np
+
+SCAN_BLOCK = 1024 * 1024
+PREFIX_LENGTH = 4
+_HASH_BITS = 20
+
+
+class Signature:
+    """Byte pattern worth `score` confidence points.
+
+    start/end restrict where the pattern may begin (e.g. end=2048 for
+    "somewhere in the first 2 KB"). Signatures sharing a group only score
+    once, with the highest score in the group.
+    """
+
+    __slots__ = ('pattern', 'score', 'start', 'end', 'group')
+
+    def __init__(self, pattern, score=0, start=None, end=None, group=None):
+        if not pattern:
+            raise ValueError("empty signature pattern")
+        self.pattern = bytes(pattern)
+        self.score = score
+        self.start = start
+        self.end = end
+        self.group = group
+
+    @property
+    def bounded(self):
+        return self.start is not None or self.end is not None
+
+    def __repr__(self):
+        return f"Signature({self.pattern!r}, {self.score})"
+
+
+class SignatureMatches:
+    """Signature hits of one owner (packer module)"""
+
+    def __init__(self, signatures, counts):
+        self.signatures = signatures
+        self._counts = counts
+        self.hits = [sig for sig in signatures if counts.get(_key(sig), 0)]
+
+    def __contains__(self, pattern):
+        return any(sig.pattern == pattern for sig in self.hits)
+
+    def count(self, pattern):
+        """Occurrences of a registered pattern"""
+        for sig in self.signatures:
+            if sig.pattern == pattern:
+                return self._counts.get(_key(sig), 0)
+        return 0
+
+    def matched(self, patterns):
+        """How many of the given patterns were found"""
+        return sum(1 for pattern in patterns if pattern in self)
+
+    def score(self):
+        total = 0
+        groups = {}
+        for sig in self.hits:
+            if sig.group is None:
+                total += sig.score
+            else:
+                groups[sig.group] = max(groups.get(sig.group, 0), sig.score)
+        return total + sum(groups.values())
+
+
+def _key(sig):
+    return (sig.pattern, sig.start, sig.end)
+
+
+class _PatternSet:
+    """Compiled matcher for a set of patterns"""
+
+    def __init__(self, patterns):
+        self.patterns = sorted(set(patterns))
+
+        if np is not None:
+            long_patterns = [p for p in self.patterns if len(p) >= PREFIX_LENGTH]
+            short_patterns = [p for p in self.patterns if len(p) < PREFIX_LENGTH]
+        else:
+            long_patterns, short_patterns = [], self.patterns
+
+        self._prefilter = _PrefixFilter(long_patterns) if long_patterns else None
+        self._trie = _TrieRegex(short_patterns) if short_patterns else None
+
+    def scan(self, data, start=0, end=None):
+        """{pattern: occurrences} for matches starting in data[start:end]"""
+        if end is None:
+            end = len(data)
+        counts = defaultdict(int)
+        if start >= end:
+            return counts
+        if self._prefilter is not None:
+            self._prefilter.scan(data, start, end, counts)
+        if self._trie is not None:
+            self._trie.scan(data, start, end, counts)
+        return counts
+
+
+class _PrefixFilter:
+    """NumPy prefix-hash candidate filter + exact verification"""
+
+    def __init__(self, patterns):
+        self.by_prefix = defaultdict(list)
+        for pattern in patterns:
+            self.by_prefix[int.from_bytes(pattern[:PREFIX_LENGTH], 'little')].append(pattern)
+
+        self.bitmap = np.zeros(1 << _HASH_BITS, dtype=np.bool_)
+        keys = np.array(list(self.by_prefix), dtype=np.uint32)
+        self.bitmap[self._hash(keys)] = True
+
+    @staticmethod
+    def _hash(keys):
+        # Multiplicative (Fibonacci) hashing of the 32-bit prefix
+        return (keys * np.uint32(2654435761)) >> np.uint32(32 - _HASH_BITS)
+
+    def scan(self, data, start, end, counts):
+        size = len(data)
+        by_prefix = self.by_prefix
+        for block_start in range(start, end, SCAN_BLOCK):
+            block_end = min(block_start + SCAN_BLOCK, end)
+            window = data[block_start:min(block_end + PREFIX_LENGTH - 1, size)]
+            array = np.frombuffer(window, dtype=np.uint8)
+            positions = len(array) - PREFIX_LENGTH + 1
+            if positions <= 0:
+                continue
+            positions = min(positions, block_end - block_start)
+
+            keys = array[:positions].astype(np.uint32)
+            for shift in range(1, PREFIX_LENGTH):
+                keys |= array[shift:shift + positions].astype(np.uint32) << np.uint32(8 * shift)
+
+            candidates = np.flatnonzero(self.bitmap[self._hash(keys)])
+            for index, key in zip(candidates.tolist(), keys[candidates].tolist()):
+                for pattern in by_prefix.get(key, ()):
+                    offset = block_start + index
+                    if data[offset:offset + len(pattern)] == pattern:
+                        counts[pattern] += 1
+
+
+class _TrieRegex:
+    """Trie regex over a set of patterns plus prefix bookkeeping"""
+
+    def __init__(self, patterns):
+        self.regex = re.compile(_trie_regex(patterns), re.DOTALL)
+        self.max_length = max(len(pattern) for pattern in patterns)
+        # Every pattern matching at a position is a prefix of the longest one
+        pattern_set = set(patterns)
+        self.prefixes = {
+            pattern: [pattern[:i] for i in range(1, len(pattern) + 1) if pattern[:i] in pattern_set]
+            for pattern in patterns
+        }
+
+    def scan(self, data, start, end, counts):
+        regex, prefixes = self.regex, self.prefixes
+        for match in regex.finditer(data, start, end + self.max_length - 1):
+            found_at, found_end = match.span()
+            if found_at >= end:
+                break
+            for pattern in prefixes[match.group()]:
+                counts[pattern] += 1
+            # Patterns starting inside this match are skipped by finditer
+            for pos in range(found_at + 1, min(found_end, end)):
+                inner = regex.match(data, pos)
+                if inner:
+                    for pattern in prefixes[inner.group()]:
+                        counts[pattern] += 1
+
+
+def _trie_regex(patterns):
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for byte in pattern:
+            node = node.setdefault(byte, {})
+        node[None] = True
+    return _node_regex(trie)
+
+
+def _node_regex(node):
+    branches = []
+    for byte in sorted(key for key in node if key is not None):
+        branches.append(re.escape(bytes([byte])) + _node_regex(node[byte]))
+
+    if not branches:
+        return b''
+    body = branches[0] if len(branches) == 1 else b'(?:' + b'|'.join(branches) + b')'
+    if None in node:
+        # A pattern ends here; greedy optional keeps the longest match
+        return b'(?:' + body + b')?'
+    return body
+
+
+class SignatureEngine:
+    """Registry of signatures from many owners, matched in one pass"""
+
+    def __init__(self):
+        self._owners = {}
+        self._compiled = {}   # frozenset of owners -> compiled pattern sets
+
+    def register(self, owner, signatures):
+        self._owners[owner] = [sig if isinstance(sig, Signature) else Signature(*sig)
+                               for sig in signatures]
+        self._compiled = {}
+
+    def __len__(self):
+        return sum(len(sigs) for sigs in self._owners.values())
+
+    def _compile(self, names):
+        unbounded = set()
+        bounded = defaultdict(set)
+        for name in names:
+            for sig in self._owners[name]:
+                if sig.bounded:
+                    bounded[(sig.start, sig.end)].add(sig.pattern)
+                else:
+                    unbounded.add(sig.pattern)
+
+        return (
+            _PatternSet(unbounded) if unbounded else None,
+            {window: _PatternSet(patterns) for window, patterns in bounded.items()},
+        )
+
+    def scanner(self, owners=None):
+        """Incremental scan over the given (or all) owners' patterns"""
+        names = list(self._owners) if owners is None else [name for name in owners
+                                                           if name in self._owners]
+        key = frozenset(names)
+        if key not in self._compiled:
+            self._compiled[key] = self._compile(names)
+        return SignatureScan(self, names, *self._compiled[key])
+
+    def scan(self, data, owners=None):
+        """{owner: SignatureMatches} for the given (or all) owners
+
+        Only the patterns of the requested owners are searched for.
+        """
+        # BinaryBuffer: scan the zero-copy view, not mmap slices
+        data = getattr(data, 'view', data)
+        scan = self.scanner(owners)
+        scan.feed(data, 0, len(data))
+        return scan.matches()
+
+
+class SignatureScan:
+    """Signature counts of one buffer, fed range by range in any order
+
+    A match is counted for the range it starts in; the verification may
+    read up to the longest pattern past the end of the range, so ranges
+    cut at arbitrary offsets (streaming chunks) lose no straddling match.
+    """
+
+    def __init__(self, engine, names, unbounded, bounded):
+        self.engine = engine
+        self.names = names
+        self._unbounded = unbounded
+        self._bounded = bounded
+        self._counts = defaultdict(int)
+
+    def feed(self, data, start, end):
+        """Count matches starting in data[start:end]"""
+        counts = self._counts
+        if self._unbounded is not None:
+            for pattern, count in self._unbounded.scan(data, start, end).items():
+                counts[(pattern, None, None)] += count
+        for (first, last), pattern_set in self._bounded.items():
+            low = max(start, first or 0)
+            high = end if last is None else min(end, last)
+            if low < high:
+                for pattern, count in pattern_set.scan(data, low, high).items():
+                    counts[(pattern, first, last)] += count
+
+    def matches(self, owners=None):
+        """{owner: SignatureMatches} for the scanned (or the given subset of) owners"""
+        names = self.names if owners is None else [name for name in owners if name in self.names]
+        owners = self.engine._owners
+        return {name: SignatureMatches(owners[name], self._counts) for name in names}
+
+
+def match(data, signatures):
+    """One-off scan of a single signature list (standalone module use)"""
+    engine = SignatureEngine()
+    engine.register(None, signatures)
+    return engine.scan(data)[None]
+
+
+def for_binary(binary, engine, owners=None):
+    """engine.scan() of a BinaryBuffer, reusing a streaming pass (core.streaming) when one ran"""
+    streamed = binary.get('signatures')
+    if streamed is not None and streamed.engine is engine:
+        if owners is None or set(owners) & set(engine._owners) <= set(streamed.names):
+            return streamed.matches(owners)
+    return engine.scan(binary, owners)
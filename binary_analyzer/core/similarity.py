@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Persistent similarity index of samples: which known files are variants.
+
+Every sample gets a Fingerprint:
+
+    minhash    one-permutation MinHash of its byte 4-grams (PERMUTATIONS
+               bins); the share of equal bins estimates the Jaccard
+               similarity of two 4-gram sets
+    histogram  the normalized byte histogram the entropy stage built
+    sections   SHA256 of every section of MIN_SECTION_BYTES and more
+
+The index is locality-sensitive: the MinHash is cut into BANDS bands of
+ROWS values and each band is stored as one hashed key. Two samples share
+a key with probability 1 - (1 - J**ROWS)**BANDS (J = 0.5: 87%, J = 0.6:
+99%), so nearest() only compares the samples found under the query's band
+keys and section digests, never the whole corpus. Samples are keyed by
+SHA256 like the string index and inserted one at a time as they are
+analyzed.
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import time
+from array import array
+
+from core import byte_stats
+from core import sections as section_table
+from core.results import SimilarSample
+
+np = byte_stats.np
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "binary_analyzer", "similarity.sqlite")
+NGRAM = 4
+PERMUTATIONS = 128
+BANDS = 32
+ROWS = PERMUTATIONS // BANDS
+MAX_SCAN_BYTES = 32 * 1024 * 1024   # 4-grams are taken from the start of larger files
+MIN_SECTION_BYTES = 512
+NEAREST_LIMIT = 10
+MIN_SIMILARITY = 0.3
+CANDIDATE_LIMIT = 1000
+SCAN_CHUNK = 4 * 1024 * 1024
+_LOOKUP_BATCH = 500
+
+# 4-gram -> 64-bit hash: the top 7 bits pick the bin, the 32 below are the value.
+# The second xorshift-multiply round mixes the low, near-constant bits of
+# padding and zero runs, which otherwise bias the estimate upwards.
+_SEED = 0x5851F42D4C957F2D
+_MULTIPLIER = 0x9E3779B97F4A7C15
+_MIX = 0xBF58476D1CE4E5B9
+_MASK = (1 << 64) - 1
+_EMPTY = _MASK
+_BIN_SHIFT = 64 - (PERMUTATIONS.bit_length() - 1)
+_VALUE_SHIFT = _BIN_SHIFT - 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id         INTEGER PRIMARY KEY,
+    sha256     TEXT NOT NULL UNIQUE,
+    path       TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    minhash    BLOB NOT NULL,
+    histogram  BLOB NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    key       INTEGER NOT NULL,
+    sample_id INTEGER NOT NULL,
+    PRIMARY KEY (key, sample_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS section_hashes (
+    digest    TEXT NOT NULL,
+    sample_id INTEGER NOT NULL,
+    name      TEXT,
+    PRIMARY KEY (digest, sample_id)
+) WITHOUT ROWID;
+"""
+
+
+def _update_numpy(minimums, data):
+    for shift in range(NGRAM):
+        count = (len(data) - shift) // 4
+        grams = np.frombuffer(data, dtype='<u4', count=count, offset=shift).astype(np.uint64)
+        # uint64 arithmetic wraps: the product is taken mod 2**64
+        hashes = (grams ^ np.uint64(_SEED)) * np.uint64(_MULTIPLIER)
+        hashes ^= hashes >> np.uint64(31)
+        hashes *= np.uint64(_MIX)
+        np.minimum.at(minimums, hashes >> np.uint64(_BIN_SHIFT), hashes)
+
+
+def _update_python(minimums, data):
+    grams = set()
+    for shift in range(NGRAM):
+        count = (len(data) - shift) // 4
+        lane = array('I')
+        lane.frombytes(data[shift:shift + count * 4])
+        if sys.byteorder == 'big':
+            lane.byteswap()
+        grams.update(lane)
+    for gram in grams:
+        value = ((gram ^ _SEED) * _MULTIPLIER) & _MASK
+        value = ((value ^ (value >> 31)) * _MIX) & _MASK
+        index = value >> _BIN_SHIFT
+        if value < minimums[index]:
+            minimums[index] = value
+
+
+def _densify(minimums):
+    """Bin values; an empty bin borrows the next non-empty one (offset by the distance)"""
+    filled = [(value >> _VALUE_SHIFT) & 0xFFFFFFFF if value != _EMPTY else None
+              for value in minimums]
+    if all(value is None for value in filled):
+        return None
+    values = []
+    for index, value in enumerate(filled):
+        distance = 0
+        while value is None:
+            distance += 1
+            value = filled[(index + distance) % PERMUTATIONS]
+        values.append((value + distance * 0x9E3779B1) & 0xFFFFFFFF)
+    return values
+
+
+def minhash(binary, limit=MAX_SCAN_BYTES, use_numpy=None):
+    """PERMUTATIONS bin values of the byte 4-grams of a BinaryBuffer, or None"""
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        minimums = np.full(PERMUTATIONS, _EMPTY, dtype=np.uint64)
+        update = _update_numpy
+    else:
+        minimums = [_EMPTY] * PERMUTATIONS
+        update = _update_python
+
+    end = min(len(binary), limit)
+    # NGRAM - 1 bytes of overlap: grams across chunk boundaries are counted too
+    for offset in range(0, end, SCAN_CHUNK):
+        data = binary.view[offset:min(offset + SCAN_CHUNK + NGRAM - 1, end)]
+        if len(data) < NGRAM:
+            break
+        update(minimums, data)
+    return _densify([int(value) for value in minimums])
+
+
+def _section_digests(binary, binary_type):
+    digests = []
+    for section in section_table.for_binary(binary, binary_type):
+        if section.size >= MIN_SECTION_BYTES:
+            data = binary.view[section.offset:section.offset + section.size]
+            digests.append((section.name, hashlib.sha256(data).hexdigest()))
+    return digests
+
+
+class Fingerprint:
+    __slots__ = ('minhash', 'histogram', 'sections')
+
+    def __init__(self, minhash, histogram, sections):
+        self.minhash = minhash       # PERMUTATIONS ints
+        self.histogram = histogram   # 256 byte frequencies summing to 1
+        self.sections = sections     # (name, sha256)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two MinHash value lists"""
+    return sum(1 for x, y in zip(a, b) if x == y) / PERMUTATIONS
+
+
+def histogram_similarity(a, b):
+    """Histogram intersection of two normalized byte histograms (0..1)"""
+    return sum(min(x, y) for x, y in zip(a, b))
+
+
+def band_keys(values):
+    """One signed 64-bit key per band, the band number included"""
+    keys = []
+    for band in range(BANDS):
+        rows = values[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<H{ROWS}I', band, *rows), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def for_binary(binary, binary_type):
+    """Fingerprint of a BinaryBuffer, None for files shorter than one 4-gram"""
+    def build():
+        values = minhash(binary)
+        if values is None:
+            return None
+        stats = byte_stats.for_binary(binary)
+        total = stats.length or 1
+        histogram = [count / total for count in stats.histogram]
+        return Fingerprint(values, histogram, _section_digests(binary, binary_type))
+    return binary.memo('similarity', build)
+
+
+class SimilarityIndex:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        import sqlite3
+        # Batch workers share the file; WAL lets readers run next to a writer
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    _instances = {}
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH):
+        """One connection per process and path (safe to call per file)"""
+        key = (os.getpid(), os.path.abspath(path))
+        if key not in cls._instances:
+            cls._instances[key] = cls(path)
+        return cls._instances[key]
+
+    def contains(self, sha256):
+        return self._db.execute("SELECT 1 FROM samples WHERE sha256 = ?", (sha256,)).fetchone() is not None
+
+    def add(self, sha256, path, size, fingerprint):
+        """Index the Fingerprint of one sample; False if it was already indexed"""
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO samples (sha256, path, size, minhash, histogram, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, str(path), size,
+                 struct.pack(f'<{PERMUTATIONS}I', *fingerprint.minhash),
+                 struct.pack('<256f', *fingerprint.histogram), time.time()))
+            if not cursor.rowcount:
+                return False
+            sample_id = cursor.lastrowid
+            self._db.executemany("INSERT OR IGNORE INTO bands VALUES (?, ?)",
+                                 ((key, sample_id) for key in band_keys(fingerprint.minhash)))
+            self._db.executemany("INSERT OR IGNORE INTO section_hashes VALUES (?, ?, ?)",
+                                 ((digest, sample_id, name) for name, digest in fingerprint.sections))
+        return True
+
+    def _candidates(self, fingerprint):
+        """{sample id: shared section count} of samples sharing a band key or a section"""
+        keys = band_keys(fingerprint.minhash)
+        candidates = {sample_id: 0 for sample_id, in self._db.execute(
+            f"SELECT sample_id FROM bands WHERE key IN ({','.join('?' * len(keys))}) "
+            "GROUP BY sample_id ORDER BY COUNT(*) DESC LIMIT ?", (*keys, CANDIDATE_LIMIT))}
+        digests = list({digest for _, digest in fingerprint.sections})
+        if digests:
+            rows = self._db.execute(
+                f"SELECT sample_id, COUNT(*) FROM section_hashes "
+                f"WHERE digest IN ({','.join('?' * len(digests))}) "
+                "GROUP BY sample_id ORDER BY COUNT(*) DESC LIMIT ?", (*digests, CANDIDATE_LIMIT))
+            for sample_id, shared in rows:
+                candidates[sample_id] = shared
+        return candidates
+
+    def nearest(self, fingerprint, limit=NEAREST_LIMIT, exclude=None, min_similarity=MIN_SIMILARITY):
+        """SimilarSamples closest to fingerprint, most similar first
+
+        exclude: SHA256 left out of the answer (the query sample itself).
+        Samples below min_similarity are kept only when they share a section.
+        """
+        candidates = self._candidates(fingerprint)
+        ids = list(candidates)
+        found = []
+        for start in range(0, len(ids), _LOOKUP_BATCH):
+            batch = ids[start:start + _LOOKUP_BATCH]
+            rows = self._db.execute(
+                f"SELECT id, sha256, path, minhash, histogram FROM samples "
+                f"WHERE id IN ({','.join('?' * len(batch))})", batch)
+            for sample_id, sha256, path, values, histogram in rows:
+                if sha256 == exclude:
+                    continue
+                score = similarity(fingerprint.minhash, struct.unpack(f'<{PERMUTATIONS}I', values))
+                shared = candidates[sample_id]
+                if score < min_similarity and not shared:
+                    continue
+                found.append(SimilarSample(
+                    sha256, path, round(score, 4),
+                    round(histogram_similarity(fingerprint.histogram,
+                                               struct.unpack('<256f', histogram)), 4),
+                    shared))
+        found.sort(key=lambda sample: (sample.similarity, sample.shared_sections,
+                                       sample.histogram), reverse=True)
+        return found[:limit]
+
+    def stats(self):
+        return {table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('samples', 'bands', 'section_hashes')}
+
+    def close(self):
+        self._db.close()
+        self._instances.pop((os.getpid(), os.path.abspath(self.path)), None)
+
+
+def display(similar):
+    if not similar:
+        print("No similar samples in the index")
+        return
+    print(f"{'Similarity':>10}  {'Histogram':>9}  {'Sections':>8}  Sample")
+    for sample in similar:
+        print(f"{sample.similarity:>10.2f}  {sample.histogram:>9.2f}  {sample.shared_sections:>8}  "
+              f"{sample.sha256[:16]}  {sample.path}")
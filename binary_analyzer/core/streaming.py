@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Single-pass, bounded-memory analysis of large files.
+
+BinaryBuffer maps the whole file and the hashing, byte statistics and
+signature stages each walk it once. On a file larger than RAM that means
+three reads from disk and mapped pages piling up in the resident set.
+run() feeds STREAM_CHUNK sized chunks through all three at once on a
+streaming BinaryBuffer (pages are dropped behind the reader) and leaves the
+results in the buffer memo, where hashing.for_binary, byte_stats.for_binary
+and signatures.for_binary pick them up.
+
+Boundaries are handled by the consumers themselves: ByteStats carries an
+open printable run into the next chunk, the CTPH carries its rolling
+window, and signature verification reads past the end of a chunk so a
+pattern straddling two chunks is counted once, in the chunk it starts in.
+"""
+
+from core import byte_stats
+from core import hashing
+
+STREAM_CHUNK = 16 * 1024 * 1024
+# analyze_binary streams files at least this large unless told otherwise
+STREAM_THRESHOLD = 1024 * 1024 * 1024
+
+
+def run(binary, signatures=None, chunk_size=STREAM_CHUNK):
+    """Digests, ByteStats and (with a SignatureEngine) signature counts in one pass"""
+    hasher = hashing.Hasher(len(binary))
+    stats = byte_stats.ByteStats()
+    scan = signatures.scanner() if signatures is not None else None
+
+    offset = 0
+    for chunk in binary.chunks(chunk_size):
+        hasher.update(chunk)
+        stats.update(chunk)
+        if scan is not None:
+            scan.feed(binary.view, offset, offset + len(chunk))
+        offset += len(chunk)
+
+    hashing.store(binary, hasher.digests(binary))
+    binary.memo('byte_stats', stats.finalize)
+    if scan is not None:
+        binary.memo('signatures', lambda: scan)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Persistent inverted index of extracted strings across samples.
+
+    strings      one row per distinct string value
+    strings_fts  FTS5 trigram index over the values (substring search)
+    samples      one row per indexed SHA256
+    occurrences  (string, sample, offset, encoding, section)
+
+Samples are keyed by SHA256 like the result cache: a file that was already
+indexed is skipped, wherever it lives. Searches are case-insensitive
+substring matches served by the trigram index; terms shorter than three
+characters (or SQLite builds without FTS5) fall back to a LIKE scan of the
+distinct strings, which is still far smaller than rescanning the samples.
+"""
+
+import os
+import time
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "binary_analyzer", "strings.sqlite")
+SEARCH_LIMIT = 1000
+_LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (
+    id    INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS samples (
+    id         INTEGER PRIMARY KEY,
+    sha256     TEXT NOT NULL UNIQUE,
+    path       TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    string_id INTEGER NOT NULL,
+    sample_id INTEGER NOT NULL,
+    offset    INTEGER NOT NULL,
+    encoding  TEXT NOT NULL,
+    section   TEXT
+);
+CREATE INDEX IF NOT EXISTS occurrences_string ON occurrences (string_id);
+CREATE INDEX IF NOT EXISTS occurrences_sample ON occurrences (sample_id);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS strings_fts
+USING fts5(value, content='strings', content_rowid='id', tokenize='trigram');
+"""
+
+
+class StringIndex:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        import sqlite3
+        # Batch workers share the file; WAL lets readers run next to a writer
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        try:
+            self._db.executescript(_FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite without FTS5 / the trigram tokenizer (< 3.34)
+            self.fts = False
+
+    _instances = {}
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH):
+        """One connection per process and path (safe to call per file)"""
+        key = (os.getpid(), os.path.abspath(path))
+        if key not in cls._instances:
+            cls._instances[key] = cls(path)
+        return cls._instances[key]
+
+    def contains(self, sha256):
+        return self._db.execute("SELECT 1 FROM samples WHERE sha256 = ?", (sha256,)).fetchone() is not None
+
+    def add(self, sha256, path, size, entries):
+        """Index the StringEntry list of one sample; False if it was already indexed"""
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO samples (sha256, path, size, indexed_at) VALUES (?, ?, ?, ?)",
+                (sha256, str(path), size, time.time()))
+            if not cursor.rowcount:
+                return False
+            sample_id = cursor.lastrowid
+            ids = self._string_ids({entry.value for entry in entries})
+            self._db.executemany(
+                "INSERT INTO occurrences VALUES (?, ?, ?, ?, ?)",
+                ((ids[entry.value], sample_id, entry.offset, entry.encoding, entry.section)
+                 for entry in entries))
+        return True
+
+    def _string_ids(self, values):
+        """{value: id}, inserting the values not seen in any earlier sample"""
+        values = list(values)
+        ids = {}
+        for start in range(0, len(values), _LOOKUP_BATCH):
+            batch = values[start:start + _LOOKUP_BATCH]
+            ids.update(self._db.execute(
+                f"SELECT value, id FROM strings WHERE value IN ({','.join('?' * len(batch))})",
+                batch))
+
+        new = [value for value in values if value not in ids]
+        for value in new:
+            ids[value] = self._db.execute("INSERT INTO strings (value) VALUES (?)", (value,)).lastrowid
+        if self.fts and new:
+            self._db.executemany("INSERT INTO strings_fts (rowid, value) VALUES (?, ?)",
+                                 ((ids[value], value) for value in new))
+        return ids
+
+    def search(self, term, exact=False, limit=SEARCH_LIMIT):
+        """Occurrences of strings containing term (or equal to it), as dicts"""
+        if exact:
+            matching, argument = "SELECT id FROM strings WHERE value = ?", term
+        elif self.fts and len(term) >= 3:
+            matching = "SELECT rowid FROM strings_fts WHERE strings_fts MATCH ?"
+            argument = '"' + term.replace('"', '""') + '"'
+        else:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            matching = "SELECT id FROM strings WHERE value LIKE ? ESCAPE '\\'"
+            argument = f"%{escaped}%"
+
+        rows = self._db.execute(
+            "SELECT samples.sha256, samples.path, occurrences.offset, occurrences.encoding, "
+            "occurrences.section, strings.value FROM occurrences "
+            "JOIN samples ON samples.id = occurrences.sample_id "
+            "JOIN strings ON strings.id = occurrences.string_id "
+            f"WHERE occurrences.string_id IN ({matching}) "
+            "ORDER BY samples.path, occurrences.offset LIMIT ?",
+            (argument, limit))
+        fields = ('sha256', 'path', 'offset', 'encoding', 'section', 'value')
+        return [dict(zip(fields, row)) for row in rows]
+
+    def stats(self):
+        return {table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('samples', 'strings', 'occurrences')}
+
+    def close(self):
+        self._db.close()
+        self._instances.pop((os.getpid(), os.path.abspath(self.path)), None)
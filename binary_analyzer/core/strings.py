@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Printable string extraction (ASCII and UTF-16LE) with offsets and sections.
+
+The file is scanned in EXTRACT_CHUNK pieces. With NumPy the printable mask
+of a whole chunk is built at once and run boundaries come out of one
+np.diff; UTF-16LE runs are found on the even and odd byte lanes of the
+same mask, so strings at odd offsets are not missed. Without NumPy a
+compiled regular expression walks the chunk in C.
+
+Each chunk is scanned with one character of look-behind (so a run already
+open at the chunk start is recognised and skipped) and MAX_STRING_LENGTH
+characters of look-ahead (so a run starting near the end is complete), and
+a run is reported by the chunk it starts in: strings straddling chunk
+boundaries come out exactly once.
+"""
+
+import re
+from bisect import bisect_right
+from functools import lru_cache
+
+from core import byte_stats
+from core.results import StringEntry
+from core.sections import parse_sections
+
+np = byte_stats.np
+
+EXTRACT_CHUNK = 4 * 1024 * 1024
+MIN_STRING_LENGTH = byte_stats.MIN_STRING_LENGTH
+MAX_STRING_LENGTH = 1024   # characters kept per string; longer runs are truncated
+DISPLAY_LIMIT = 40         # strings printed in the text report
+
+# encoding name -> bytes per character
+ENCODINGS = {'ascii': 1, 'utf-16le': 2}
+
+
+def _runs_numpy(window, unit, min_length, skip, limit):
+    """(start, end) of printable runs in window starting in [skip, limit)"""
+    data = np.frombuffer(window, dtype=np.uint8)
+    printable = (data - np.uint8(32)) < np.uint8(95)
+    if unit == 1:
+        lanes = ((0, printable),)
+    else:
+        # A UTF-16LE character is a printable byte followed by a zero byte
+        chars = printable[:-1] & (data[1:] == 0)
+        lanes = ((0, chars[0::2]), (1, chars[1::2]))
+
+    for phase, lane in lanes:
+        padded = np.concatenate(([False], lane, [False])).view(np.int8)
+        edges = np.diff(padded)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        keep = ends - starts >= min_length
+        starts = phase + starts[keep] * unit
+        ends = phase + ends[keep] * unit
+        inside = (starts >= skip) & (starts < limit)
+        yield from zip(starts[inside].tolist(), ends[inside].tolist())
+
+
+@lru_cache(maxsize=None)
+def _run_regex(unit, min_length):
+    if unit == 1:
+        return re.compile(rb'(?<![\x20-\x7e])[\x20-\x7e]{%d,}' % min_length)
+    return re.compile(rb'(?<![\x20-\x7e]\x00)(?:[\x20-\x7e]\x00){%d,}' % min_length)
+
+
+def _runs_regex(window, unit, min_length, skip, limit):
+    # finditer from skip still sees the look-behind byte(s) before it
+    for match in _run_regex(unit, min_length).finditer(window, skip):
+        if match.start() >= limit:
+            break
+        yield match.span()
+
+
+def _scan(binary, encoding, min_length, use_numpy):
+    """(offset, raw bytes) of every run of one encoding, chunk by chunk"""
+    unit = ENCODINGS[encoding]
+    runs = _runs_numpy if use_numpy else _runs_regex
+    size = len(binary)
+    for start in range(0, size, EXTRACT_CHUNK):
+        end = min(start + EXTRACT_CHUNK, size)
+        first = max(0, start - unit)
+        # One copy per chunk: slicing bytes is far cheaper than slicing the map per string
+        window = bytes(binary.view[first:min(size, end + MAX_STRING_LENGTH * unit)])
+        for run_start, run_end in runs(window, unit, min_length, start - first, end - first):
+            yield first + run_start, window[run_start:min(run_end, run_start + MAX_STRING_LENGTH * unit)]
+        if binary.streaming:
+            binary.release(start, end)
+
+
+class _SectionLookup:
+    """Section name of a file offset (bisect over the sorted section table)"""
+
+    def __init__(self, sections):
+        self.sections = sorted((section for section in sections if section.size),
+                               key=lambda section: section.offset)
+        self.starts = [section.offset for section in self.sections]
+
+    def __call__(self, offset):
+        index = bisect_right(self.starts, offset) - 1
+        if index >= 0:
+            section = self.sections[index]
+            if offset < section.offset + section.size:
+                return section.name
+        return None
+
+
+def extract(binary, binary_type=None, min_length=MIN_STRING_LENGTH, encodings=tuple(ENCODINGS),
+            use_numpy=None):
+    """StringEntry list of a BinaryBuffer, ordered by offset"""
+    use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+    section_of = _SectionLookup(parse_sections(binary, binary_type))
+    entries = []
+    for encoding in encodings:
+        codec = 'utf-16-le' if encoding == 'utf-16le' else encoding
+        for offset, raw in _scan(binary, encoding, min_length, use_numpy):
+            entries.append(StringEntry(offset, encoding, section_of(offset), raw.decode(codec)))
+    entries.sort(key=lambda entry: entry.offset)
+    return entries
+
+
+def for_binary(binary, binary_type=None):
+    """Strings of a BinaryBuffer, extracted once and shared"""
+    return binary.memo('strings', lambda: extract(binary, binary_type))
+
+
+def display(entries, limit=DISPLAY_LIMIT):
+    counts = {encoding: 0 for encoding in ENCODINGS}
+    for entry in entries:
+        counts[entry.encoding] += 1
+    print(f"Strings: {len(entries)} ({', '.join(f'{name}: {count}' for name, count in counts.items())})")
+    for entry in entries[:limit]:
+        print(f"  0x{entry.offset:08x}  {entry.encoding:<8}  {entry.section or '-':<8}  {entry.value[:80]}")
+    if len(entries) > limit:
+        print(f"  ... {len(entries) - limit} more (--format json for all)")
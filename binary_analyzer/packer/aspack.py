@@ -3,46 +3,47 @@
 ASPack Detector
 """
 
-def detect(filepath, binary_type, entropy):
+from core import sections as section_table
+from core.entropy import peak_entropy
+from core.signatures import Signature, match
+
+# Scheduling hints for PackerDetector
+FORMATS = ("PE",)
+COST = 20
+MAX_CONFIDENCE = 100
+
+# ASPack section names (40 points each), checked against the section table
+SECTION_NAMES = ('.aspack', '.adata', '.packed')
+
+SIGNATURES = [
+    Signature(b'ASPack', 40),
+    
+    # ASPack strings
+    Signature(b'ASPack', 30),
+    Signature(b'aspack.com', 30),
+    Signature(b'ASProtect', 30),
+    
+    Signature(b'ASPR', 20),
+]
+
+def detect(binary, binary_type, entropy, profile=None, matches=None, sections=None):
     if binary_type != "PE":
         return None
     
     confidence = 0
     
     try:
-        with open(filepath, "rb") as f:
-            data = f.read()
-            
-            # ASPack section names
-            aspack_sections = [
-                b'.aspack',
-                b'.adata',
-                b'ASPack',
-                b'.packed'
-            ]
-            
-            for section in aspack_sections:
-                if section in data:
-                    confidence += 40
-            
-            # ASPack strings
-            aspack_strings = [
-                b'ASPack',
-                b'aspack.com',
-                b'ASProtect',
-                b'.aspack'
-            ]
-            
-            for string in aspack_strings:
-                if string in data:
-                    confidence += 30
-            
-            
-            if entropy and entropy >= 7.2:
-                confidence += 10
-            if b'ASPR' in data:
-                confidence += 20
+        if matches is None:
+            matches = match(binary, SIGNATURES)
+        if sections is None:
+            sections = section_table.for_binary(binary, binary_type)
         
+        confidence += matches.score()
+        confidence += 40 * len(sections.matched(SECTION_NAMES))
+        
+        if peak_entropy(entropy, profile) >= 7.2:
+            confidence += 10
+
         if confidence >= 50:
             return {
                 'name': 'ASPack',
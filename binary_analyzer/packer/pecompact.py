@@ -3,43 +3,55 @@
 PECompact Detector Module
 """
 
-def detect(filepath, binary_type, entropy):
+from core import pe_parser
+from core import sections as section_table
+from core.entropy import peak_entropy
+from core.signatures import Signature, match
+
+# Scheduling hints for PackerDetector
+FORMATS = ("PE",)
+COST = 20
+MAX_CONFIDENCE = 100
+
+# Section names (25 points each), checked against the section table
+SECTION_NAMES = ('.pec1', '.pec2')
+
+SIGNATURES = [
+    # 1. String signs (only counted once)
+    Signature(b'PECompact2', 70, group='marker'),
+    Signature(b'PEC2', 70, group='marker'),
+    Signature(b'PECompact V', 70, group='marker'),
+    Signature(b'Bitsum Technologies', 70, group='marker'), # Yapımcı firma
+
+    Signature(b'PEC2', 25),
+    Signature(b'PEC2VSD', 25),
+    
+    # JMP/PUSH/RET gibi tipik unpacker starts
+    Signature(b'\xeb\x06\xff\xff\xff\xff\x00\x00', 20, end=2048),
+]
+
+def detect(binary, binary_type, entropy, profile=None, matches=None, sections=None):
     if binary_type != "PE":
         return None
 
     confidence = 0
     
     try:
-        with open(filepath, "rb") as f:
-            data = f.read()
-            
-            # 1. String signs
-            pecompact_markers = [
-                b'PECompact2', 
-                b'PEC2', 
-                b'PECompact V',
-                b'Bitsum Technologies' # Yapımcı firma
-            ]
-            
-            for marker in pecompact_markers:
-                if marker in data:
-                    confidence += 70
-                    break
-
-            pec_sections = [b'.pec1', b'.pec2', b'PEC2', b'PEC2VSD']
-            for section in pec_sections:
-                if section in data:
-                    confidence += 25
-            
-            # JMP/PUSH/RET gibi tipik unpacker starts
-            if b'\xeb\x06\xff\xff\xff\xff\x00\x00' in data[:2048]:
-                confidence += 20
+        if matches is None:
+            matches = match(binary, SIGNATURES)
+        if sections is None:
+            sections = section_table.for_binary(binary, binary_type)
+        
+        confidence += matches.score()
+        confidence += 25 * len(sections.matched(SECTION_NAMES))
 
-            if entropy and entropy >= 7.2:
-                confidence += 10
+        if peak_entropy(entropy, profile) >= 7.2:
+            confidence += 10
 
-            if b'LoadLibraryA' in data and b'GetProcAddress' in data:
-                confidence += 5
+        # The stub resolves the original imports itself
+        pe = pe_parser.try_for_binary(binary)
+        if pe and pe.imports_function('LoadLibraryA') and pe.imports_function('GetProcAddress'):
+            confidence += 5
 
         if confidence >= 40:
             return {
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+PEiD-style entry-point signature detector
+
+Matches the bytes at AddressOfEntryPoint against userdb.txt style
+databases: the bundled peid_userdb.txt plus the files listed in
+BINARY_ANALYZER_PEID_DB (os.pathsep separated). Only a window of the
+longest signature is read at the entry point, never the whole file.
+"""
+
+import os
+
+from core import ep_signatures
+from core import pe_parser
+
+BUNDLED_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "peid_userdb.txt")
+DATABASE_VARIABLE = "BINARY_ANALYZER_PEID_DB"
+
+# Scheduling hints for PackerDetector
+FORMATS = ("PE",)
+COST = 5
+# An EP match names the exact stub, but the dedicated modules see more evidence
+MAX_CONFIDENCE = 90
+
+_database = None
+_stamp = None
+
+
+def _paths():
+    extra = os.environ.get(DATABASE_VARIABLE, "")
+    return [BUNDLED_DATABASE] + [path for path in extra.split(os.pathsep) if path]
+
+
+def _stamps(paths):
+    stamp = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+            stamp.append((path, info.st_mtime_ns, info.st_size))
+        except OSError:
+            stamp.append((path, None, None))
+    return stamp
+
+
+def version():
+    """Path / mtime / size of every database file, for the packer cache key"""
+    return repr(_stamps(_paths()))
+
+
+def database():
+    """Compiled signature database, rebuilt when one of its files changes"""
+    global _database, _stamp
+    paths = _paths()
+    stamp = _stamps(paths)
+    if _database is None or stamp != _stamp:
+        _database = ep_signatures.load(paths)
+        _stamp = stamp
+    return _database
+
+
+def entry_window(binary, length):
+    """Up to length bytes at the entry point, or None"""
+    pe = pe_parser.try_for_binary(binary)
+    if pe is None:
+        return None
+    offset = pe.rva_to_offset(pe.optional.address_of_entry_point)
+    if offset is None:
+        return None
+    return bytes(binary[offset:offset + length])
+
+
+def detect(binary, binary_type, entropy):
+    if binary_type != "PE":
+        return None
+
+    try:
+        signatures = database()
+        if not signatures:
+            return None
+
+        window = entry_window(binary, signatures.max_length)
+        if not window:
+            return None
+
+        found = signatures.match(window)
+        if found:
+            best = found[0]
+            return {
+                'name': best.name,
+                'confidence': min(40 + 3 * best.fixed, MAX_CONFIDENCE)
+            }
+
+    except Exception:
+        pass
+
+    return None
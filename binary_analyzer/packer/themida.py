@@ -3,56 +3,59 @@
 Themida / WinLicense Detector
 """
 
-def detect(filepath, binary_type, entropy):
+from core import pe_parser
+from core import sections as section_table
+from core.entropy import peak_entropy
+from core.signatures import Signature, match
+
+# Anti-debug ve VM detection (checked in the import table)
+ANTI_DEBUG_APIS = [
+    'IsDebuggerPresent',
+    'CheckRemoteDebuggerPresent',
+    'NtQueryInformationProcess'
+]
+
+# Scheduling hints for PackerDetector
+FORMATS = ("PE",)
+COST = 30
+MAX_CONFIDENCE = 100
+
+# Themida section names (30 points each), checked against the section table
+SECTION_NAMES = ('.themida', '.winlice', '.boot', '.shared')
+
+SIGNATURES = [
+    # Themida strings
+    Signature(b'Themida', 25),
+    Signature(b'WinLicense', 25),
+    Signature(b'Oreans', 25),
+    Signature(b'SecureEngine', 25),
+]
+
+def detect(binary, binary_type, entropy, profile=None, matches=None, sections=None):
     if binary_type != "PE":
         return None
     
     confidence = 0
     
     try:
-        with open(filepath, "rb") as f:
-            data = f.read()
-            
-            # Themida section names
-            themida_sections = [
-                b'.themida',
-                b'.winlice',
-                b'.boot',
-                b'.shared'
-            ]
-            
-            for section in themida_sections:
-                if section in data:
-                    confidence += 30
-            
-            # Themida strings
-            themida_strings = [
-                b'Themida',
-                b'WinLicense',
-                b'Oreans',
-                b'SecureEngine'
-            ]
-            
-            for string in themida_strings:
-                if string in data:
-                    confidence += 25
-            
-            if entropy and entropy >= 7.8:
-                confidence += 15
-            
-            # Anti-debug ve VM detection
-            anti_strings = [
-                b'IsDebuggerPresent',
-                b'CheckRemoteDebuggerPresent',
-                b'NtQueryInformationProcess'
-            ]
-            
-            anti_count = sum(1 for s in anti_strings if s in data)
-            if anti_count >= 2:
-                confidence += 10
+        if matches is None:
+            matches = match(binary, SIGNATURES)
+        if sections is None:
+            sections = section_table.for_binary(binary, binary_type)
+        
+        confidence += matches.score()
+        confidence += 30 * len(sections.matched(SECTION_NAMES))
         
+        if peak_entropy(entropy, profile) >= 7.8:
+            confidence += 15
+        
+        pe = pe_parser.try_for_binary(binary)
+        anti_count = sum(pe.imports_function(name) for name in ANTI_DEBUG_APIS) if pe else 0
+        if anti_count >= 2:
+            confidence += 10
+
         if confidence >= 50:
-            name = 'Themida' if b'Themida' in data else 'WinLicense'
+            name = 'Themida' if b'Themida' in matches else 'WinLicense'
             return {
                 'name': name,
                 'confidence': min(confidence, 100)
@@ -4,40 +4,64 @@
 UPX (Ultimate Packer for eXecutables) Detector
 """
 
-def detect(filepath, binary_type, entropy):
+from core import pe_parser
+from core import sections as section_table
+from core.entropy import peak_entropy
+from core.signatures import Signature, match
+
+PACKED_MARKER = b'This file is packed with the UPX'
+
+# Section names, checked against the section table
+PACKED_SECTIONS = ('UPX0', 'UPX1')
+SECTION_NAMES = ('UPX0', 'UPX1', 'UPX2', '.UPX0', '.UPX1')
+
+# Scheduling hints for PackerDetector
+FORMATS = None   # any format, raw dumps included
+COST = 10
+MAX_CONFIDENCE = 100
+
+SIGNATURES = [
+    # UPX signature 
+    Signature(b'UPX!', 80, group='signature'),
+    
+    # "This file is packed with the UPX" 
+    Signature(PACKED_MARKER),
+]
+
+def detect(binary, binary_type, entropy, profile=None, matches=None, sections=None):
     confidence = 0
     try:
-        with open(filepath, "rb") as f:
-            data = f.read()
-            
-            # UPX signature 
-            if b'UPX!' in data or b'UPX0' in data or b'UPX1' in data:
-                confidence += 80
-            
-            # Section names
-            if b'.UPX0' in data or b'.UPX1' in data or b'UPX2' in data:
-                confidence += 15
-            
-            # "This file is packed with the UPX" 
-            if b'This file is packed with the UPX' in data:
-                confidence = 100
-            
-            # Import table 
-            if binary_type == "PE":
-                import_count = data.count(b'.dll\x00')
-                if import_count < 5:
-                    confidence += 5
-            
-            # high entropy 
-            if entropy and entropy >= 7.0:
-                confidence += 10
-            
-            # Section size ratio
-            if binary_type == "ELF" or binary_type == "PE":
-                # basic heuristik: unusual section sizes
-                if len(data) > 100000:
-                    confidence += 5
+        if matches is None:
+            matches = match(binary, SIGNATURES)
+        if sections is None:
+            sections = section_table.for_binary(binary, binary_type)
         
+        confidence += matches.score()
+        
+        # UPX0/UPX1 sections count like the UPX! magic (one 'signature' group)
+        if sections.matched(PACKED_SECTIONS) and b'UPX!' not in matches:
+            confidence += 80
+        if sections.matched(SECTION_NAMES):
+            confidence += 15
+        
+        if PACKED_MARKER in matches:
+            confidence = 100
+        
+        # Import table: packed images import from a handful of DLLs
+        if binary_type == "PE":
+            pe = pe_parser.try_for_binary(binary)
+            if pe is not None and len(pe.import_libraries) < 5:
+                confidence += 5
+        
+        # high entropy 
+        if peak_entropy(entropy, profile) >= 7.0:
+            confidence += 10
+        
+        # Section size ratio: UPX0 / the first ELF PT_LOAD is the empty
+        # target the stub decompresses into
+        if sections.inflated():
+            confidence += 5
+
         if confidence >= 50:
             return {
                 'name': 'UPX',
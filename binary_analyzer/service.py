@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Long-running analysis service (binary_analyzer.py --serve).
+
+A small HTTP/1.1 server on a TCP or unix socket, built on asyncio streams:
+
+    POST /analyze   {"path": "/samples/a.exe", "entropy_profile": true}
+    GET  /stats     queue depth, in-flight jobs, latency percentiles
+    GET  /health
+
+Requests wait in a bounded queue drained by `concurrency` consumer tasks.
+analyze_binary runs in a fixed ProcessPoolExecutor, forked and warmed up
+(plugins preloaded) before the first request, so bursts never spawn
+processes. Filesystem probes run on a thread pool: a missing path is
+answered without taking a worker. When the queue is full new requests are
+refused with 503 and Retry-After instead of piling up. On SIGINT / SIGTERM
+the listener closes first and every queued or running request is answered
+with 503 before the workers stop.
+
+    curl -s --unix-socket /tmp/ba.sock localhost/analyze -d '{"path": "/bin/ls"}'
+"""
+
+import asyncio
+import json
+import math
+import os
+import signal
+import stat
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from binary_analyzer import analyze_worker, init_worker
+from core.entropy import profile_window
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+DEFAULT_QUEUE_SIZE = 64
+IO_THREADS = 4
+LATENCY_SAMPLES = 4096      # latest requests kept for the percentiles
+PERCENTILES = (50, 90, 99)
+MAX_BODY = 64 * 1024
+SHUTDOWN_GRACE = 5.0        # seconds handlers get to send their 503 on shutdown
+
+# analyze_binary options a request may set, with their types
+REQUEST_OPTIONS = {'entropy_profile': bool, 'window_size': int, 'stride': int, 'timings': bool,
+                   'stream': bool, 'strings': bool}
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def percentiles(samples, points=PERCENTILES):
+    """{"p50": ms, ...} of latencies in seconds (nearest rank)"""
+    ordered = sorted(samples)
+    summary = {}
+    for point in points:
+        if not ordered:
+            summary[f"p{point}"] = None
+            continue
+        rank = max(1, math.ceil(point / 100 * len(ordered)))
+        summary[f"p{point}"] = round(ordered[rank - 1] * 1000, 3)
+    summary['max'] = round(ordered[-1] * 1000, 3) if ordered else None
+    return summary
+
+
+def _probe(path):
+    """Size of a regular file (runs on the I/O threads: stat can block on slow mounts)"""
+    try:
+        info = os.stat(path)
+    except OSError:
+        raise HTTPError(404, f"File Not Found: {path}")
+    if not stat.S_ISREG(info.st_mode):
+        raise HTTPError(400, f"Not a regular file: {path}")
+    return info.st_size
+
+
+class _Job:
+    __slots__ = ('path', 'options', 'future', 'queued')
+
+    def __init__(self, path, options, future):
+        self.path = path
+        self.options = options
+        self.future = future
+        self.queued = time.perf_counter()
+
+
+class AnalysisService:
+    def __init__(self, jobs=None, concurrency=None, queue_size=DEFAULT_QUEUE_SIZE,
+                 io_threads=IO_THREADS, profile=None, **options):
+        """options: analyze_binary defaults for every request (cache, cache_size, ...)
+
+        profile: every worker writes its cProfile dump to PROFILE.<pid>.
+        """
+        self.jobs = jobs or os.cpu_count() or 1
+        self.concurrency = concurrency or self.jobs
+        self.queue_size = queue_size
+        self.io_threads = io_threads
+        self.profile = profile
+        self.options = options
+        self.latency = deque(maxlen=LATENCY_SAMPLES)      # queued -> answered
+        self.queue_wait = deque(maxlen=LATENCY_SAMPLES)   # queued -> picked up
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.started = time.time()
+        self._queue = None
+        self._processes = None
+        self._threads = None
+        self._consumers = []
+        self._running = set()      # jobs taken by a consumer
+        self._handlers = {}        # connection task -> busy with a request
+        self._closing = False
+
+    def _pool(self):
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=init_worker,
+                                   initargs=(self.profile,))
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._processes = self._pool()
+        # Fork every worker now, before any thread exists and before traffic
+        await asyncio.gather(*(loop.run_in_executor(self._processes, os.getpid)
+                               for _ in range(self.jobs)))
+        self._threads = ThreadPoolExecutor(self.io_threads, thread_name_prefix="service-io")
+        self._queue = asyncio.Queue(self.queue_size)
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+
+    async def close(self, server=None):
+        """Stop: refuse new work, answer every waiting client with 503, stop the pools"""
+        self._closing = True
+        if server is not None:
+            server.close()
+        pending = list(self._running)
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for job in pending:
+            if not job.future.done():
+                job.future.set_exception(HTTPError(503, "Service is shutting down"))
+
+        busy = [task for task, active in self._handlers.items() if active]
+        if busy:
+            await asyncio.wait(busy, timeout=SHUTDOWN_GRACE)
+        # Idle keep-alive connections
+        handlers = list(self._handlers)
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._processes.shutdown(cancel_futures=True)
+        self._threads.shutdown()
+
+    async def submit(self, path, options=None):
+        """Queue one file and wait for its report dict"""
+        if self._closing:
+            raise HTTPError(503, "Service is shutting down")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._threads, _probe, path)
+        job = _Job(path, {**self.options, **(options or {}), 'output': "json"},
+                   loop.create_future())
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPError(503, "Analysis queue is full", {"Retry-After": "1"})
+        return await job.future
+
+    async def _consume(self):
+        while True:
+            job = await self._queue.get()
+            if job.future.done():
+                # The client went away while the job was queued
+                self._queue.task_done()
+                continue
+            self.queue_wait.append(time.perf_counter() - job.queued)
+            self.in_flight += 1
+            self._running.add(job)
+            try:
+                record, error = await self._run(job)
+            except Exception as e:
+                record, error = None, str(e)
+            finally:
+                self.in_flight -= 1
+                self._running.discard(job)
+                self._queue.task_done()
+
+            if error:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self.latency.append(time.perf_counter() - job.queued)
+            if not job.future.done():
+                if error:
+                    job.future.set_exception(HTTPError(500, error))
+                else:
+                    job.future.set_result(record)
+
+    async def _run(self, job, attempts=2):
+        """(report dict, error) of one job from the process pool"""
+        loop = asyncio.get_running_loop()
+        for _ in range(attempts):
+            pool = self._processes
+            try:
+                _, _, _, record, error = await loop.run_in_executor(
+                    pool, analyze_worker, job.path, job.options)
+                return record, error
+            except BrokenProcessPool:
+                # A worker died (OOM kill, crash): replace the pool and retry once
+                if self._processes is pool:
+                    self._processes = self._pool()
+        return None, "Analysis worker died"
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'queue_capacity': self.queue_size,
+            'in_flight': self.in_flight,
+            'concurrency': self.concurrency,
+            'workers': self.jobs,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'uptime': round(time.time() - self.started, 3),
+            'latency_ms': percentiles(self.latency),
+            'queue_wait_ms': percentiles(self.queue_wait),
+        }
+
+    async def _route(self, method, target, body):
+        path = target.split("?", 1)[0]
+        if path == "/health":
+            return {'status': "ok"}
+        if path == "/stats":
+            return self.stats()
+        if path != "/analyze":
+            raise HTTPError(404, f"Unknown endpoint: {path}")
+        if method != "POST":
+            raise HTTPError(405, "Use POST /analyze")
+
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(request, dict) or not isinstance(request.get('path'), str):
+            raise HTTPError(400, 'Expected {"path": "...", ...options}')
+        options = {}
+        for name, value in request.items():
+            if name == 'path':
+                continue
+            kind = REQUEST_OPTIONS.get(name)
+            if kind is None or type(value) is not kind:
+                raise HTTPError(400, f"Unsupported option: {name}={value!r}")
+            options[name] = value
+        if 'window_size' in options or 'stride' in options:
+            try:
+                profile_window(options.get('window_size'), options.get('stride'))
+            except ValueError as e:
+                raise HTTPError(400, f"Invalid window_size / stride: {e}")
+        return await self.submit(request['path'], options)
+
+    async def handle(self, reader, writer):
+        """One connection; HTTP/1.1 keep-alive until the client closes"""
+        task = asyncio.current_task()
+        self._handlers[task] = False
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    await _write_response(writer, e.status, {'error': e.message}, e.headers, False)
+                    break
+                if request is None:
+                    break
+                self._handlers[task] = True
+                method, target, headers, body = request
+                try:
+                    status, payload, extra = 200, await self._route(method, target, body), {}
+                except HTTPError as e:
+                    status, payload, extra = e.status, {'error': e.message}, e.headers
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and not self._closing)
+                await _write_response(writer, status, payload, extra, keep_alive)
+                self._handlers[task] = False
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # CancelledError: an idle keep-alive connection closed at shutdown
+            pass
+        finally:
+            self._handlers.pop(task, None)
+            writer.close()
+
+
+async def _read_request(reader):
+    """(method, target, headers, body), or None once the client closed"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Bad Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, f"Request body over {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method.upper(), target, headers, body
+
+
+async def _write_response(writer, status, payload, headers, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}",
+             "Content-Type: application/json",
+             f"Content-Length: {len(body)}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+
+
+async def _listen(service, address):
+    if address.startswith("unix:"):
+        path = address[len("unix:"):]
+        # Left behind by a previous run that was killed
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        return await asyncio.start_unix_server(service.handle, path)
+    host, _, port = address.rpartition(":")
+    return await asyncio.start_server(service.handle, host or "127.0.0.1", int(port))
+
+
+async def serve(address=None, **settings):
+    """Run the service until SIGINT / SIGTERM
+
+    address: "HOST:PORT", ":PORT" or "unix:/path/to/socket".
+    settings: AnalysisService arguments and analyze_binary defaults.
+    """
+    address = address or DEFAULT_ADDRESS
+    service = AnalysisService(**settings)
+    await service.start()
+    server = await _listen(service, address)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    print(f"[*] Serving on {address}: {service.jobs} workers, concurrency "
+          f"{service.concurrency}, queue {service.queue_size}", flush=True)
+    async with server:
+        await stop.wait()
+        await service.close(server)
+    print(f"[*] Stopped: {service.completed} analyzed, {service.failed} failed, "
+          f"{service.rejected} rejected", flush=True)
+
+
+def run(address=None, **settings):
+    asyncio.run(serve(address, **settings))
@@ -0,0 +1,21 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import corpus
+
+SIZES = ('1K', '64K')
+
+
+@pytest.fixture(scope="session")
+def samples(tmp_path_factory):
+    """{file name: path} of the benchmark corpus at SIZES (every format and variant)"""
+    directory = tmp_path_factory.mktemp("corpus")
+    return {os.path.basename(path): path
+            for path, *_ in corpus.generate(str(directory), sizes=SIZES)}
@@ -0,0 +1,52 @@
+"""ElfFile on hostile headers: parsing stays bounded by the file size"""
+
+import struct
+
+import pytest
+
+from core import elf_parser
+
+import corpus
+
+
+def _hostile_elf64(shentsize):
+    """Corpus ELF64 with e_shnum = 0 and a 2**64 - 1 section count in section 0"""
+    image = bytearray(corpus.sample('elf64', 'plain', 4096))
+    shoff = struct.unpack_from('<Q', image, 0x28)[0]
+    struct.pack_into('<HH', image, 0x3A, shentsize, 0)
+    struct.pack_into('<Q', image, shoff + 0x20, 2 ** 64 - 1)
+    return bytes(image)
+
+
+def _hostile_elf32():
+    """64-byte ELF32: one section header at offset 16, e_shentsize 0, e_shnum 0"""
+    image = bytearray(64)
+    image[:7] = b'\x7fELF\x01\x01\x01'
+    struct.pack_into('<HHI', image, 16, 2, 3, 1)
+    struct.pack_into('<I', image, 0x20, 16)            # e_shoff
+    struct.pack_into('<HHH', image, 0x2E, 0, 0, 0)     # e_shentsize, e_shnum, e_shstrndx
+    struct.pack_into('<I', image, 16 + 0x14, 2 ** 32 - 1)
+    return bytes(image)
+
+
+@pytest.mark.parametrize("data", [_hostile_elf64(0), _hostile_elf32()],
+                         ids=["elf64-shentsize-0", "elf32-64-bytes"])
+def test_zero_entry_size(data):
+    elf = elf_parser.ElfFile(data)
+    assert elf.sections == []
+    assert elf.relro == "No"
+
+
+def test_section_count_clamped_to_file():
+    data = _hostile_elf64(64)
+    elf = elf_parser.ElfFile(data)
+    shoff = struct.unpack_from('<Q', data, 0x28)[0]
+    assert 0 < len(elf.sections) <= (len(data) - shoff) // 64
+
+
+def test_zero_program_header_size():
+    image = bytearray(corpus.sample('elf64', 'plain', 4096))
+    struct.pack_into('<HH', image, 0x36, 0, 0xffff)    # e_phentsize, e_phnum
+    elf = elf_parser.ElfFile(bytes(image))
+    assert elf.program_headers == []
+    assert elf.nx is False
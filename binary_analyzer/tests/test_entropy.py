@@ -0,0 +1,63 @@
+"""Sliding-window entropy profile"""
+
+import random
+
+import pytest
+
+from core import entropy
+from core.binary_buffer import BinaryBuffer
+from core.entropy import EntropyProfile, profile_window
+
+WINDOW = 1024
+STRIDE = 512
+
+
+@pytest.fixture(params=["numpy", "python"])
+def engine(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(entropy, 'np', None)
+    elif entropy.np is None:
+        pytest.skip("NumPy not installed")
+    return request.param
+
+
+def _profile(tmp_path, data):
+    path = tmp_path / "sample"
+    path.write_bytes(data)
+    with BinaryBuffer(str(path)) as binary:
+        return EntropyProfile(binary, None, WINDOW, STRIDE)
+
+
+def test_tail_window_covers_trailing_bytes(tmp_path, engine):
+    # 300 random bytes after the last whole strip: only the tail window sees them
+    data = bytes(4096) + random.Random(3).randbytes(300)
+    profile = _profile(tmp_path, data)
+    offsets = [offset for offset, _ in profile.windows]
+    assert offsets == list(range(0, 4096 - WINDOW + 1, STRIDE)) + [len(data) - WINDOW]
+    assert all(value == 0 for _, value in profile.windows[:-1])
+    assert profile.windows[-1][1] > 2
+
+
+def test_no_tail_window_when_strips_fit(tmp_path, engine):
+    profile = _profile(tmp_path, bytes(4096))
+    assert [offset for offset, _ in profile.windows] == list(range(0, 4096 - WINDOW + 1, STRIDE))
+
+
+def test_engines_agree(tmp_path, monkeypatch):
+    data = random.Random(5).randbytes(3000) + bytes(2000) + b'text ' * 333
+    expected = _profile(tmp_path, data).windows
+    monkeypatch.setattr(entropy, 'np', None)
+    actual = _profile(tmp_path, data).windows
+    assert [offset for offset, _ in actual] == [offset for offset, _ in expected]
+    assert [value for _, value in actual] == pytest.approx([value for _, value in expected])
+
+
+@pytest.mark.parametrize("window, stride", [(0, None), (-4, None), (1024, 0), (1024, -1), (1000, 300)])
+def test_profile_window_rejects(window, stride):
+    with pytest.raises(ValueError):
+        profile_window(window, stride)
+
+
+def test_profile_window_defaults():
+    assert profile_window() == (entropy.WINDOW_SIZE, entropy.WINDOW_SIZE // 2)
+    assert profile_window(4096, 1024) == (4096, 1024)
@@ -0,0 +1,179 @@
+"""Entry-point signatures: userdb.txt parsing, the wildcard trie and packer/peid.py"""
+
+import os
+import struct
+
+import pytest
+
+from core import ep_signatures
+from core import plugins
+from core.binary_buffer import BinaryBuffer
+from core.ep_signatures import EPSignatureDatabase
+
+import corpus
+
+UPX_STUB = bytes.fromhex("60 BE 00 10 40 00 8D BE 00 00 00 00 57 83 CD FF") + b'\x90' * 32
+ASPACK_STUB = bytes.fromhex("60 E8 03 00 00 00 E9 EB 04 5D 45 55 C3 E8 01") + b'\x90' * 32
+
+USERDB = """\
+; comment
+[Exact]
+signature = 55 8B EC 6A FF
+ep_only = true
+
+[Wild]
+signature = 55 8B ?? 6A
+ep_only = true
+
+[Nibbles]
+signature = 5? ?B EC
+ep_only = true
+
+[Anywhere]
+signature = 55 8B EC
+ep_only = false
+
+[Wildcards only]
+signature = ?? ?? ??
+
+[Malformed]
+signature = 55 8B XY
+
+[Empty]
+signature =
+"""
+
+
+@pytest.fixture
+def database():
+    database = EPSignatureDatabase()
+    database.load_text(USERDB)
+    return database
+
+
+def _names(found):
+    return [signature.name for signature in found]
+
+
+@pytest.mark.parametrize("token, parsed", [
+    ("8D", (0xFF, 0x8D)), ("8d", (0xFF, 0x8D)), ("??", (0, 0)),
+    ("4?", (0xF0, 0x40)), ("?F", (0x0F, 0x0F)),
+])
+def test_parse_token(token, parsed):
+    assert ep_signatures.parse_token(token) == parsed
+
+
+@pytest.mark.parametrize("token", ["8", "8DD", "G0", "", "0x"])
+def test_bad_token(token):
+    with pytest.raises(ValueError):
+        ep_signatures.parse_token(token)
+
+
+def test_load_skips_unusable_entries(database):
+    assert (len(database), database.skipped, database.max_length) == (3, 4, 5)
+
+
+@pytest.mark.parametrize("window, names", [
+    (b'\x55\x8B\xEC\x6A\xFF\x00', ['Exact', 'Wild', 'Nibbles']),
+    (b'\x55\x8B\x00\x6A\xFF', ['Wild']),
+    (b'\x53\x0B\xEC', ['Nibbles']),
+    (b'\x55\x8B\xEC\x6A', ['Wild', 'Nibbles']),
+    (b'\x55\x8B\xEC\x6B', ['Nibbles']),
+    (b'\x60\x8B\xEC', []),
+    (b'\x55\x8B', []),
+    (b'', []),
+])
+def test_wildcard_match(database, window, names):
+    # Most fixed bytes first
+    assert _names(database.match(window)) == names
+
+
+def test_match_is_anchored_at_the_entry_point(database):
+    assert database.match(b'\x90\x55\x8B\xEC\x6A\xFF') == []
+
+
+def test_fixed_and_length(database):
+    exact, wild, nibbles = database.match(b'\x55\x8B\xEC\x6A\xFF')
+    assert (exact.fixed, exact.length) == (5, 5)
+    assert (wild.fixed, wild.length) == (3, 4)
+    assert (nibbles.fixed, nibbles.length) == (1, 3)
+
+
+def test_shared_prefixes():
+    database = EPSignatureDatabase()
+    database.load_text("[A]\nsignature = 60 E8 00\n[B]\nsignature = 60 E8 01\n"
+                       "[C]\nsignature = 60 E8\n[D]\nsignature = 60 E8 00\n")
+    assert sorted(_names(database.match(b'\x60\xE8\x00'))) == ['A', 'C', 'D']
+    assert _names(database.match(b'\x60\xE8\x01')) == ['B', 'C']
+
+
+@pytest.fixture
+def peid(monkeypatch):
+    monkeypatch.delenv("BINARY_ANALYZER_PEID_DB", raising=False)
+    return {plugin.__name__: plugin for plugin in plugins.registry().load()[0]}['peid']
+
+
+def _detect(peid, tmp_path, stub, entry_offset=0, entry_rva=None):
+    data = bytearray(corpus.build_pe([(b'.text', stub, corpus.IMAGE_SCN_CODE)],
+                                     entry_offset=entry_offset))
+    if entry_rva is not None:
+        e_lfanew = struct.unpack_from('<I', data, 0x3C)[0]
+        struct.pack_into('<I', data, e_lfanew + 24 + 16, entry_rva)
+    path = tmp_path / "sample.exe"
+    path.write_bytes(data)
+    with BinaryBuffer(str(path)) as binary:
+        return peid.detect(binary, "PE", 6.0)
+
+
+@pytest.mark.parametrize("stub, name, confidence", [
+    # 8 fixed bytes: 40 + 3 * 8
+    (UPX_STUB, "UPX 0.89.6 - 1.02 / 1.05 - 3.xx -> Markus & Laszlo", 64),
+    # 15 fixed bytes: 40 + 3 * 15
+    (ASPACK_STUB, "ASPack 2.12 -> Alexey Solodovnikov", 85),
+])
+def test_bundled_database(peid, tmp_path, stub, name, confidence):
+    assert _detect(peid, tmp_path, stub) == {'name': name, 'confidence': confidence}
+
+
+def test_confidence_is_capped(peid, tmp_path, monkeypatch):
+    stub = b'\x12' * 24
+    userdb = tmp_path / "userdb.txt"
+    userdb.write_text(f"[Long]\nsignature = {stub.hex(' ')}\n")
+    monkeypatch.setenv(peid.DATABASE_VARIABLE, str(userdb))
+    assert _detect(peid, tmp_path, stub) == {'name': "Long", 'confidence': peid.MAX_CONFIDENCE}
+
+
+def test_stub_away_from_the_entry_point(peid, tmp_path):
+    assert _detect(peid, tmp_path, UPX_STUB, entry_offset=1) is None
+
+
+@pytest.mark.parametrize("entry_rva", [0x7fff0000, 0x1000 + 0x200])
+def test_entry_point_outside_every_section(peid, tmp_path, entry_rva):
+    # Past the end of the image, and in the alignment gap after .text
+    assert _detect(peid, tmp_path, UPX_STUB, entry_rva=entry_rva) is None
+
+
+def test_userdb_override(peid, tmp_path, monkeypatch):
+    userdb = tmp_path / "userdb.txt"
+    userdb.write_text("[UPX 3.96 (custom)]\n"
+                      "signature = 60 BE ?? ?? ?? ?? 8D BE ?? ?? ?? ?? 57 83 CD FF 90 90\n"
+                      "ep_only = true\n")
+    version = peid.version()
+    monkeypatch.setenv(peid.DATABASE_VARIABLE,
+                       os.pathsep.join([str(tmp_path / "missing.txt"), str(userdb)]))
+    assert peid.version() != version
+
+    # The longer user signature is more specific than the bundled one
+    assert _detect(peid, tmp_path, UPX_STUB) == {'name': "UPX 3.96 (custom)", 'confidence': 70}
+
+    # Edited in place: the database is rebuilt
+    version = peid.version()
+    userdb.write_text("[UPX 3.96 (custom)]\nsignature = 60 BE ?? ?? 99\n")
+    assert peid.version() != version
+    assert _detect(peid, tmp_path, UPX_STUB)['name'].startswith("UPX 0.89.6")
+
+
+def test_not_a_pe(peid, samples):
+    with BinaryBuffer(samples['elf64-upx-1K.elf']) as binary:
+        assert peid.detect(binary, "ELF", 6.0) is None
+        assert peid.detect(binary, "PE", 6.0) is None
@@ -0,0 +1,37 @@
+"""Digests of files that only look like PEs"""
+
+import struct
+
+import pytest
+
+from binary_analyzer import analyze_binary
+from core import hashing
+from core.binary_buffer import BinaryBuffer
+
+
+def _truncated_stub():
+    data = bytearray(164)
+    data[:2] = b'MZ'
+    struct.pack_into('<I', data, 0x3C, 1000)   # e_lfanew past EOF
+    return bytes(data)
+
+
+MZ_FILES = {
+    'stub.exe': _truncated_stub(),
+    'notes.txt': b'MZ hello, this is a text file\n' * 4,
+    'header-only.exe': b'MZ' + b'\x00' * 58 + struct.pack('<I', 0x40) + b'PE\x00\x00',
+}
+
+
+@pytest.mark.parametrize("name", MZ_FILES)
+def test_mz_prefixed_non_pe(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(MZ_FILES[name])
+    with BinaryBuffer(str(path)) as binary:
+        digests = hashing.compute(binary)
+    assert digests.imphash is None
+    assert len(digests.sha256) == 64
+
+    report = analyze_binary(str(path), output="json")
+    assert report.error is None
+    assert report.info.sha256 == digests.sha256
@@ -0,0 +1,112 @@
+"""PackerDetector scheduling: format filtering and the MAX_CONFIDENCE early exit"""
+
+import functools
+import types
+
+import pytest
+
+from core.binary_buffer import BinaryBuffer
+from core.packer_detector import PackerDetector
+from core.signatures import SignatureEngine
+
+
+def _plugin(name, confidence=None, formats=None, max_confidence=None, calls=None):
+    """Packer module returning `confidence` (no result when None)"""
+    module = types.ModuleType(name)
+
+    def detect(binary, binary_type, entropy):
+        calls.append(name)
+        if confidence is None:
+            return None
+        return {'name': name, 'confidence': confidence}
+
+    module.detect = detect
+    if formats is not None:
+        module.FORMATS = formats
+    if max_confidence is not None:
+        module.MAX_CONFIDENCE = max_confidence
+    return module
+
+
+@pytest.fixture
+def detect(samples, monkeypatch):
+    """detect(plugin specs, sample) -> (detector, names of the plugins called)"""
+    def run(specs, sample='pe32-plain-1K.exe', binary_type="PE"):
+        calls = []
+        modules = [_plugin(name, calls=calls, **spec) for name, spec in specs]
+        monkeypatch.setattr(PackerDetector, "preload", classmethod(
+            lambda cls: (modules, SignatureEngine())))
+        with BinaryBuffer(samples[sample]) as binary:
+            return PackerDetector(binary, binary_type, 5.0), calls
+    return run
+
+
+def test_certain_hit_stops_the_scan(detect):
+    detector, calls = detect([('upx', {'confidence': 100}),
+                              ('peid', {'confidence': 90, 'max_confidence': 90}),
+                              ('themida', {'confidence': 95})])
+    assert calls == ['upx']
+    assert (detector.detected_packer, detector.confidence) == ('upx', 100)
+
+
+def test_hit_at_the_remaining_ceiling_stops_the_scan(detect):
+    # Nothing after aspack can return more than 90
+    detector, calls = detect([('aspack', {'confidence': 90}),
+                              ('peid', {'confidence': 90, 'max_confidence': 90}),
+                              ('fsg', {'confidence': 80, 'max_confidence': 80})])
+    assert calls == ['aspack']
+    assert detector.detected_packer == 'aspack'
+
+
+def test_weaker_hit_keeps_scanning(detect):
+    detector, calls = detect([('peid', {'confidence': 70, 'max_confidence': 90}),
+                              ('aspack', {}),
+                              ('themida', {'confidence': 95}),
+                              ('pecompact', {'confidence': 99})])
+    assert calls == ['peid', 'aspack', 'themida', 'pecompact']
+    assert (detector.detected_packer, detector.confidence) == ('pecompact', 99)
+
+
+def test_low_confidence_is_not_a_verdict(detect):
+    detector, calls = detect([('weak', {'confidence': 49})])
+    assert calls == ['weak']
+    assert detector.detected_packer is None and detector.result().status == "Unpackaged"
+
+
+@pytest.mark.parametrize("sample, binary_type, called", [
+    ('pe32-plain-1K.exe', "PE", ['pe_only', 'any']),
+    ('elf64-plain-1K.elf', "ELF", ['elf_only', 'any']),
+])
+def test_plugins_for_other_formats_are_never_called(detect, sample, binary_type, called):
+    _, calls = detect([('pe_only', {'formats': ("PE",)}),
+                       ('elf_only', {'formats': ("ELF",)}),
+                       ('any', {})], sample, binary_type)
+    assert calls == called
+
+
+def test_other_format_plugins_do_not_lower_the_ceiling(detect):
+    # The ELF module could return 100, but it is not a candidate for a PE
+    detector, calls = detect([('peid', {'confidence': 90, 'max_confidence': 90}),
+                              ('elf_only', {'confidence': 100, 'formats': ("ELF",)})])
+    assert calls == ['peid']
+    assert detector.confidence == 90
+
+
+@pytest.mark.parametrize("sample, binary_type, called", [
+    ('elf64-upx-1K.elf', "ELF", ['upx']),
+    ('pe32-upx-1K.exe', "PE", ['peid', 'upx']),
+])
+def test_bundled_plugins(samples, monkeypatch, sample, binary_type, called):
+    calls = []
+    for module in PackerDetector.preload()[0]:
+        # wraps(): detect() keeps its signature, so it gets the same extra arguments
+        @functools.wraps(module.detect)
+        def detect(*args, _module=module, _detect=module.detect, **kwargs):
+            calls.append(_module.__name__)
+            return _detect(*args, **kwargs)
+        monkeypatch.setattr(module, "detect", detect)
+
+    with BinaryBuffer(samples[sample]) as binary:
+        detector = PackerDetector(binary, binary_type, 7.9)
+    assert calls == called
+    assert detector.confidence == 100 and detector.detected_packer.startswith("UPX")
@@ -0,0 +1,169 @@
+"""NumPy and pure-Python paths must give identical results on the corpus"""
+
+import importlib
+
+import pytest
+
+from core import byte_stats
+from core import hashing
+from core import signatures
+from core import similarity
+from core import strings
+from core.binary_buffer import BinaryBuffer
+from core.signatures import Signature
+
+import corpus
+
+pytestmark = pytest.mark.skipif(byte_stats.np is None, reason="NumPy not installed")
+
+PACKERS = ('upx', 'aspack', 'pecompact', 'themida')
+# Odd sizes put chunk borders inside strings, runs and patterns
+CHUNK_SIZES = (61, 4093)
+
+
+def _byte_stats(chunks, use_numpy, min_string=byte_stats.MIN_STRING_LENGTH):
+    stats = byte_stats.compute(chunks, min_string=min_string, use_numpy=use_numpy)
+    return stats.length, stats.histogram, stats.string_count
+
+
+@pytest.mark.parametrize("min_string", [4, 8])
+def test_byte_stats(samples, min_string):
+    for path in samples.values():
+        with BinaryBuffer(path) as binary:
+            expected = _byte_stats([binary.view], False, min_string)
+            assert _byte_stats([binary.view], True, min_string) == expected, path
+            for size in CHUNK_SIZES:
+                for use_numpy in (True, False):
+                    assert _byte_stats(binary.chunks(size), use_numpy, min_string) == expected, \
+                        (path, size, use_numpy)
+
+
+def _digests(path, use_numpy, chunk_size=hashing.HASH_CHUNK):
+    with BinaryBuffer(path) as binary:
+        digests = hashing.compute(binary, chunk_size=chunk_size, use_numpy=use_numpy)
+    return {name: getattr(digests, name) for name in digests.__slots__}
+
+
+def test_hashing(samples):
+    for path in samples.values():
+        expected = _digests(path, False)
+        assert expected['ctph'].startswith(hashing.CTPH_PREFIX + ':'), path
+        assert _digests(path, True) == expected, path
+        for size in CHUNK_SIZES:
+            assert _digests(path, True, size) == expected, (path, size)
+            assert _digests(path, False, size) == expected, (path, size)
+
+
+def _binary_type(path):
+    return "PE" if path.endswith('.exe') else "ELF"
+
+
+def _strings(path, use_numpy):
+    with BinaryBuffer(path) as binary:
+        return strings.extract(binary, _binary_type(path), use_numpy=use_numpy)
+
+
+@pytest.fixture(scope="module")
+def wide_sample(tmp_path_factory):
+    """Corpus PE with UTF-16LE strings at even and odd offsets in .rsrc"""
+    text = corpus._Filler(corpus.DEFAULT_SEED, 'wide').text(2048)
+    wide = b''.join(b'\xff' * (index % 2) + word.encode('utf-16-le') + b'\x00\x00'
+                    for index, word in enumerate(['Software', 'Microsoft', 'Config', 'Version']))
+    data = corpus.build_pe([(b'.text', text, corpus.IMAGE_SCN_CODE),
+                            (b'.rsrc', wide, corpus.IMAGE_SCN_RDATA)],
+                           imports=corpus.PLAIN_IMPORTS)
+    path = tmp_path_factory.mktemp("wide") / "wide.exe"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_strings(samples, wide_sample, monkeypatch):
+    paths = list(samples.values()) + [wide_sample]
+    expected = {path: _strings(path, False) for path in paths}
+    for path in paths:
+        assert _strings(path, True) == expected[path], path
+
+    # Strings across chunk borders still come out once, from the chunk they start in
+    monkeypatch.setattr(strings, 'EXTRACT_CHUNK', CHUNK_SIZES[1])
+    for path in paths:
+        for use_numpy in (True, False):
+            assert _strings(path, use_numpy) == expected[path], (path, use_numpy)
+
+    wide = [(entry.section, entry.value) for entry in expected[wide_sample]
+            if entry.encoding == 'utf-16le']
+    assert wide == [('.rsrc', word) for word in ['Software', 'Microsoft', 'Config', 'Version']]
+
+
+def _minhash(path, use_numpy):
+    with BinaryBuffer(path) as binary:
+        return similarity.minhash(binary, use_numpy=use_numpy)
+
+
+def test_minhash(samples, monkeypatch):
+    expected = {path: _minhash(path, False) for path in samples.values()}
+    for path, values in expected.items():
+        assert len(values) == similarity.PERMUTATIONS, path
+        assert _minhash(path, True) == values, path
+
+    # 4-grams across scan chunk borders are counted through the overlap
+    monkeypatch.setattr(similarity, 'SCAN_CHUNK', CHUNK_SIZES[1])
+    for path, values in expected.items():
+        for use_numpy in (True, False):
+            assert _minhash(path, use_numpy) == values, (path, use_numpy)
+
+
+def test_minhash_too_short(tmp_path):
+    path = tmp_path / "short"
+    path.write_bytes(b'MZ\x90')
+    for use_numpy in (True, False):
+        assert _minhash(str(path), use_numpy) is None
+
+
+def _engine():
+    engine = signatures.SignatureEngine()
+    for name in PACKERS:
+        engine.register(name, importlib.import_module(f"packer.{name}").SIGNATURES)
+    # Short, overlapping and bounded patterns exercise the trie next to the prefix filter
+    engine.register('extra', [Signature(b'MZ', 1, end=2),
+                              Signature(b'\x00\x00', 1),
+                              Signature(b'PE\x00\x00', 1, end=0x200),
+                              Signature(b'UPX', 1),
+                              Signature(b'UPX!', 1, start=0x400),
+                              Signature(b'\x90\x90\x90\x90', 1)])
+    return engine
+
+
+def _signature_counts(path, chunk_size=None):
+    scan = _engine().scanner()
+    with BinaryBuffer(path) as binary:
+        size = len(binary)
+        step = chunk_size or size
+        for start in range(0, size, step):
+            scan.feed(binary.view, start, min(start + step, size))
+    matches = scan.matches()
+    return ({key: count for key, count in scan._counts.items() if count},
+            {owner: found.score() for owner, found in matches.items()})
+
+
+def test_signatures(samples, monkeypatch):
+    expected = {}
+    with monkeypatch.context() as patch:
+        patch.setattr(signatures, 'np', None)
+        for path in samples.values():
+            expected[path] = _signature_counts(path)
+            assert _signature_counts(path, CHUNK_SIZES[1]) == expected[path], path
+
+    for path in samples.values():
+        assert _signature_counts(path) == expected[path], path
+        assert _signature_counts(path, CHUNK_SIZES[1]) == expected[path], path
+
+
+def test_signatures_find_the_corpus_packers(samples):
+    for name, path in samples.items():
+        variant = name.split('-')[1]
+        counts, scores = _signature_counts(path)
+        for packer in PACKERS:
+            if packer == variant:
+                assert scores[packer] > 0, name
+        if variant == 'plain':
+            assert not any(scores[packer] for packer in PACKERS), name
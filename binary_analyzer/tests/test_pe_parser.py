@@ -0,0 +1,179 @@
+"""PEFile import / export tables, on corpus images and hostile variants of them"""
+
+import struct
+
+import pytest
+
+from core import pe_parser
+from core import plugins
+from core.binary_buffer import BinaryBuffer
+from core.pe_parser import PEFile
+
+import corpus
+
+EXPORTS = ['Alpha', 'Beta', 'Gamma']
+
+
+def _directory_offset(data, index):
+    e_lfanew = struct.unpack_from('<I', data, 0x3C)[0]
+    magic = struct.unpack_from('<H', data, e_lfanew + 24)[0]
+    return e_lfanew + 24 + (112 if magic == 0x20b else 96) + index * 8
+
+
+def _descriptors(data):
+    """File offset of the import descriptors"""
+    pe = PEFile(bytes(data))
+    return pe.rva_to_offset(pe.directory(pe_parser.DIRECTORY_IMPORT).rva)
+
+
+def _offset(data, rva):
+    return PEFile(bytes(data)).rva_to_offset(rva)
+
+
+def _edata(rva, names=EXPORTS, base=10):
+    """Export directory at rva: functions at ordinals base.., every other one named"""
+    directory = struct.Struct('<IIHHIIIIIII')
+    named = names[::2]
+    functions_rva = rva + directory.size
+    names_rva = functions_rva + 4 * len(names)
+    ordinals_rva = names_rva + 4 * len(named)
+    strings_rva = ordinals_rva + 2 * len(named)
+    strings = bytearray(b'test.dll\x00')
+    name_rvas = []
+    for name in named:
+        name_rvas.append(strings_rva + len(strings))
+        strings += name.encode() + b'\x00'
+    return (directory.pack(0, 0, 0, 0, strings_rva, base, len(names), len(named),
+                           functions_rva, names_rva, ordinals_rva)
+            + struct.pack(f'<{len(names)}I', *[0x1000 + i for i in range(len(names))])
+            + struct.pack(f'<{len(named)}I', *name_rvas)
+            + struct.pack(f'<{len(named)}H', *range(0, len(names), 2))
+            + bytes(strings))
+
+
+def _dll(pe32_plus=False, edata=None):
+    """Corpus-style DLL whose first section (RVA 0x1000) is the export directory"""
+    edata = edata if edata is not None else _edata(0x1000)
+    data = bytearray(corpus.build_pe([(b'.edata', edata, corpus.IMAGE_SCN_RDATA),
+                                      (b'.text', b'\xc3' * 16, corpus.IMAGE_SCN_CODE)],
+                                     pe32_plus, entry_section=1, imports=corpus.STUB_IMPORTS))
+    struct.pack_into('<II', data, _directory_offset(data, pe_parser.DIRECTORY_EXPORT),
+                     0x1000, len(edata))
+    return bytes(data)
+
+
+@pytest.mark.parametrize("fmt", ['pe32', 'pe32plus'])
+@pytest.mark.parametrize("variant, imports", [
+    ('plain', corpus.PLAIN_IMPORTS),
+    ('upx', corpus.STUB_IMPORTS),
+    ('themida', corpus.THEMIDA_IMPORTS),
+])
+def test_corpus_imports(samples, fmt, variant, imports):
+    with BinaryBuffer(samples[f"{fmt}-{variant}-64K.exe"]) as binary:
+        pe = pe_parser.for_binary(binary)
+        assert pe.imports == [(dll, functions) for dll, functions in imports.items()]
+        assert pe.import_libraries == set(imports)
+        assert pe.import_set == {(dll, function) for dll, functions in imports.items()
+                                 for function in functions}
+        assert pe.imports_function('GetProcAddress') is (variant != 'plain')
+        assert pe.imports_function('CreateFileW', 'KERNEL32.DLL') is (variant == 'plain')
+        assert not pe.imports_function('CreateFileW', 'user32.dll')
+        assert pe.exports == (None, [])
+
+
+def test_ordinal_and_lookupless_imports():
+    data = bytearray(corpus.sample('pe32', 'upx', 4096))
+    descriptors = _descriptors(data)
+    first_thunk = struct.unpack_from('<I', data, descriptors + 16)[0]
+    # No lookup table (the IAT is walked instead), second slot imported by ordinal 7
+    struct.pack_into('<I', data, descriptors, 0)
+    struct.pack_into('<I', data, _offset(data, first_thunk) + 4, 0x80000007)
+
+    pe = PEFile(bytes(data))
+    assert pe.imports[0][1][:3] == ['LoadLibraryA', 7, 'VirtualProtect']
+    assert pe.imports_function(7, 'kernel32.dll')
+
+
+@pytest.mark.parametrize("pe32_plus", [False, True])
+def test_exports(pe32_plus):
+    pe = PEFile(_dll(pe32_plus))
+    assert pe.exports == ('test.dll', [('Alpha', 10), (None, 11), ('Gamma', 12)])
+    assert pe.imports == list(corpus.STUB_IMPORTS.items())
+
+
+UNNAMED = [(None, 10), (None, 11), (None, 12)]
+
+
+@pytest.mark.parametrize("field, value, expected", [
+    (0x0C, 0xffffffff, (None, [('Alpha', 10), (None, 11), ('Gamma', 12)])),   # Name
+    (0x1C, 0x7ffff000, ('test.dll', [])),                                     # AddressOfFunctions
+    (0x20, 0xfffffff0, ('test.dll', UNNAMED)),                                # AddressOfNames
+    (0x24, 0x1ffe, ('test.dll', UNNAMED)),        # AddressOfNameOrdinals: past the raw data
+])
+def test_hostile_export_rvas(field, value, expected):
+    edata = bytearray(_edata(0x1000))
+    struct.pack_into('<I', edata, field, value)
+    assert PEFile(_dll(edata=bytes(edata))).exports == expected
+
+
+def test_hostile_export_counts():
+    # Clamped to MAX_EXPORTS, which still runs past the end of the file
+    edata = bytearray(_edata(0x1000))
+    struct.pack_into('<II', edata, 0x14, 0xffffffff, 0xffffffff)   # NumberOfFunctions / Names
+    assert PEFile(_dll(edata=bytes(edata))).exports == (None, [])
+
+
+PLAIN_WITHOUT_KERNEL32 = {dll: functions for dll, functions in corpus.PLAIN_IMPORTS.items()
+                          if dll != 'kernel32.dll'}
+
+
+@pytest.mark.parametrize("patch, expected", [
+    # IMPORT directory RVA outside every section
+    ("directory", {}),
+    # DLL name RVA unmapped: that descriptor is skipped
+    ("name", PLAIN_WITHOUT_KERNEL32),
+    # Lookup table and IAT unmapped: the DLL is kept without functions
+    ("lookup", {**corpus.PLAIN_IMPORTS, 'kernel32.dll': []}),
+    # First IMAGE_IMPORT_BY_NAME RVA unmapped: the rest of that table is dropped
+    ("thunk", {**corpus.PLAIN_IMPORTS, 'kernel32.dll': []}),
+])
+def test_hostile_import_rvas(patch, expected):
+    data = bytearray(corpus.sample('pe32', 'plain', 4096))
+    descriptors = _descriptors(data)
+    if patch == "directory":
+        struct.pack_into('<I', data, _directory_offset(data, pe_parser.DIRECTORY_IMPORT),
+                         0xfffff000)
+    elif patch == "name":
+        struct.pack_into('<I', data, descriptors + 12, 0x7fffffff)
+    elif patch == "lookup":
+        struct.pack_into('<I', data, descriptors, 0x7fffffff)
+        struct.pack_into('<I', data, descriptors + 16, 0x7fffffff)
+    else:
+        lookup = struct.unpack_from('<I', data, descriptors)[0]
+        struct.pack_into('<I', data, _offset(data, lookup), 0x7ffffff0)
+    assert dict(PEFile(bytes(data)).imports) == expected
+
+
+def test_truncated_import_table():
+    data = corpus.sample('pe32', 'plain', 4096)
+    pe = PEFile(data[:_descriptors(data) + 30])
+    assert pe.imports == []
+    assert pe.import_libraries == set()
+
+
+@pytest.mark.parametrize("module, names", [
+    ('themida', ['IsDebuggerPresent', 'CheckRemoteDebuggerPresent', 'NtQueryInformationProcess']),
+    ('pecompact', ['LoadLibraryA', 'GetProcAddress']),
+])
+def test_api_names_in_data_are_not_imports(tmp_path, module, names):
+    detector = {plugin.__name__: plugin for plugin in plugins.registry().load()[0]}[module]
+    planted = b'\x00'.join(name.encode() for name in names)
+    data = corpus.build_pe([(b'.text', b'\x90' * 64, corpus.IMAGE_SCN_CODE),
+                            (b'.data', planted, corpus.IMAGE_SCN_DATA)],
+                           imports=corpus.PLAIN_IMPORTS)
+    path = tmp_path / "planted.exe"
+    path.write_bytes(data)
+    with BinaryBuffer(str(path)) as binary:
+        pe = pe_parser.for_binary(binary)
+        assert not any(pe.imports_function(name) for name in names)
+        assert detector.detect(binary, "PE", 4.0) is None
@@ -0,0 +1,145 @@
+"""PluginRegistry: reloading changed files, entry points and version() hooks"""
+
+import os
+import textwrap
+
+import pytest
+
+from core import plugins
+from core.plugins import PluginRegistry
+
+PLUGIN = """
+COST = {cost}
+
+def detect(binary, binary_type, entropy):
+    return {{'name': {name!r}, 'confidence': 100}}
+"""
+
+
+def _write(directory, name, source):
+    path = directory / name
+    path.write_text(textwrap.dedent(source))
+    return path
+
+
+def _names(registry):
+    return [module.__name__ for module in registry.load()[0]]
+
+
+@pytest.fixture
+def directory(tmp_path):
+    directory = tmp_path / "packer"
+    directory.mkdir()
+    _write(directory, "upx.py", PLUGIN.format(cost=10, name="UPX"))
+    _write(directory, "aspack.py", PLUGIN.format(cost=20, name="ASPack"))
+    return directory
+
+
+@pytest.fixture
+def registry(directory):
+    # No distribution on the test path declares this group
+    return PluginRegistry(directory, group="binary_analyzer.tests.none")
+
+
+def test_load_sorts_by_cost(registry, directory):
+    _write(directory, "themida.py", PLUGIN.format(cost=5, name="Themida"))
+    _write(directory, "notes.py", "SIGNATURES = []\n")       # no detect()
+    _write(directory, "broken.py", "def detect(:\n")
+    _write(directory, "__init__.py", "")
+    assert _names(registry) == ["themida", "upx", "aspack"]
+
+
+def test_unchanged_files_are_not_imported_again(registry):
+    modules, _ = registry.load()
+    version = registry.version()
+    assert registry.refresh() is False
+    assert registry.load()[0] == modules
+    assert registry.version() == version
+
+
+def test_edited_plugin_is_reloaded(registry, directory):
+    upx = registry.load()[0][0]
+    version = registry.version()
+
+    path = _write(directory, "upx.py", PLUGIN.format(cost=10, name="UPX 4"))
+    assert registry.refresh() is True
+    reloaded = registry.load()[0][0]
+    assert reloaded is not upx
+    assert reloaded.detect(None, "PE", 0)['name'] == "UPX 4"
+    assert registry.version() != version
+
+    # Touched only: imported again, but the version follows the source
+    version = registry.version()
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert registry.refresh() is True
+    assert registry.load()[0][0] is not reloaded
+    assert registry.version() == version
+
+
+def test_added_and_removed_plugins(registry, directory):
+    version = registry.version()
+    _write(directory, "fsg.py", PLUGIN.format(cost=15, name="FSG"))
+    assert _names(registry) == ["upx", "fsg", "aspack"]
+    assert registry.version() != version
+
+    (directory / "fsg.py").unlink()
+    (directory / "aspack.py").unlink()
+    assert _names(registry) == ["upx"]
+
+
+def test_declarative_signatures_are_registered(registry, directory):
+    _write(directory, "mpress.py", PLUGIN.format(cost=20, name="MPRESS")
+           + "SIGNATURES = [(b'MPRESS1', 60)]\n")
+    _, engine = registry.load()
+    assert [sig.pattern for sig in engine._owners["mpress"]] == [b"MPRESS1"]
+
+
+def test_version_hook(registry, directory, tmp_path):
+    database = tmp_path / "userdb.txt"
+    database.write_text("[one]\n")
+    _write(directory, "peid.py", PLUGIN.format(cost=5, name="PEiD") + textwrap.dedent(f"""
+        def version():
+            with open({str(database)!r}) as f:
+                return f.read()
+    """))
+    version = registry.version()
+    assert registry.version() == version
+
+    # The plugin source is unchanged: only the hook sees the new data
+    database.write_text("[one]\n[two]\n")
+    assert registry.refresh() is False
+    assert registry.version() != version
+
+    database.unlink()
+    assert len(registry.version()) == 16   # a failing hook still yields a version
+
+
+def test_entry_points(registry, directory, tmp_path, monkeypatch):
+    site = tmp_path / "site"
+    site.mkdir()
+    _write(site, "mypackers_mpress.py", PLUGIN.format(cost=1, name="MPRESS"))
+    _write(site, "mypackers_helpers.py", "VALUE = 1\n")   # no detect()
+    info = site / "mypackers-1.0.dist-info"
+    info.mkdir()
+    _write(info, "METADATA", "Metadata-Version: 2.1\nName: mypackers\nVersion: 1.0\n")
+    _write(info, "entry_points.txt", f"""\
+        [{plugins.ENTRY_POINT_GROUP}]
+        mpress = mypackers_mpress
+        helpers = mypackers_helpers
+        missing = mypackers_missing
+    """)
+    monkeypatch.syspath_prepend(str(site))
+
+    found = plugins._import_entry_points(plugins.ENTRY_POINT_GROUP)
+    assert [(name, version) for name, version, _ in found] == [("mpress", "mypackers==1.0")]
+
+    installed = PluginRegistry(directory)
+    assert _names(installed) == ["mypackers_mpress", "upx", "aspack"]
+    assert installed.version() != registry.version()
+
+
+def test_no_entry_points_declared(tmp_path, monkeypatch):
+    monkeypatch.setattr("sys.path", [str(tmp_path)])
+    assert plugins._declares_entry_points(plugins.ENTRY_POINT_GROUP) is False
+    assert plugins._import_entry_points(plugins.ENTRY_POINT_GROUP) == []
@@ -0,0 +1,133 @@
+"""Result cache: stage rows keyed on (sha256, stage), versions and LRU eviction"""
+
+import shutil
+import sqlite3
+import types
+
+import pytest
+
+from binary_analyzer import analyze_binary
+from core import binary_info, entropy, packer_detector, plugins, result_cache, security_checks
+from core.result_cache import ResultCache
+
+STAGES = {'info': (binary_info, 'BinaryInfo'),
+          'security': (security_checks, 'SecurityChecker'),
+          'entropy': (entropy, 'EntropyAnalyzer'),
+          'packer': (packer_detector, 'PackerDetector')}
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Names of the stages that ran instead of being restored from the cache"""
+    runs = []
+    for name, (module, attribute) in STAGES.items():
+        base = getattr(module, attribute)
+
+        def __init__(self, *args, _base=base, _name=name, **kwargs):
+            runs.append(_name)
+            _base.__init__(self, *args, **kwargs)
+
+        monkeypatch.setattr(module, attribute, type(attribute, (base,), {'__init__': __init__}))
+    return runs
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A private copy of packer/, so plugins and peid_userdb.txt can be edited"""
+    directory = tmp_path / "packer"
+    shutil.copytree(plugins.PACKER_DIR, directory, ignore=shutil.ignore_patterns("__pycache__"))
+    monkeypatch.setattr(plugins, "_registry", plugins.PluginRegistry(directory))
+    return directory
+
+
+@pytest.fixture
+def cache(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    yield path
+    ResultCache.open(path).close()
+
+
+def _analyze(path, cache):
+    report = analyze_binary(path, output="json", cache=cache).to_dict()
+    assert report['error'] is None
+    del report['path']
+    return report
+
+
+def _rows(cache):
+    with sqlite3.connect(cache) as db:
+        return dict(((sha256, stage), version) for sha256, stage, version
+                    in db.execute("SELECT sha256, stage, version FROM results"))
+
+
+def test_rerun_is_served_from_the_cache(samples, registry, cache, runs):
+    sample = samples['pe32-upx-64K.exe']
+    first = _analyze(sample, cache)
+    assert runs == list(STAGES)
+
+    runs.clear()
+    assert _analyze(sample, cache) == first
+    assert runs == []
+    assert first['packer']['packer'].startswith("UPX")
+
+
+def test_rows_are_keyed_on_content_and_stage(samples, registry, cache, tmp_path, runs):
+    sample = samples['elf64-plain-1K.elf']
+    report = _analyze(sample, cache)
+    sha256 = report['info']['sha256']
+    assert _rows(cache).keys() == {(sha256, stage) for stage in STAGES}
+
+    # Another name for the same bytes hits the same rows
+    runs.clear()
+    copy = shutil.copy(sample, tmp_path / "renamed")
+    renamed = _analyze(str(copy), cache)
+    assert renamed['info'].pop('path') == str(copy)
+    report['info'].pop('path')
+    assert renamed == report
+    assert runs == [] and len(_rows(cache)) == len(STAGES)
+
+    _analyze(samples['pe32-plain-1K.exe'], cache)
+    assert len(_rows(cache)) == 2 * len(STAGES)
+
+
+def test_analysis_version_invalidates_core_stages(samples, registry, cache, runs, monkeypatch):
+    sample = samples['pe32-upx-1K.exe']
+    report = _analyze(sample, cache)
+    runs.clear()
+    monkeypatch.setattr(result_cache, "ANALYSIS_VERSION", "test")
+    assert _analyze(sample, cache) == report
+    assert runs == ['info', 'security', 'entropy']
+
+
+@pytest.mark.parametrize("edit", ["upx.py", "peid_userdb.txt"])
+def test_packer_update_invalidates_only_the_packer_stage(samples, registry, cache, runs, edit):
+    sample = samples['pe32-upx-1K.exe']
+    report = _analyze(sample, cache)
+    before = _rows(cache)
+
+    with open(registry / edit, "a") as f:
+        f.write("\n# updated\n" if edit.endswith(".py") else "\n; updated\n")
+    runs.clear()
+    assert _analyze(sample, cache) == report
+    assert runs == ['packer']
+
+    after = _rows(cache)
+    changed = {key for key in after if after[key] != before[key]}
+    assert changed == {(report['info']['sha256'], 'packer')}
+
+
+def test_eviction_drops_least_recently_used_rows(tmp_path, monkeypatch):
+    clock = iter(range(1000))
+    monkeypatch.setattr(result_cache, "time", types.SimpleNamespace(time=lambda: next(clock)))
+    cache = ResultCache(str(tmp_path / "results.sqlite"), max_bytes=1000)
+    row = "x" * 98   # 100 bytes of JSON
+    for index in range(10):
+        cache.put(f"{index:064x}", 'info', "1", row)
+    assert cache.get(f"{0:064x}", 'info', "1") == row   # now the most recent
+
+    cache.put(f"{10:064x}", 'info', "1", row)
+    kept = {sha256 for sha256, _ in cache._db.execute("SELECT sha256, stage FROM results")}
+    # 1100 bytes: the two oldest go, down to the 900 byte target
+    assert kept == {f"{index:064x}" for index in (0, *range(3, 11))}
+    assert cache._size == 900
+    cache.close()
@@ -0,0 +1,145 @@
+"""SectionTable of corpus samples, and the packer verdicts built on it"""
+
+import struct
+
+import pytest
+
+from binary_analyzer import analyze_binary
+from core import elf_parser
+from core import sections
+from core.binary_buffer import BinaryBuffer
+
+import corpus
+
+# Verdict of every corpus variant, at every size
+VERDICTS = {
+    'plain': (None, 0),
+    'entropy': (None, 0),
+    'upx': ('UPX', 100),
+    'aspack': ('ASPack', 100),
+    'pecompact': ('PECompact', 100),
+    'themida': ('Themida', 100),
+}
+
+_SHDR_64 = struct.Struct('<IIQQQQIIQQ')
+
+
+def _table(tmp_path, data, binary_type, name="sample"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    with BinaryBuffer(str(path)) as binary:
+        return sections.for_binary(binary, binary_type)
+
+
+def _sample_table(samples, name):
+    with BinaryBuffer(samples[name]) as binary:
+        return sections.for_binary(binary, "ELF" if name.endswith(".elf") else "PE")
+
+
+@pytest.mark.parametrize("fmt", ['pe32', 'pe32plus'])
+@pytest.mark.parametrize("variant, names, entry, inflated", [
+    ('plain', [], '.text', []),
+    ('upx', ['UPX0', 'UPX1'], 'UPX1', ['UPX0']),
+    ('aspack', ['.aspack', '.adata'], '.aspack', []),
+    ('pecompact', ['.pec2'], '.text', []),
+    ('themida', ['.themida', '.boot'], '.boot', []),
+])
+def test_pe_table(samples, fmt, variant, names, entry, inflated):
+    table = _sample_table(samples, f"{fmt}-{variant}-64K.exe")
+    assert table.matched(['UPX0', 'UPX1', '.aspack', '.adata', '.pec2', '.themida', '.boot']) \
+        == names
+    assert table.entry_section().name == entry
+    assert [section.name for section in table.inflated()] == inflated
+    assert all(section.offset + section.size <= 64 * 1024 for section in table)
+
+
+def test_names_in_data_are_not_sections(tmp_path):
+    data = corpus.build_pe([(b'.text', b'\x90' * 64, corpus.IMAGE_SCN_CODE),
+                            (b'.data', b'UPX0\x00UPX1\x00.aspack\x00.themida\x00',
+                             corpus.IMAGE_SCN_DATA)])
+    table = _table(tmp_path, data, "PE")
+    assert table.matched(['UPX0', 'UPX1', '.aspack', '.themida']) == []
+    assert '.data' in table and 'UPX0' not in table
+
+    report = analyze_binary(str(tmp_path / "sample"), output="json")
+    assert report.packer.packer is None
+
+
+def test_entry_point_outside_every_section(tmp_path):
+    data = bytearray(corpus.sample('pe32', 'plain', 4096))
+    e_lfanew = struct.unpack_from('<I', data, 0x3C)[0]
+    struct.pack_into('<I', data, e_lfanew + 24 + 16, 0x7fff0000)
+    table = _table(tmp_path, bytes(data), "PE")
+    assert table.entry_point == 0x7fff0000
+    assert table.entry_section() is None
+
+
+@pytest.mark.parametrize("fmt", ['elf32', 'elf64'])
+def test_elf_table(samples, fmt):
+    table = _sample_table(samples, f"{fmt}-upx-64K.elf")
+    assert [section.name for section in table] == ['.text', '.data', '.shstrtab']
+    assert table.entry_section().name == '.text'
+    assert [section.name for section in table.writable_executable()] == []
+    assert table.inflated() == []
+    assert [segment.type for segment in table.segments][:1] == [elf_parser.PT_LOAD]
+
+
+def _elf_with(section_changes=(), memsz=None):
+    """Plain ELF64 plus a .bss, with sh_offset / sh_size of the sections and p_memsz patched"""
+    filler = corpus._Filler(corpus.DEFAULT_SEED, "sections")
+    elf_sections = corpus._elf_sections('plain', filler, 4096)
+    elf_sections.append((b'.bss', b'', corpus.SHF_ALLOC | corpus.SHF_WRITE,
+                         elf_parser.SHT_NOBITS))
+    image = bytearray(corpus.build_elf(elf_sections, True))
+    shoff = struct.unpack_from('<Q', image, 0x28)[0]
+    for index, offset, size in section_changes:
+        position = shoff + (index + 1) * _SHDR_64.size
+        if offset is not None:
+            struct.pack_into('<Q', image, position + 0x18, offset)
+        struct.pack_into('<Q', image, position + 0x20, size)
+    if memsz is not None:
+        struct.pack_into('<Q', image, 64 + 40, memsz)
+    return bytes(image)
+
+
+def test_nobits_takes_no_file_bytes(tmp_path):
+    data = _elf_with([(3, None, 1 << 20)])
+    bss = _table(tmp_path, data, "ELF").find('.bss')
+    assert (bss.size, bss.virtual_size) == (0, 1 << 20)
+
+
+def test_section_ranges_are_clamped_to_the_file(tmp_path):
+    data = _elf_with([(1, None, 1 << 40), (2, len(_elf_with()) + 4096, 64)])
+    table = _table(tmp_path, data, "ELF")
+    rodata, data_section = table.find('.rodata'), table.find('.data')
+    assert rodata.offset + rodata.size == len(data)
+    assert data_section.size == 0
+
+
+def test_inflated_load_segment(tmp_path):
+    data = _elf_with()
+    load = struct.unpack_from('<Q', data, 64 + 32)[0]
+    assert _table(tmp_path, data, "ELF").inflated() == []
+
+    table = _table(tmp_path, _elf_with(memsz=load * 5), "ELF", "inflated")
+    assert [segment.memsz for segment in table.inflated()] == [load * 5]
+
+
+@pytest.mark.parametrize("fmt, variant, size", list(corpus.combinations(sizes=('1K', '64K'))))
+def test_corpus_verdicts(samples, fmt, variant, size):
+    packer = analyze_binary(samples[corpus.sample_name(fmt, variant, size)], output="json").packer
+    assert (packer.packer, packer.confidence) == VERDICTS[variant]
+
+
+def test_aspack_sections_only(tmp_path):
+    # .aspack and .adata (40 each) and a high-entropy section (10); no ASPack string.
+    # Before section names were read from the table, .aspack also scored 30 as a string.
+    payload = corpus._Filler(corpus.DEFAULT_SEED, "aspack").random(5000)
+    assert b'ASP' not in payload
+    data = corpus.build_pe([(b'.text', b'\x90' * 100, corpus.IMAGE_SCN_CODE),
+                            (b'.aspack', payload, corpus.IMAGE_SCN_CODE),
+                            (b'.adata', b'', corpus.IMAGE_SCN_DATA)])
+    path = tmp_path / "aspack.exe"
+    path.write_bytes(data)
+    packer = analyze_binary(str(path), output="json").packer
+    assert (packer.packer, packer.confidence) == ('ASPack', 90)
@@ -0,0 +1,128 @@
+"""SecurityChecker on corpus samples and hardened variants of them"""
+
+import struct
+
+import pytest
+
+from core import elf_parser
+from core import pe_parser
+from core.binary_buffer import BinaryBuffer
+from core.security_checks import SecurityChecker
+
+import corpus
+
+ELF_CLASSES = [(is_64, big_endian) for is_64 in (False, True) for big_endian in (False, True)]
+INTERPRETER = '/lib64/ld-linux-x86-64.so.2'
+
+
+def _check(tmp_path, data, binary_type, name="sample"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    with BinaryBuffer(str(path)) as binary:
+        return SecurityChecker(binary, binary_type)
+
+
+def _hardened_elf(is_64, big_endian, dynamic, symbols=(), symbol_table=elf_parser.SHT_DYNSYM,
+                  relro=True):
+    """Plain corpus ELF plus .interp, .dynamic and a symbol table (+ PT_INTERP/DYNAMIC/GNU_RELRO)"""
+    endian = '>' if big_endian else '<'
+    entry = struct.Struct(endian + ('qQ' if is_64 else 'iI'))
+    symbol = struct.Struct(endian + ('IBBHQQ' if is_64 else 'IIIBBH'))
+
+    names = b'\x00'
+    table = symbol.pack(0, 0, 0, 0, 0, 0)
+    for name in symbols:
+        table += symbol.pack(len(names), 0, 0, 0, 0, 0)
+        names += name.encode() + b'\x00'
+
+    filler = corpus._Filler(corpus.DEFAULT_SEED, f"hardened:{is_64}:{big_endian}")
+    sections = corpus._elf_sections('plain', filler, 4096)
+    first = len(sections)
+    sections += [
+        (b'.interp', INTERPRETER.encode() + b'\x00', corpus.SHF_ALLOC),
+        (b'.dynamic', b''.join(entry.pack(tag, value) for tag, value in [*dynamic, (0, 0)]),
+         corpus.SHF_ALLOC | corpus.SHF_WRITE, elf_parser.SHT_DYNAMIC, first + 3, entry.size),
+        (b'.symbols', table, corpus.SHF_ALLOC, symbol_table, first + 3, symbol.size),
+        (b'.strings', names, corpus.SHF_ALLOC, elf_parser.SHT_STRTAB),
+    ]
+    segments = [(elf_parser.PT_INTERP, 0x4, first), (elf_parser.PT_DYNAMIC, 0x6, first + 1)]
+    if relro:
+        segments.append((elf_parser.PT_GNU_RELRO, 0x4, first + 1))
+    return corpus.build_elf(sections, is_64, segments=segments, big_endian=big_endian)
+
+
+@pytest.mark.parametrize("fmt", ['elf32', 'elf64'])
+def test_elf_corpus_sample(tmp_path, fmt):
+    checks = _check(tmp_path, corpus.sample(fmt, 'plain', 4096), "ELF").checks
+    assert checks == {'NX': True, 'PIE': False, 'RELRO': "No", 'CANARY': False,
+                      'INTERPRETER': None}
+
+
+@pytest.mark.parametrize("is_64, big_endian", ELF_CLASSES)
+@pytest.mark.parametrize("dynamic, relro, expected", [
+    ([(elf_parser.DT_BIND_NOW, 0)], True, "Full"),
+    ([(elf_parser.DT_FLAGS, elf_parser.DF_BIND_NOW)], True, "Full"),
+    ([(elf_parser.DT_FLAGS_1, elf_parser.DF_1_NOW)], True, "Full"),
+    ([(elf_parser.DT_FLAGS, 0)], True, "Partial"),
+    ([(elf_parser.DT_BIND_NOW, 0)], False, "No"),
+])
+def test_elf_relro(tmp_path, is_64, big_endian, dynamic, relro, expected):
+    checker = _check(tmp_path, _hardened_elf(is_64, big_endian, dynamic, relro=relro), "ELF")
+    assert checker.checks['RELRO'] == expected
+    assert checker.checks['INTERPRETER'] == INTERPRETER
+
+
+@pytest.mark.parametrize("is_64, big_endian", ELF_CLASSES)
+@pytest.mark.parametrize("symbol_table", [elf_parser.SHT_DYNSYM, elf_parser.SHT_SYMTAB])
+@pytest.mark.parametrize("symbols, expected", [
+    (['printf', '__stack_chk_fail'], True),
+    (['__stack_chk_fail_local'], True),
+    (['printf', 'stack_chk'], False),
+])
+def test_elf_canary(tmp_path, is_64, big_endian, symbol_table, symbols, expected):
+    data = _hardened_elf(is_64, big_endian, [], symbols, symbol_table)
+    assert _check(tmp_path, data, "ELF").checks['CANARY'] is expected
+
+
+def test_elf_display(tmp_path, capsys):
+    data = _hardened_elf(True, False, [(elf_parser.DT_BIND_NOW, 0)], ['__stack_chk_fail'])
+    _check(tmp_path, data, "ELF").display()
+    out = capsys.readouterr().out
+    assert "RELRO:  Full RELRO" in out
+    assert "CANARY:  Enabled" in out
+    assert f"Interpreter: {INTERPRETER}\n" in out
+
+
+def _with_directory(data, index, rva=0x1000, size=0x40):
+    """PE image with data directory `index` pointed at rva"""
+    image = bytearray(data)
+    e_lfanew = struct.unpack_from('<I', image, 0x3C)[0]
+    magic = struct.unpack_from('<H', image, e_lfanew + 24)[0]
+    directories = e_lfanew + 24 + (112 if magic == 0x20b else 96)
+    struct.pack_into('<II', image, directories + index * 8, rva, size)
+    return bytes(image)
+
+
+@pytest.mark.parametrize("directory, expected", [
+    (None, False),
+    (pe_parser.DIRECTORY_LOAD_CONFIG, True),
+    # The old check read the IAT entry (PE + 0xD8) as if it were LOAD_CONFIG
+    (pe_parser.DIRECTORY_IAT, False),
+])
+def test_pe_safeseh(tmp_path, directory, expected):
+    data = corpus.sample('pe32', 'plain', 4096)
+    if directory is not None:
+        data = _with_directory(data, directory)
+    checks = _check(tmp_path, data, "PE").checks
+    assert checks == {'ASLR': True, 'DEP': True, 'CFG': False, 'SafeSEH': expected}
+
+
+@pytest.mark.parametrize("directory", [None, pe_parser.DIRECTORY_LOAD_CONFIG])
+def test_pe_safeseh_64_bit(tmp_path, capsys, directory):
+    data = corpus.sample('pe32+', 'plain', 4096)
+    if directory is not None:
+        data = _with_directory(data, directory)
+    checker = _check(tmp_path, data, "PE")
+    assert checker.checks['SafeSEH'] == "N/A"
+    checker.display()
+    assert "SafeSEH:  N/A (64-bit)" in capsys.readouterr().out
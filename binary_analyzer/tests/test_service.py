@@ -0,0 +1,145 @@
+"""AnalysisService over a unix socket: queueing, 503s and request validation"""
+
+import asyncio
+import json
+
+import pytest
+
+import service
+from service import AnalysisService
+
+
+class _GatedService(AnalysisService):
+    """Jobs block until `gate` is set instead of running the analysis"""
+
+    def __init__(self, **settings):
+        super().__init__(jobs=1, **settings)
+        self.gate = asyncio.Event()
+
+    async def _run(self, job, attempts=2):
+        await self.gate.wait()
+        return {'path': job.path}, None
+
+
+async def _request(socket, method, target, payload=None):
+    """(status, headers, JSON body) of one request on a fresh connection"""
+    reader, writer = await asyncio.open_unix_connection(socket)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, json.loads(body)
+
+
+async def _until(condition, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def _serve(tmp_path, service_, scenario):
+    """Run scenario(socket, server) against a started service, then close it"""
+    socket = str(tmp_path / "ba.sock")
+
+    async def main():
+        await service_.start()
+        server = await service._listen(service_, f"unix:{socket}")
+        try:
+            async with server:
+                return await scenario(socket, server)
+        finally:
+            if not service_._closing:
+                await service_.close(server)
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def sample(tmp_path, samples):
+    return samples['pe32-upx-1K.exe']
+
+
+def test_analyze(tmp_path, sample):
+    async def scenario(socket, server):
+        status, _, report = await _request(socket, "POST", "/analyze", {'path': sample})
+        _, _, stats = await _request(socket, "GET", "/stats")
+        return status, report, stats
+
+    status, report, stats = _serve(tmp_path, AnalysisService(jobs=1), scenario)
+    assert status == 200
+    assert report['path'] == sample
+    assert len(report['info']['sha256']) == 64
+    assert report['packer']['packer'].startswith("UPX")
+    assert stats['completed'] == 1 and stats['failed'] == 0
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({'window_size': 0}, "window size must be positive"),
+    ({'stride': -1}, "stride must be positive"),
+    ({'window_size': 1000, 'stride': 300}, "multiple of the stride"),
+    ({'window_size': "4096"}, "Unsupported option"),
+    ({'colour': True}, "Unsupported option"),
+])
+def test_bad_options_are_400(tmp_path, sample, payload, message):
+    async def scenario(socket, server):
+        return await _request(socket, "POST", "/analyze", {'path': sample, **payload})
+
+    status, _, body = _serve(tmp_path, _GatedService(), scenario)
+    assert status == 400
+    assert message in body['error']
+
+
+def test_missing_file_is_404(tmp_path):
+    async def scenario(socket, server):
+        return await _request(socket, "POST", "/analyze", {'path': str(tmp_path / "missing")})
+
+    status, _, _ = _serve(tmp_path, _GatedService(), scenario)
+    assert status == 404
+
+
+def test_full_queue_is_503(tmp_path, sample):
+    gated = _GatedService(concurrency=1, queue_size=1)
+
+    async def scenario(socket, server):
+        running = asyncio.create_task(_request(socket, "POST", "/analyze", {'path': sample}))
+        await _until(lambda: gated.in_flight == 1)
+        queued = asyncio.create_task(_request(socket, "POST", "/analyze", {'path': sample}))
+        await _until(lambda: gated._queue.qsize() == 1)
+
+        refused = await _request(socket, "POST", "/analyze", {'path': sample})
+        gated.gate.set()
+        return refused, await running, await queued
+
+    refused, running, queued = _serve(tmp_path, gated, scenario)
+    assert refused[0] == 503
+    assert refused[1]['Retry-After'] == "1"
+    assert running[0] == queued[0] == 200
+    assert gated.rejected == 1 and gated.completed == 2
+
+
+def test_shutdown_answers_pending_requests_with_503(tmp_path, sample):
+    gated = _GatedService(concurrency=1, queue_size=4)
+
+    async def scenario(socket, server):
+        clients = [asyncio.create_task(_request(socket, "POST", "/analyze", {'path': sample}))
+                   for _ in range(3)]
+        await _until(lambda: gated.in_flight == 1 and gated._queue.qsize() == 2)
+        await gated.close(server)
+        answers = await asyncio.gather(*clients)
+        with pytest.raises(OSError):
+            await _request(socket, "GET", "/health")
+        with pytest.raises(service.HTTPError):
+            await gated.submit(sample)
+        return answers
+
+    answers = _serve(tmp_path, gated, scenario)
+    assert [status for status, _, _ in answers] == [503, 503, 503]
+    assert all(body['error'] == "Service is shutting down" for _, _, body in answers)
+    assert all(headers['Connection'] == "close" for _, headers, _ in answers)
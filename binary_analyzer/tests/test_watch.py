@@ -0,0 +1,168 @@
+"""WatchDaemon: settling, temporary names and content dedupe in the workers"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import watch
+from watch import WatchDaemon
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    daemon = WatchDaemon([str(tmp_path)], jobs=1, settle=2.0, poll=1.0, output="json")
+    yield daemon
+    os.close(daemon._wake_read)
+    os.close(daemon._wake_write)
+
+
+def _drop(directory, name, data=b"MZ data"):
+    path = directory / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_file_is_ready_once_settled(tmp_path, daemon):
+    path = _drop(tmp_path, "sample.exe")
+    daemon._touch(path, watch._signature(path), now=100.0)
+    assert daemon._timeout(100.5) == 1.5
+    assert daemon._settled(101.9) == []
+
+    assert daemon._settled(102.0) == [(path, watch._signature(path))]
+    assert daemon._pending == {} and daemon._timeout(102.0) is None
+
+
+def test_growing_file_waits_again(tmp_path, daemon):
+    path = _drop(tmp_path, "upload.exe")
+    daemon._touch(path, watch._signature(path), now=100.0)
+    with open(path, "ab") as upload:
+        upload.write(b"more")
+    os.utime(path, ns=(0, 10 ** 9))
+
+    # Changed since it was seen: the settle delay starts over
+    assert daemon._settled(102.0) == []
+    assert daemon._timeout(102.0) == 2.0
+    assert daemon._settled(104.0) == [(path, watch._signature(path))]
+
+
+def test_touch_restarts_settle_only_on_change(tmp_path, daemon):
+    path = _drop(tmp_path, "sample.exe")
+    signature = watch._signature(path)
+    daemon._touch(path, signature, now=100.0)
+    daemon._touch(path, signature, now=101.0)
+    assert daemon._timeout(101.0) == 1.0
+
+    daemon._touch(path, (signature[0] + 1, signature[1]), now=101.0)
+    assert daemon._timeout(101.0) == 2.0
+
+
+def test_deleted_or_queued_files_are_dropped(tmp_path, daemon):
+    path = _drop(tmp_path, "sample.exe")
+    signature = watch._signature(path)
+    daemon._touch(path, signature, now=100.0)
+    os.remove(path)
+    assert daemon._settled(103.0) == [] and daemon._pending == {}
+
+    path = _drop(tmp_path, "queued.exe")
+    daemon._queued[path] = watch._signature(path)
+    daemon._touch(path, watch._signature(path), now=100.0)
+    assert daemon._pending == {}
+
+
+@pytest.mark.parametrize("name, ignored", [
+    ("sample.exe", False),
+    ("sample.exe.part", True),
+    ("sample.exe.PARTIAL", True),
+    ("sample.tmp", True),
+    ("setup.exe.crdownload", True),
+    (".sample.exe.swp", True),
+    (".hidden", True),
+    ("part", False),
+])
+def test_temporary_names(tmp_path, daemon, name, ignored):
+    assert watch._ignored(str(tmp_path / name)) is ignored
+    path = _drop(tmp_path, name)
+    daemon._touch(path, watch._signature(path), now=100.0)
+    assert (path not in daemon._pending) is ignored
+
+
+def test_renamed_download_is_taken(tmp_path, daemon):
+    partial = _drop(tmp_path, "sample.exe.part")
+    daemon._touch(partial, watch._signature(partial), now=100.0)
+    path = str(tmp_path / "sample.exe")
+    os.rename(partial, path)
+    daemon._touch(path, watch._signature(path), now=101.0)
+    assert daemon._settled(103.0) == [(path, watch._signature(path))]
+
+
+@pytest.fixture
+def claims(monkeypatch):
+    claims = {}
+    monkeypatch.setattr(watch, "_claims", claims)
+    return claims
+
+
+def test_worker_claims_content_before_the_stages(samples, tmp_path, claims, monkeypatch):
+    sample = samples['pe32-upx-1K.exe']
+    copy = shutil.copy(sample, tmp_path / "renamed.exe")
+    options = {'output': "json"}
+
+    _, _, _, record, error, original = watch._watch_worker(sample, options, (sample, 0))
+    assert error is None and original is None
+    assert claims == {record['info']['sha256']: (sample, 0)}
+
+    # A copy never reaches a stage
+    stages = []
+    monkeypatch.setattr("core.binary_info.BinaryInfo", lambda *_: stages.append("info"))
+    path, _, text, record, error, original = watch._watch_worker(str(copy), options,
+                                                                  (str(copy), 1))
+    assert (path, text, record, error, original) == (str(copy), "", None, None, sample)
+    assert stages == []
+
+    # The same path submitted again (rewritten with the same bytes) is a duplicate too
+    assert watch._watch_worker(sample, options, (sample, 2))[5] == sample
+    # ... but a retry of the first submission is analyzed again
+    assert watch._watch_worker(sample, options, (sample, 0))[5] is None
+
+
+def test_failed_analysis_releases_the_claim(samples, claims, monkeypatch):
+    sample = samples['elf64-plain-1K.elf']
+
+    def failing(path, options):
+        options['claim']("0" * 64)
+        return path, 0, "", None, "boom"
+
+    monkeypatch.setattr(watch, "analyze_worker", failing)
+    assert watch._watch_worker(sample, {}, (sample, 0))[4] == "boom"
+    assert claims == {}
+
+
+def test_daemon_analyzes_each_content_once(samples, tmp_path, capsys):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    daemon = WatchDaemon([str(inbox)], jobs=2, settle=0.1, poll=0.1, output="ndjson")
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    try:
+        for name in ('pe32-upx-1K.exe', 'elf64-plain-1K.elf'):
+            shutil.copy(samples[name], inbox / name)
+        shutil.copy(samples['pe32-upx-1K.exe'], inbox / "copy.exe")
+        _drop(inbox, "copy.exe.part")
+        deadline = time.monotonic() + 30
+        while daemon.completed + daemon.duplicates < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        daemon.stop()
+        thread.join()
+
+    assert (daemon.completed, daemon.duplicates, daemon.failed) == (2, 1, 0)
+    out, err = capsys.readouterr()
+    reports = [json.loads(line) for line in out.splitlines()]
+    assert len(reports) == 2
+    assert len({report['info']['sha256'] for report in reports}) == 2
+    assert "Skipped duplicate" in err
+    assert "2 analyzed, 0 failed, 1 duplicates skipped" in err
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Watch-folder daemon (binary_analyzer.py --watch DIR).
+
+Files dropped under the watched directories are analyzed as they arrive
+instead of rescanning everything from cron:
+
+    1. Change notification: inotify (through ctypes, Linux) reports files
+       created, closed after writing or moved in, and new subdirectories.
+       Without inotify, or with --poll, the trees are listed again every
+       few seconds and compared on size and mtime.
+    2. Settling: a file is taken once its size and mtime have not changed
+       for `settle` seconds, so half-copied uploads are never analyzed.
+       Dot files and temporary download names (IGNORED_SUFFIXES) wait for
+       their final name.
+    3. Dedupe: a path whose size/mtime did not change since it was queued
+       is skipped. Content is deduped in the worker, off the main loop:
+       the SHA256 of the first pass the stages use anyway is claimed in a
+       dict shared by the pool (multiprocessing manager) before any stage
+       runs, and a copy of content already claimed is not analyzed.
+    4. Analysis runs on a ProcessPoolExecutor forked once at start; its
+       workers preload the packer plugins (binary_analyzer.init_worker)
+       and keep them for every file.
+
+Idle, the daemon sleeps in select() on the inotify descriptor and a wakeup
+pipe: no timer runs until a file is pending. Seen paths and claimed digests
+live in memory; pair --watch with --cache so files analyzed before a restart
+are answered from the result cache.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import signal
+import stat
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import count
+from multiprocessing.managers import SyncManager
+
+from binary_analyzer import analyze_worker, init_worker, write_record
+
+DEFAULT_SETTLE = 2.0
+DEFAULT_POLL_INTERVAL = 2.0
+READ_SIZE = 64 * 1024
+# Partial downloads / copies, analyzed once renamed to their final name
+IGNORED_SUFFIXES = ('.part', '.partial', '.tmp', '.crdownload', '.swp')
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")   # wd, mask, cookie, name length
+
+
+class Inotify:
+    """inotify instance over ctypes; OSError where the kernel / libc has none"""
+
+    MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MOVED_FROM |
+            IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._directories = {}   # watch descriptor -> directory
+
+    def add(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), directory)
+        self._directories[wd] = directory
+
+    def read(self):
+        """(path, mask) of every queued event; path is None after a queue overflow"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    events.append((None, mask))
+                    continue
+                if mask & IN_IGNORED:
+                    # The directory is gone (or unmounted): its descriptor is freed
+                    self._directories.pop(wd, None)
+                    continue
+                directory = self._directories.get(wd)
+                if directory is not None:
+                    events.append((os.path.join(directory, os.fsdecode(name)) if name else directory,
+                                   mask))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _ignored(path):
+    name = os.path.basename(path)
+    return name.startswith(".") or name.lower().endswith(IGNORED_SUFFIXES)
+
+
+def _signature(path):
+    """(size, mtime_ns) of a regular file, None otherwise"""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(info.st_mode):
+        return None
+    return info.st_size, info.st_mtime_ns
+
+
+def _walk(directory):
+    """(directories, [(path, (size, mtime_ns))]) under directory, symlinks not followed"""
+    directories, files = [], []
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        directories.append(current)
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    info = entry.stat(follow_symlinks=False)
+                    files.append((entry.path, (info.st_size, info.st_mtime_ns)))
+            except OSError:
+                pass
+    return directories, files
+
+
+# Worker side: SHA256 -> (path, submission) that claimed the content first
+_claims = None
+
+
+def _ignore_sigint():
+    # Ctrl-C reaches the whole process group: only the daemon decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _init_watch_worker(profile_path=None, claims=None):
+    global _claims
+    _ignore_sigint()
+    _claims = claims
+    init_worker(profile_path)
+
+
+def _watch_worker(path, options, token):
+    """analyze_worker() result plus the path that claimed the content first
+
+    token identifies the submission (a retry after a worker crash keeps its
+    claim). The file is only analyzed when its SHA256 was unclaimed; a copy
+    comes back with an empty report and the first claimant's path.
+    """
+    claimed = []
+
+    def claim(sha256):
+        owner = _claims.setdefault(sha256, token)
+        claimed.append((sha256, owner))
+        return owner == token
+
+    filepath, size, text, record, error = analyze_worker(path, {**options, 'claim': claim})
+    if claimed:
+        sha256, owner = claimed[0]
+        if owner != token:
+            return filepath, size, "", None, None, owner[0]
+        if error:
+            # Let a later copy try again
+            _claims.pop(sha256, None)
+    return filepath, size, text, record, error, None
+
+
+class WatchDaemon:
+    def __init__(self, directories, jobs=None, settle=DEFAULT_SETTLE, poll=None,
+                 profile=None, **options):
+        """options: analyze_binary options for every file (output, cache, ...)
+
+        poll: seconds between listings; None uses inotify where available.
+        profile: every worker writes its cProfile dump to PROFILE.<pid>.
+        """
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.jobs = jobs or os.cpu_count() or 1
+        self.settle = settle
+        self.poll = poll
+        self.profile = profile
+        self.options = options
+        self.output = options.get("output", "text")
+        self.log = sys.stdout if self.output == "text" else sys.stderr
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.duplicates = 0
+        self._pending = {}     # path -> (size, mtime_ns, monotonic time it was last seen changing)
+        self._queued = {}      # path -> (size, mtime_ns) when it was queued
+        self._tokens = count()
+        self._manager = None
+        self._claims = None
+        self._finished = deque()
+        self._inotify = None
+        self._processes = None
+        self._stopping = False
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+
+    def _pool(self):
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_watch_worker,
+                                   initargs=(self.profile, self._claims))
+
+    def _wake(self):
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            pass   # already awake
+
+    def stop(self, *_):
+        self._stopping = True
+        self._wake()
+
+    def _touch(self, path, signature, now):
+        """Note a possibly changed file; it becomes ready once it settles"""
+        if signature is None or _ignored(path) or self._queued.get(path) == signature:
+            self._pending.pop(path, None)
+            return
+        seen = self._pending.get(path)
+        if seen is None or seen[:2] != signature:
+            self._pending[path] = (*signature, now)
+
+    def _scan(self, directory, now):
+        """Watch a tree (inotify) and take the files already in it"""
+        directories, files = _walk(directory)
+        if self._inotify is not None:
+            for path in directories:
+                try:
+                    self._inotify.add(path)
+                except OSError as e:
+                    # ENOSPC: fs.inotify.max_user_watches is exhausted
+                    print(f"[!] Not watching {path}: {e.strerror}", file=self.log, flush=True)
+        for path, signature in files:
+            self._touch(path, signature, now)
+        return files
+
+    def _poll(self, now):
+        listed = set()
+        for directory in self.directories:
+            listed.update(path for path, _ in self._scan(directory, now))
+        # Deleted files are forgotten, so a new file under the same name is taken
+        self._queued = {path: signature for path, signature in self._queued.items()
+                        if path in listed}
+
+    def _events(self, now):
+        for path, mask in self._inotify.read():
+            if path is None:
+                # Events were dropped: compare everything again
+                for directory in self.directories:
+                    self._scan(directory, now)
+            elif mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files can land in a new directory before its watch exists
+                    self._scan(path, now)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._pending.pop(path, None)
+                self._queued.pop(path, None)
+            elif not mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                self._touch(path, _signature(path), now)
+
+    def _timeout(self, now):
+        """Seconds until the earliest pending file may have settled, None if none is pending"""
+        if not self._pending:
+            return None
+        return max(0.0, min(seen for _, _, seen in self._pending.values()) + self.settle - now)
+
+    def _settled(self, now):
+        ready = []
+        for path, (size, mtime, seen) in list(self._pending.items()):
+            if now - seen < self.settle:
+                continue
+            signature = _signature(path)
+            if signature is None:
+                del self._pending[path]
+            elif signature != (size, mtime):
+                self._pending[path] = (*signature, now)
+            else:
+                del self._pending[path]
+                ready.append((path, signature))
+        return ready
+
+    def _dispatch(self, path, signature):
+        self._queued[path] = signature
+        self._submit(path)
+
+    def _submit(self, path, attempt=1, token=None):
+        pool = self._processes
+        token = token or (path, next(self._tokens))
+        future = pool.submit(_watch_worker, path, self.options, token)
+        self.queued += 1
+        # Runs on the executor's thread: hand the result to the main loop
+        future.add_done_callback(
+            lambda done: (self._finished.append((path, attempt, token, pool, done)), self._wake()))
+
+    def _collect(self):
+        while self._finished:
+            path, attempt, token, pool, future = self._finished.popleft()
+            if future.cancelled():
+                # Still queued at shutdown
+                continue
+            try:
+                filepath, _, text, record, error, original = future.result()
+            except BrokenProcessPool:
+                # A worker died (OOM kill, crash): replace the pool and retry once
+                if pool is self._processes and not self._stopping:
+                    self._processes = self._pool()
+                if attempt < 2 and not self._stopping:
+                    self.queued -= 1
+                    self._submit(path, attempt + 1, token)
+                    continue
+                filepath, text, record, error, original = path, "", None, "Analysis worker died", None
+            except Exception as e:
+                filepath, text, record, error, original = path, "", None, str(e), None
+
+            if original is not None:
+                self.duplicates += 1
+                print(f"[*] Skipped duplicate: {filepath} (same content as {original})",
+                      file=self.log, flush=True)
+                continue
+            if self.output == "text":
+                sys.stdout.write(text)
+            elif record is not None:
+                write_record(record, "ndjson", False)
+            if error:
+                self.failed += 1
+                print(f"[!] Error: {filepath}: {error}", file=self.log, flush=True)
+            else:
+                self.completed += 1
+            sys.stdout.flush()
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self._wake_read, READ_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+
+    def run(self):
+        """Watch until stop() (SIGINT / SIGTERM with watch())"""
+        self._manager = SyncManager()
+        self._manager.start(_ignore_sigint)
+        self._claims = self._manager.dict()
+        self._processes = self._pool()
+        # Fork every worker now, before the executor threads exist
+        for future in [self._processes.submit(os.getpid) for _ in range(self.jobs)]:
+            future.result()
+
+        if self.poll is None:
+            try:
+                self._inotify = Inotify()
+            except OSError as e:
+                print(f"[!] inotify unavailable ({e.strerror}), polling instead",
+                      file=self.log, flush=True)
+        interval = self.poll or DEFAULT_POLL_INTERVAL
+        mode = "inotify" if self._inotify else f"polling every {interval:g}s"
+        print(f"[*] Watching {', '.join(self.directories)} ({mode}, settle {self.settle:g}s, "
+              f"{self.jobs} workers)", file=self.log, flush=True)
+
+        now = time.monotonic()
+        if self._inotify:
+            for directory in self.directories:
+                self._scan(directory, now)
+        else:
+            self._poll(now)
+        next_poll = now + interval
+
+        try:
+            while not self._stopping:
+                timeout = self._timeout(time.monotonic())
+                readable = [self._wake_read]
+                if self._inotify:
+                    readable.append(self._inotify.fd)
+                else:
+                    until_poll = max(0.0, next_poll - time.monotonic())
+                    timeout = until_poll if timeout is None else min(timeout, until_poll)
+                ready, _, _ = select.select(readable, [], [], timeout)
+
+                now = time.monotonic()
+                if self._wake_read in ready:
+                    self._drain_wakeups()
+                if self._inotify and self._inotify.fd in ready:
+                    self._events(now)
+                if not self._inotify and now >= next_poll:
+                    self._poll(now)
+                    next_poll = now + interval
+                for path, signature in self._settled(now):
+                    self._dispatch(path, signature)
+                self._collect()
+        finally:
+            # Files already handed to the workers are finished and reported
+            self._processes.shutdown(wait=True, cancel_futures=True)
+            self._collect()
+            self._manager.shutdown()
+            if self._inotify:
+                self._inotify.close()
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+        print(f"[*] Stopped: {self.completed} analyzed, {self.failed} failed, "
+              f"{self.duplicates} duplicates skipped", file=self.log, flush=True)
+
+
+def watch(directories, **settings):
+    """Run a WatchDaemon until SIGINT / SIGTERM
+
+    settings: WatchDaemon arguments and analyze_binary options.
+    """
+    daemon = WatchDaemon(directories, **settings)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, daemon.stop)
+    daemon.run()
+    return daemon
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Encoding detection for subtitle files, decided before the single decode.
+
+    1. A byte order mark settles it (UTF-8 / UTF-16 / UTF-32).
+    2. Without one, a bounded sample starting at the first non-ASCII byte
+       is decoded with every candidate encoding. Valid non-ASCII UTF-8 is
+       taken as is; otherwise each legacy codepage that decodes the sample
+       is scored on how plausible its words look and the best one wins
+       (ties go to the earlier candidate).
+    3. Batch runs remember the decision per directory: later files of a
+       season folder are still scored, and the folder's codepage wins the
+       ties (a sample whose only non-ASCII bytes are punctuation).
+
+The score only looks at words containing non-ASCII letters: a word written
+in a single script scores, a word mixing scripts ("deрil": Turkish read as
+CP1251) or cases ("ЗбУбЗг": Arabic read as CP1251) and an accented Latin
+word without any ASCII letter ("Ïðèâåò": Russian read as CP1254) count
+against the encoding, as do control characters and stray symbols.
+"""
+
+import codecs
+import os
+import re
+import unicodedata
+
+DEFAULT_ENCODINGS = ("utf-8", "windows-1254", "windows-1251", "windows-1256", "latin-1")
+SNIFF_BYTES = 64 * 1024
+
+# Longest first: the UTF-32-LE mark starts with the UTF-16-LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+_WORD = re.compile(r'[^\W\d_]+')
+_PUNCTUATION = set("“”„‘’‚«»‹›–—…•·°±×§©®™€£¥¢¿¡ ")
+
+# Code point ranges of the scripts the default codepages cover
+_SCRIPTS = (
+    (0x0000, 0x024F, 'latin'),
+    (0x0370, 0x03FF, 'greek'),
+    (0x0400, 0x052F, 'cyrillic'),
+    (0x0590, 0x05FF, 'hebrew'),
+    (0x0600, 0x06FF, 'arabic'),
+)
+
+
+def _script(char):
+    point = ord(char)
+    for low, high, name in _SCRIPTS:
+        if low <= point <= high:
+            return name
+    return 'other'
+
+
+def score(text):
+    """Plausibility of decoded text; higher is better"""
+    total = 0
+    for word in _WORD.findall(text):
+        if word.isascii():
+            continue
+        scripts = {_script(char) for char in word}
+        if len(scripts) > 1 or any(a.islower() and b.isupper() for a, b in zip(word, word[1:])):
+            total -= 2
+        elif scripts == {'latin'} and len(word) >= 3 and not any(char.isascii() for char in word):
+            total -= 1
+        else:
+            total += 1
+    for char in text:
+        if char.isascii() or char.isalnum() or char.isspace() or char in _PUNCTUATION:
+            continue
+        category = unicodedata.category(char)
+        if category.startswith('C'):
+            total -= 3
+        elif not category.startswith('M'):
+            total -= 1
+    return total
+
+
+def _bom(data):
+    for mark, encoding in _BOMS:
+        if data.startswith(mark):
+            return encoding, len(mark)
+    return None, 0
+
+
+def _utf16(sample):
+    """UTF-16 without a BOM: ASCII text leaves every other byte zero"""
+    if len(sample) < 64:
+        return None
+    even, odd = sample[0::2].count(0), sample[1::2].count(0)
+    half = len(sample) // 2
+    if odd > half * 0.4 and even < half * 0.05:
+        return "utf-16-le"
+    if even > half * 0.4 and odd < half * 0.05:
+        return "utf-16-be"
+    return None
+
+
+def _is_utf8(encoding):
+    return codecs.lookup(encoding).name == "utf-8"
+
+
+class EncodingDetector:
+    """Picks the encoding of subtitle bytes among a list of candidates"""
+
+    def __init__(self, candidates=DEFAULT_ENCODINGS, sniff_bytes=SNIFF_BYTES):
+        for encoding in candidates:
+            codecs.lookup(encoding)  # LookupError for unknown names
+        self.candidates = tuple(candidates)
+        self.sniff_bytes = sniff_bytes
+        self._directories = {}   # directory -> encoding decided for an earlier file
+
+    def detect(self, data):
+        """(encoding, evident) of data; evident is False for pure ASCII"""
+        encoding = _bom(data)[0] or _utf16(data[:self.sniff_bytes])
+        if encoding:
+            return encoding, True
+        return self._sniff(data, self.candidates)
+
+    def _sniff(self, data, candidates):
+        """Best candidate for a sample of data (None if none decodes it)"""
+        first = _NON_ASCII.search(data)
+        if first is None:
+            return candidates[0], False
+        # ASCII context before the first non-ASCII byte, so words are not cut
+        start = max(0, first.start() - 256)
+        sample = data[start:start + self.sniff_bytes]
+        final = start + self.sniff_bytes >= len(data)
+
+        best, best_score = None, None
+        for encoding in candidates:
+            try:
+                text = codecs.getincrementaldecoder(encoding)().decode(sample, final)
+            except UnicodeDecodeError:
+                continue
+            if _is_utf8(encoding):
+                # Non-ASCII text that is valid UTF-8 is almost never anything else
+                return encoding, True
+            value = score(text)
+            if best_score is None or value > best_score:
+                best, best_score = encoding, value
+        return best, True
+
+    def decode(self, data, path=None):
+        """(text, encoding) of a whole file, decoded once"""
+        encoding, skip = _bom(data)
+        if encoding:
+            return data[skip:].decode(encoding), encoding
+
+        encoding = _utf16(data[:self.sniff_bytes])
+        if encoding:
+            try:
+                return data.decode(encoding), encoding
+            except UnicodeDecodeError:
+                pass
+
+        directory = os.path.dirname(os.path.abspath(path)) if path else None
+        cached = self._directories.get(directory)
+        remaining = list(self.candidates)
+        if cached:
+            # Single-byte codepages decode anything: the folder's one is only
+            # preferred, as the first candidate, where the scores tie
+            remaining.remove(cached)
+            remaining.insert(0, cached)
+        while remaining:
+            encoding, evident = self._sniff(data, remaining)
+            if encoding is None:
+                break
+            try:
+                text = data.decode(encoding)
+            except UnicodeDecodeError:
+                # Invalid past the sample: decide again without it
+                remaining.remove(encoding)
+                continue
+            if evident and directory is not None:
+                self._directories[directory] = encoding
+            return text, encoding
+        raise UnicodeDecodeError("subtitle", data, 0, len(data),
+                                 f"none of {', '.join(self.candidates)} decodes the file")
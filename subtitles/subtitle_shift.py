@@ -1,38 +1,201 @@
 #!/usr/bin/env python3
 import argparse
-import pysubs2
+import glob
 import sys
 import os
 
-def main():
-    parser = argparse.ArgumentParser(description="SRT/ASS subtitle time shift")
-    parser.add_argument("--file", "-f", required=True, help="File to edit subtitle time")
-    parser.add_argument("--time", "-t", type=float, required=True, help="Time Shift (seconds, + , - )")
-    parser.add_argument("--output", "-o", help="Output name (optional)")
-    
-    args = parser.parse_args()
-    
+from subtitle_encoding import DEFAULT_ENCODINGS, EncodingDetector
+from subtitle_timing import FORMATS, Timings, parse_time, transform
+
+SUFFIX = "_rsynced"
+
+def find_subtitles(patterns):
+    """Files named by patterns: files, directories (recursive) and globs"""
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = []
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                candidates.extend(os.path.join(root, name) for name in sorted(files))
+        elif glob.has_magic(pattern):
+            candidates = sorted(glob.glob(pattern, recursive=True))
+        else:
+            yield pattern
+            continue
+        for path in candidates:
+            base, ext = os.path.splitext(path)
+            # Outputs of an earlier run are not resynced again
+            if ext.lower() in FORMATS and not base.endswith(SUFFIX) and os.path.isfile(path):
+                yield path
+
+def output_path(path, output=None):
+    base, ext = os.path.splitext(path)
+    if output:
+        return f"{output}{ext}"
+    return f"{base}{SUFFIX}{ext}"
+
+# One detector per process and candidate list: its per-directory decisions
+# carry over between the files a worker is given
+_detectors = {}
+
+def _read(path, encodings=DEFAULT_ENCODINGS):
+    """Decoded text of a file, read and decoded once"""
+    detector = _detectors.get(encodings)
+    if detector is None:
+        detector = _detectors[encodings] = EncodingDetector(encodings)
+    with open(path, "rb") as f:
+        data = f.read()
+    return detector.decode(data, path)[0]
+
+def describe(seconds=0.0, fps=None, anchors=None):
+    steps = []
+    if fps:
+        steps.append(f"converted {fps[0]:g} -> {fps[1]:g} fps")
+    if anchors:
+        steps.append(f"remapped over {len(anchors)} anchor(s)")
+    if seconds or not steps:
+        steps.append(f"shifted {seconds}")
+    return ", ".join(steps)
+
+def shift_file(path, output_file, seconds=0.0, fps=None, anchors=None, encodings=DEFAULT_ENCODINGS):
+    """Resync one file; (path, output_file, events, error)
+
+    fps / anchors: see subtitle_timing.transform().
+    encodings: candidate input encodings, see subtitle_encoding.
+    """
+    syntax = FORMATS.get(os.path.splitext(path)[1].lower())
     try:
-        subs = pysubs2.load(args.file,encoding="utf-8")
-    except UnicodeDecodeError:
-        subs = pysubs2.load(args.file,encoding="windows-1254")
+        if syntax is None:
+            # Other formats (VTT, MicroDVD, ...) still go through pysubs2
+            import pysubs2
+            subs = pysubs2.SSAFile.from_string(_read(path, encodings))
+            times = transform([time for event in subs for time in (event.start, event.end)],
+                              seconds, fps, anchors)
+            for event, start, end in zip(subs, times[0::2], times[1::2]):
+                event.start, event.end = int(start), int(end)
+            subs.save(output_file)
+            return path, output_file, len(subs), None
+        timings = Timings(_read(path, encodings), syntax)
     except Exception as e:
-        print(f"file could not be read: {e}")
-        sys.exit(1)
+        return path, output_file, 0, f"file could not be read: {e}"
 
-    subs.shift(s=args.time)
-    
-    if args.output:
-        ext = os.path.splitext(args.file)[1]
-        output_file = f"{args.output}{ext}"
-    else:
-        base, ext = os.path.splitext(args.file)
-        output_file = f"{base}_rsynced{ext}"
+    timings.adjust(seconds, fps, anchors)
     try:
-        subs.save(output_file)
-        print(f"Subtitle shifted {args.time} and saved as '{output_file}'")
+        # newline="": CRLF files stay CRLF
+        with open(output_file, "w", encoding="utf-8", newline="") as f:
+            timings.write(f)
     except Exception as e:
-        print(f"file could not be saved: {e}")
+        return path, output_file, 0, f"file could not be saved: {e}"
+    return path, output_file, len(timings), None
+
+def _shift_worker(task):
+    return shift_file(*task)
+
+def shift_batch(paths, seconds=0.0, jobs=None, output=None, fps=None, anchors=None,
+                encodings=DEFAULT_ENCODINGS):
+    """Resync many files over a process pool; returns the failure count"""
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+
+    paths = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+    encodings = tuple(encodings)
+    tasks = [(path, output_path(path, output), seconds, fps, anchors, encodings) for path in paths]
+    action = describe(seconds, fps, anchors)
+    start = time.perf_counter()
+    failed = 0
+    events = 0
+
+    if jobs == 1 or len(tasks) < 2:
+        results = map(_shift_worker, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        chunksize = max(1, min(32, len(tasks) // (jobs * 4)))
+        results = executor.map(_shift_worker, tasks, chunksize=chunksize)
+
+    try:
+        for path, output_file, count, error in results:
+            if error:
+                failed += 1
+                print(f"{path}: {error}")
+            else:
+                events += count
+                print(f"Subtitle {action} and saved as '{output_file}'")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    if len(tasks) > 1:
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        print(f"Resynced {len(tasks) - failed} files ({failed} failed, {events} events) "
+              f"in {elapsed:.2f}s with {jobs} jobs")
+    return failed
+
+def _rate(value):
+    """Framerate as a number or a fraction ("24000/1001")"""
+    from fractions import Fraction
+    try:
+        rate = float(Fraction(value))
+    except (ValueError, ZeroDivisionError):
+        raise argparse.ArgumentTypeError(f"invalid framerate: {value}")
+    if rate <= 0:
+        raise argparse.ArgumentTypeError(f"invalid framerate: {value}")
+    return rate
+
+def _anchor(value):
+    """SUBTITLE_TIME=TARGET_TIME, each as seconds or [HH:]MM:SS[,mmm]"""
+    source, sep, target = value.partition("=")
+    try:
+        if not sep:
+            raise ValueError
+        return parse_time(source), parse_time(target)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid anchor (expected SUB=TARGET): {value}")
+
+def main():
+    parser = argparse.ArgumentParser(description="SRT/ASS subtitle time shift / resync",
+                                     epilog="ex: %(prog)s -t 1.5 'Season 1/' '**/*.en.srt'")
+    parser.add_argument("paths", nargs="*", help="Files, directories or glob patterns")
+    parser.add_argument("--file", "-f", action="append", default=[], help="File to edit subtitle time")
+    parser.add_argument("--time", "-t", type=float,
+                        help="Time Shift (seconds, + , - ), applied after --fps / --anchor; "
+                             "-t 0 only re-encodes to UTF-8")
+    drift = parser.add_mutually_exclusive_group()
+    drift.add_argument("--fps", nargs=2, type=_rate, metavar=("FROM", "TO"),
+                       help="Framerate conversion, ex: --fps 23.976 25 (or 24000/1001)")
+    drift.add_argument("--anchor", "-a", action="append", type=_anchor, metavar="SUB=TARGET",
+                       help="Subtitle time -> target time (ex: 00:42:10,500=00:44:01); "
+                            "repeat for a piecewise-linear resync")
+    parser.add_argument("--output", "-o", help="Output name (optional, single file only)")
+    parser.add_argument("--encodings", "-e", default=",".join(DEFAULT_ENCODINGS), metavar="LIST",
+                        help="Candidate input encodings, in order of preference "
+                             f"(default {','.join(DEFAULT_ENCODINGS)}); output is UTF-8")
+    parser.add_argument("--jobs", "-j", type=int, help="Worker processes (default: CPU count)")
+
+    args = parser.parse_args()
+
+    paths = list(find_subtitles(args.file + args.paths))
+    if not paths:
+        parser.error("no subtitle files given (--file, a directory or a glob)")
+    if args.output and len(paths) > 1:
+        parser.error("--output needs a single input file")
+    if args.time is None and not (args.fps or args.anchor):
+        parser.error("give --time, --fps or --anchor")
+    if args.anchor and len({source for source, _ in args.anchor}) != len(args.anchor):
+        parser.error("two anchors at the same subtitle time")
+    encodings = tuple(name.strip() for name in args.encodings.split(",") if name.strip())
+    if not encodings:
+        parser.error("--encodings needs at least one encoding")
+    try:
+        EncodingDetector(encodings)
+    except LookupError as e:
+        parser.error(f"--encodings: {e}")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    if shift_batch(paths, args.time or 0.0, args.jobs, args.output, args.fps, args.anchor,
+                   encodings):
         sys.exit(1)
 if __name__ == "__main__":
     main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Timestamp engine for SRT / ASS files, without per-event objects.
+
+The decoded file is searched once with a compiled regex for every timing
+(SRT "-->" lines, ASS Dialogue/Comment Start,End fields). The times become
+one array of milliseconds that is shifted in a single vectorized operation
+(NumPy when installed, a list comprehension otherwise) and written back
+between the untouched text spans: everything except the timestamps is
+copied through unchanged, line endings included.
+
+Besides a constant shift, transform() rescales for a framerate change
+(23.976 <-> 25 fps drift) and remaps through (subtitle time -> target time)
+anchors: times between two anchors are interpolated linearly, times outside
+them follow the slope of the first / last segment.
+"""
+
+import re
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# file extension -> timestamp syntax
+FORMATS = {'.srt': 'srt', '.ass': 'ass', '.ssa': 'ass'}
+
+_SRT_TIME = r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})'
+_ASS_TIME = r'(\d+):(\d{1,2}):(\d{1,2})\.(\d{1,3})'
+
+_PATTERNS = {
+    'srt': re.compile(rf'^[ \t]*{_SRT_TIME}[ \t]*-->[ \t]*{_SRT_TIME}', re.M),
+    # Start and End are the 2nd and 3rd fields of the standard [Events] Format line
+    'ass': re.compile(rf'^(?:Dialogue|Comment):[^,\n]*,{_ASS_TIME},{_ASS_TIME},', re.M),
+}
+
+# syntax -> (ms per last field, template)
+_TEMPLATES = {
+    'srt': (1, "%02d:%02d:%02d,%03d"),
+    'ass': (10, "%d:%02d:%02d.%02d"),
+}
+
+
+def _to_ms(fields):
+    """Milliseconds of [hours, minutes, seconds, fraction] string rows"""
+    if np is not None:
+        if not fields:
+            return np.zeros(0, dtype=np.int64)
+        table = np.array(fields)
+        values = table.astype(np.int64)
+        # "5" / "50" / "500" are all half a second
+        scale = 10 ** (3 - np.char.str_len(table[:, 3]))
+        return values[:, 0] * 3600000 + values[:, 1] * 60000 + values[:, 2] * 1000 + values[:, 3] * scale
+    return [int(h) * 3600000 + int(m) * 60000 + int(s) * 1000 + int(f) * 10 ** (3 - len(f))
+            for h, m, s, f in fields]
+
+
+def _format(ms, syntax):
+    """Timestamp strings of a millisecond array (negative times clamp to 0)"""
+    unit, template = _TEMPLATES[syntax]
+    per_second = 1000 // unit
+    if np is not None:
+        units = (np.maximum(ms, 0) + unit // 2) // unit
+        hours, rest = np.divmod(units, 3600 * per_second)
+        minutes, rest = np.divmod(rest, 60 * per_second)
+        seconds, fraction = np.divmod(rest, per_second)
+        rows = np.stack((hours, minutes, seconds, fraction), axis=1).tolist()
+        return [template % tuple(row) for row in rows]
+
+    stamps = []
+    for value in ms:
+        units = (max(value, 0) + unit // 2) // unit
+        hours, rest = divmod(units, 3600 * per_second)
+        minutes, rest = divmod(rest, 60 * per_second)
+        seconds, fraction = divmod(rest, per_second)
+        stamps.append(template % (hours, minutes, seconds, fraction))
+    return stamps
+
+
+def parse_time(value):
+    """Milliseconds of "[HH:]MM:SS[,.mmm]" or plain seconds"""
+    value = value.strip()
+    if ":" not in value:
+        return round(float(value) * 1000)
+    seconds = 0.0
+    for part in value.replace(",", ".").split(":"):
+        seconds = seconds * 60 + float(part)
+    return round(seconds * 1000)
+
+
+def _segments(anchors):
+    """Sorted anchor times and the (slope, intercept) of each segment between them"""
+    anchors = sorted(anchors)
+    if len(anchors) == 1:
+        # One anchor: a constant shift
+        (source, target), = anchors
+        return [source], [(1.0, target - source)]
+    sources = [source for source, _ in anchors]
+    if len(set(sources)) != len(sources):
+        raise ValueError("two anchors at the same subtitle time")
+    lines = []
+    for (x0, y0), (x1, y1) in zip(anchors, anchors[1:]):
+        slope = (y1 - y0) / (x1 - x0)
+        lines.append((slope, y0 - slope * x0))
+    return sources, lines
+
+
+def _remap(ms, anchors):
+    sources, lines = _segments(anchors)
+    # Segment of each time: the one starting at the last anchor <= time,
+    # with the first / last segment extended past the outer anchors
+    last = len(lines) - 1
+    if np is not None:
+        index = np.clip(np.searchsorted(sources, ms, side='right') - 1, 0, last)
+        slopes, intercepts = np.array(lines).T
+        return np.rint(ms * slopes[index] + intercepts[index]).astype(np.int64)
+    remapped = []
+    for value in ms:
+        slope, intercept = lines[min(max(bisect_right(sources, value) - 1, 0), last)]
+        remapped.append(round(value * slope + intercept))
+    return remapped
+
+
+def transform(ms, seconds=0.0, fps=None, anchors=None):
+    """New times of a millisecond array
+
+    fps: (source, target) framerate; times are scaled by source / target.
+    anchors: (subtitle ms, target ms) pairs for a piecewise-linear remap.
+    seconds: constant shift, applied last.
+    """
+    if np is not None:
+        ms = np.asarray(ms, dtype=np.int64)
+    if fps:
+        source, target = fps
+        factor = source / target
+        ms = np.rint(ms * factor).astype(np.int64) if np is not None else [round(value * factor) for value in ms]
+    if anchors:
+        ms = _remap(ms, anchors)
+    delta = round(seconds * 1000)
+    if delta:
+        ms = ms + delta if np is not None else [value + delta for value in ms]
+    return ms
+
+
+class Timings:
+    """Every timestamp of one subtitle text, in file order, as milliseconds"""
+
+    __slots__ = ('text', 'syntax', 'spans', 'ms')
+
+    def __init__(self, text, syntax):
+        self.text = text
+        self.syntax = syntax
+        self.spans = []      # (start, end) of each timestamp in text
+        fields = []
+        for match in _PATTERNS[syntax].finditer(text):
+            groups = match.groups()
+            self.spans.append((match.start(1), match.end(4)))
+            self.spans.append((match.start(5), match.end(8)))
+            fields.append(groups[:4])
+            fields.append(groups[4:])
+        self.ms = _to_ms(fields)
+
+    def __len__(self):
+        return len(self.spans) // 2
+
+    def adjust(self, seconds=0.0, fps=None, anchors=None):
+        """Framerate conversion / anchor remap / shift, see transform()"""
+        self.ms = transform(self.ms, seconds, fps, anchors)
+
+    def write(self, out):
+        """Write the text with the current timestamps to a text stream"""
+        position = 0
+        for (start, end), stamp in zip(self.spans, _format(self.ms, self.syntax)):
+            out.write(self.text[position:start])
+            out.write(stamp)
+            position = end
+        out.write(self.text[position:])
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import subtitle_timing
+
+
+@pytest.fixture(params=["numpy", "python"])
+def engine(request, monkeypatch):
+    """Run a test on the NumPy engine and again on the list fallback"""
+    if request.param == "python":
+        monkeypatch.setattr(subtitle_timing, 'np', None)
+    elif subtitle_timing.np is None:
+        pytest.skip("NumPy not installed")
+    return request.param
@@ -0,0 +1,68 @@
+"""EncodingDetector on the default codepages, alone and within one folder"""
+
+import codecs
+
+import pytest
+
+from subtitle_encoding import EncodingDetector
+
+TEXTS = {
+    'windows-1251': "Привет, как дела? Это субтитры к фильму.",
+    'windows-1254': "Merhaba, nasılsın? Güzel bir gün değil mi? Şimdi çık.",
+    'windows-1256': "مرحبا كيف حالك؟ هذه ترجمة الفيلم.",
+}
+
+
+def _subtitle(text, index=1):
+    return f"{index}\r\n00:00:01,000 --> 00:00:04,500\r\n{text}\r\n\r\n"
+
+
+@pytest.mark.parametrize("encoding", TEXTS)
+def test_codepage(encoding):
+    data = _subtitle(TEXTS[encoding]).encode(encoding)
+    assert EncodingDetector().decode(data) == (_subtitle(TEXTS[encoding]), encoding)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16", "utf-32"])
+def test_unicode(encoding):
+    text = _subtitle(TEXTS['windows-1254'])
+    decoded, _ = EncodingDetector().decode(text.encode(encoding))
+    assert decoded == text
+
+
+@pytest.mark.parametrize("encoding", ["utf-16-le", "utf-16-be"])
+def test_utf16_without_bom(encoding):
+    text = _subtitle(TEXTS['windows-1251']) * 2
+    data = text.encode(encoding)
+    assert not data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE))
+    assert EncodingDetector().decode(data) == (text, encoding)
+
+
+def test_ascii_is_not_remembered(tmp_path):
+    detector = EncodingDetector()
+    assert detector.decode(_subtitle("Hello").encode(), str(tmp_path / "a.srt"))[1] == "utf-8"
+    data = _subtitle(TEXTS['windows-1256']).encode('windows-1256')
+    assert detector.decode(data, str(tmp_path / "b.srt"))[1] == 'windows-1256'
+
+
+def test_folder_with_mixed_encodings(tmp_path):
+    detector = EncodingDetector()
+    folder = str(tmp_path / "season")
+    # The folder's first file is Turkish; CP1254 decodes any byte string
+    for index, encoding in enumerate(['windows-1254', 'windows-1251', 'windows-1256',
+                                      'utf-16-le', 'utf-8', 'windows-1254']):
+        text = _subtitle(TEXTS.get(encoding, TEXTS['windows-1251']) * 2)
+        decoded = detector.decode(text.encode(encoding), f"{folder}/e{index}.srt")
+        assert decoded == (text, encoding)
+
+
+def test_folder_codepage_wins_ties(tmp_path):
+    # "…" is 0x85 in all three codepages: the scores tie
+    data = _subtitle("Wait…").encode('windows-1256')
+    detector = EncodingDetector()
+    assert detector.decode(data, str(tmp_path / "new.srt"))[1] == 'windows-1254'
+
+    detector.decode(_subtitle(TEXTS['windows-1256']).encode('windows-1256'),
+                    str(tmp_path / "season" / "e01.srt"))
+    assert detector.decode(data, str(tmp_path / "season" / "e02.srt")) == \
+        (_subtitle("Wait…"), 'windows-1256')
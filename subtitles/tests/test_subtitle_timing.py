@@ -0,0 +1,141 @@
+"""Timestamp rewriting of SRT / ASS text; every test runs on both engines"""
+
+import io
+
+import pytest
+
+from subtitle_shift import main, output_path, shift_file
+from subtitle_timing import Timings, parse_time
+
+pytestmark = pytest.mark.usefixtures("engine")
+
+SRT = ("1\r\n"
+       "00:00:01,000 --> 00:00:04,500\r\n"
+       "Hello --> 00:00:09,000 is text\r\n"
+       "\r\n"
+       "2\r\n"
+       "00:01:59,999 --> 00:02:03.5\r\n"
+       "<i>İkinci satır</i>\r\n")
+
+ASS = ("[Script Info]\n"
+       "Title: 0:00:01.00 is not an event\n"
+       "\n"
+       "[Events]\n"
+       "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+       "Dialogue: 0,0:00:01.00,0:00:04.50,Default,,0,0,0,,Hi, 0:00:09.00 there\n"
+       "Comment: 0,1:59:59.99,2:00:00.00,Default,,0,0,0,,note\n")
+
+
+def _resync(text, syntax, *args, **kwargs):
+    timings = Timings(text, syntax)
+    timings.adjust(*args, **kwargs)
+    out = io.StringIO(newline="")
+    timings.write(out)
+    return len(timings), out.getvalue()
+
+
+def test_srt_shift():
+    count, text = _resync(SRT, 'srt', 1.5)
+    assert count == 2
+    assert text == SRT.replace("00:00:01,000 --> 00:00:04,500", "00:00:02,500 --> 00:00:06,000") \
+                      .replace("00:01:59,999 --> 00:02:03.5", "00:02:01,499 --> 00:02:05,000")
+
+
+def test_srt_negative_shift_clamps_at_zero():
+    _, text = _resync(SRT, 'srt', -2)
+    assert "00:00:00,000 --> 00:00:02,500\r\n" in text
+    assert "00:01:57,999 --> 00:02:01,500\r\n" in text
+
+
+def test_ass_shift_rounds_to_centiseconds():
+    count, text = _resync(ASS, 'ass', 0.255)
+    assert count == 2
+    assert text == ASS.replace("0,0:00:01.00,0:00:04.50,", "0,0:00:01.26,0:00:04.76,") \
+                      .replace("0,1:59:59.99,2:00:00.00,", "0,2:00:00.25,2:00:00.26,")
+
+
+def test_srt_fps():
+    # A 25 fps subtitle on a 23.976 fps video: every time * 25 / 23.976
+    _, text = _resync(SRT, 'srt', fps=(25, 23.976))
+    assert "00:00:01,043 --> 00:00:04,692\r\n" in text
+    assert "00:02:05,124 --> 00:02:08,775\r\n" in text
+
+
+def test_ass_fps():
+    _, text = _resync(ASS, 'ass', fps=(23.976, 25))
+    assert "Dialogue: 0,0:00:00.96,0:00:04.32,Default" in text
+    assert "Comment: 0,1:55:05.08,1:55:05.09,Default" in text
+
+
+def test_srt_anchors_then_shift():
+    # 1s -> 2s and 11s -> 13s: slope 1.1 through both, extended past the last anchor;
+    # the constant shift is applied after the remap
+    _, text = _resync(SRT, 'srt', 1, anchors=[(11000, 13000), (1000, 2000)])
+    assert "00:00:03,000 --> 00:00:06,850\r\n" in text
+    assert "00:02:13,899 --> 00:02:17,750\r\n" in text
+
+
+def test_anchor_segments():
+    # Before the first anchor the first segment (slope 1.1) extends; 16s is on the second (slope 1)
+    timings = Timings("00:00:00,500 --> 00:00:16,000\n", 'srt')
+    timings.adjust(anchors=[(1000, 2000), (11000, 13000), (21000, 23000)])
+    assert list(timings.ms) == [1450, 18000]
+
+
+def test_single_anchor_is_a_shift():
+    assert _resync(SRT, 'srt', anchors=[(5000, 3000)]) == _resync(SRT, 'srt', -2)
+
+
+def test_duplicate_anchor():
+    with pytest.raises(ValueError):
+        _resync(SRT, 'srt', anchors=[(1000, 2000), (1000, 3000)])
+
+
+@pytest.mark.parametrize("value, ms", [
+    ("1.5", 1500),
+    ("-2", -2000),
+    ("01:02", 62000),
+    ("1:02:03,250", 3723250),
+    ("00:42:10.5", 2530500),
+])
+def test_parse_time(value, ms):
+    assert parse_time(value) == ms
+
+
+def test_no_timings():
+    assert _resync("just text\n", 'srt', 3) == (0, "just text\n")
+
+
+@pytest.mark.parametrize("name, text", [("movie.srt", SRT), ("movie.ass", ASS)])
+def test_shift_file(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_bytes(text.encode("windows-1254"))
+    output = tmp_path / f"out-{name}"
+
+    result = shift_file(str(path), str(output), 1.5)
+
+    assert result == (str(path), str(output), 2, None)
+    # Decoded once from windows-1254, written back as UTF-8 with the line endings kept
+    assert output.read_bytes().decode("utf-8") == _resync(text, name[-3:], 1.5)[1]
+
+
+def _main(monkeypatch, *argv):
+    monkeypatch.setattr("sys.argv", ["subtitle_shift.py", *argv])
+    main()
+
+
+def test_zero_shift_reencodes(tmp_path, monkeypatch):
+    path = tmp_path / "movie.srt"
+    path.write_bytes(SRT.encode("windows-1254"))
+    _main(monkeypatch, "-t", "0", "-j", "1", str(path))
+    with open(output_path(str(path)), "rb") as f:
+        # Same times (written in canonical form), now in UTF-8
+        assert f.read().decode("utf-8") == _resync(SRT, 'srt', 0)[1]
+
+
+def test_nothing_to_do(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "movie.srt"
+    path.write_text(SRT)
+    with pytest.raises(SystemExit):
+        _main(monkeypatch, str(path))
+    assert "give --time, --fps or --anchor" in capsys.readouterr().err